@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import BasketItem
 
-# Register your models here.
+
+@admin.register(BasketItem)
+class BasketItemAdmin(admin.ModelAdmin):
+    """
+    Класс для представления товара в корзине в административной панели.
+    """
+    list_display = ('id', 'user', 'session_key', 'product', 'count', 'price', 'updatedAt')
+    ordering = ('pk',)
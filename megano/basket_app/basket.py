@@ -1,39 +1,48 @@
 from decimal import Decimal
 
-from django.core.exceptions import ObjectDoesNotExist
-
-from megano import settings
 from products_app.models import Product
+from products_app.pricing import get_effective_prices
 from rest_framework.request import Request
+from .storage import get_basket_storage
 
 
 class Basket:
     """Корзина для товаров."""
     def __init__(self, request: Request):
         """
-        Инициализация корзины. Установка сессии.
+        Инициализация корзины. Загрузка корзины из хранилища, указанного в настройке BASKET_STORAGE.
         Сама корзина представляет собой словарь, где ключ - это идентификатор товара.
-        Значение - словарь, состоящий из цены и количества товара в корзине
+        Значение - словарь, состоящий из цены на момент добавления и количества товара в корзине.
+        Сохраненная цена используется только для товаров, которых больше нет в каталоге:
+        стоимость корзины и заказа считается по текущим ценам (get_effective_prices).
         :param request: запрос
         """
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = dict()
-        self.cart = cart
+        self.storage = get_basket_storage(request)
+        self.cart = self.storage.load()
+        self.prices = dict()
+
+    def get_prices(self) -> dict[int, Decimal]:
+        """
+        Метод, возвращающий текущие цены всех товаров корзины с учетом действующих акций.
+        Цены загружаются одним обращением к кэшу (и одним запросом для товаров, которых нет в кэше)
+        и запоминаются до конца запроса.
+        :return: словарь, где ключ - идентификатор товара, значение - цена или None, если товара больше нет.
+        """
+        missing = [int(product_id) for product_id in self.cart if int(product_id) not in self.prices]
+        if missing:
+            prices = get_effective_prices(missing)
+            self.prices.update({product_pk: prices.get(product_pk) for product_pk in missing})
+        return self.prices
 
     def add(self, product: Product, count: int = 1):
         """
-        Метод добавления товара в корзину. Если на товар есть акция, то берется цена по скидке.
+        Метод добавления товара в корзину. Если на товар действует акция, то берется цена по скидке.
         :param product: Товар
         :param count: Количество товара
         :return: Сохраняет товар в корзину.
         """
         product_id = str(product.pk)
-        try:
-            price = product.sale.salePrice
-        except ObjectDoesNotExist:
-            price = product.price
+        price = get_effective_prices([product.pk]).get(product.pk, product.price)
         if product_id not in self.cart:
             self.cart[product_id] = {
                 'count': count,
@@ -41,7 +50,7 @@ class Basket:
             }
         else:
             self.cart[product_id]['count'] += count
-        self.save()
+        self.storage.add(product_id, count=count, price=str(price))
 
     def delete(self, product: Product, count: int = 1):
         """
@@ -56,28 +65,44 @@ class Basket:
         else:
             self.cart[product_id]['count'] -= count
 
-        self.save()
+        self.storage.delete(product_id, count=count)
+
+    def set_many(self, counts: dict[Product, int]):
+        """
+        Метод установки количества сразу для многих товаров. Хранилище корзины записывается один раз.
+        Если на товар действует акция, то берется цена по скидке.
+        :param counts: словарь, где ключ - товар, значение - новое количество товара. Товары с количеством 0
+        удаляются из корзины.
+        """
+        prices = get_effective_prices(product.pk for product in counts)
+        for product, count in counts.items():
+            product_id = str(product.pk)
+            if count > 0:
+                self.cart[product_id] = {'count': count, 'price': str(prices.get(product.pk, product.price))}
+            else:
+                self.cart.pop(product_id, None)
+        self.storage.set_many({str(product.pk): self.cart.get(str(product.pk)) for product in counts})
 
     def save(self):
         """
         Метод сохранения изменений в корзине.
         """
-        self.session.modified = True
+        self.storage.save()
 
     def clear(self):
         """
         Метод полной очистки корзины.
         """
-        del self.session[settings.CART_SESSION_ID]
-        self.session.modified = True
+        self.cart = dict()
+        self.storage.clear()
 
     def get_total_price(self) -> Decimal:
         """
-        Метод, возвращающий полную стоимость всех товаров в корзине.
+        Метод, возвращающий полную стоимость всех товаров в корзине по текущим ценам.
         :return: Полная стоимость.
         """
-        return sum(data_many.get('count', 0) * Decimal(data_many.get('price', 0))
-                   for data_many in self.cart.values())
+        return sum((data_many.get('count', 0) * self.get_price_product_in_basket(product_pk=product_id)
+                    for product_id, data_many in self.cart.items()), Decimal(0))
 
     def get_count_product_in_basket(self, product_pk) -> int:
         """
@@ -90,11 +115,13 @@ class Basket:
 
     def get_price_product_in_basket(self, product_pk) -> Decimal:
         """
-        Метод, возвращающий цену конкретного товара в корзине.
+        Метод, возвращающий текущую цену конкретного товара в корзине.
+        Если товара больше нет в каталоге, возвращается цена, сохраненная при добавлении.
         :param product_pk: идентификатор товара.
         :return: Цена товара.
         """
         product_id = str(product_pk)
-        return Decimal(self.cart.get(product_id, {}).get('price', 0))
+        price = self.get_prices().get(int(product_pk))
+        return price if price is not None else Decimal(self.cart.get(product_id, {}).get('price', 0))
 
 
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+
+class BasketCookieMiddleware:
+    """
+    Записывает в ответ cookie с корзиной, если CookieBasketStorage изменил ее во время обработки запроса.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+        if not hasattr(request, 'basket_cookie'):
+            return response
+
+        if request.basket_cookie is None:
+            response.delete_cookie(settings.BASKET_COOKIE_NAME, samesite='Lax')
+        else:
+            response.set_cookie(settings.BASKET_COOKIE_NAME, request.basket_cookie,
+                                max_age=settings.BASKET_COOKIE_AGE, httponly=True, samesite='Lax',
+                                secure=settings.SESSION_COOKIE_SECURE)
+        return response
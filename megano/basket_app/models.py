@@ -1,3 +1,33 @@
+from django.contrib.auth.models import User
 from django.db import models
+from products_app.models import Product
 
-# Create your models here.
+
+class BasketItem(models.Model):
+    """
+    Модель товара в корзине. Используется хранилищем корзины в базе данных (DatabaseBasketStorage).
+    Корзина авторизованного пользователя привязана к пользователю, анонимная - к токену из сессии.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='basket_items', verbose_name='Пользователь')
+    session_key = models.CharField(max_length=40, blank=True, default='', verbose_name='Токен анонимной корзины')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name='Товар')
+    count = models.PositiveIntegerField(verbose_name='Количество')
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Цена')
+    updatedAt = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+    class Meta:
+        verbose_name = 'Товар в корзине'
+        verbose_name_plural = 'Товары в корзине'
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'product'), condition=models.Q(user__isnull=False),
+                                    name='unique_user_basket_item'),
+            models.UniqueConstraint(fields=('session_key', 'product'), condition=models.Q(user__isnull=True),
+                                    name='unique_session_basket_item'),
+        ]
+        indexes = [
+            models.Index(fields=('session_key',), name='basket_item_session_idx'),
+        ]
+
+    def __str__(self):
+        return 'Товар #{product} в корзине, {count} шт.'.format(product=self.product_id, count=self.count)
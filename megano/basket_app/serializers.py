@@ -1,46 +1,30 @@
 from rest_framework import serializers
+from media_app.utils import get_image_data
 from products_app.models import Product
 from products_app.serializers import TagSerializer
 
 
 class BasketSerializer(serializers.ModelSerializer):
     """
-    Сериализатор корзины.
+    Сериализатор товара в корзине. Содержит только данные товара: количество и цена товара в корзине
+    добавляются к ним в get_serialized_data, поэтому результат можно кэшировать для всех корзин.
     """
     tags = TagSerializer(many=True, required=False)
     reviews = serializers.SerializerMethodField()
-    count = serializers.SerializerMethodField()
-    price = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ('id', 'category', 'price', 'count', 'date', 'title',
+        fields = ('id', 'category', 'date', 'title',
                   'description', 'freeDelivery', 'images', 'tags', 'reviews', 'rating')
 
-    def get_count(self, instance: Product) -> int:
-        """
-        Возвращает количество товара в корзине
-        :param instance: экземпляр модели Product
-        :return: Количество товара
-        """
-        return self.context.get_count_product_in_basket(product_pk=instance.pk)
-
-    def get_price(self, instance: Product) -> int:
-        """
-        Возвращает цену товара в корзине
-        :param instance: экземпляр модели Product
-        :return: Цена товара
-        """
-        return self.context.get_price_product_in_basket(product_pk=instance.pk)
-
     def get_reviews(self, instance: Product) -> int:
         """
         Метод сериализатора. Возвращает количество отзывов.
         :param instance: экземпляр модели Product
         :return: Количество отзывов.
         """
-        return len(instance.review.all())
+        return instance.reviews_count
 
     def get_images(self, instance: Product) -> list[dict]:
         """
@@ -48,6 +32,5 @@ class BasketSerializer(serializers.ModelSerializer):
         :param instance: экземпляр модели Product
         :return: список из словарей, в которых содержится информация об изображениях товара.
         """
-        return [{'src': image.src(), 'alt': image.alt()}
-                for image in instance.product_img.all()]
+        return [get_image_data(image) for image in instance.product_img.all()]
 
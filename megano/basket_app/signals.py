@@ -0,0 +1,11 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .storage import merge_anonymous_basket, merge_cookie_basket
+
+
+@receiver(user_logged_in)
+def merge_basket_on_login(sender, request, user, **kwargs):
+    """Переносит анонимную корзину из базы данных и из cookie в корзину пользователя после входа."""
+    merge_anonymous_basket(request=request, user=user)
+    merge_cookie_basket(request=request, user=user)
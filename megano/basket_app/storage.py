@@ -0,0 +1,366 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.http import HttpRequest
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils.module_loading import import_string
+from rest_framework.request import Request
+
+from .models import BasketItem
+
+BASKET_TOKEN_SESSION_KEY = 'basket_token'
+BASKET_COOKIE_SALT = 'basket_app.storage.CookieBasketStorage'
+
+
+class SessionBasketStorage:
+    """
+    Хранилище корзины в сессии. Корзина - словарь внутри сессии.
+    Чтение пустой корзины сессию не изменяет: ключ корзины появляется в сессии только при первом изменении.
+    """
+    def __init__(self, request: Request, user: User | None = None):
+        self.session = request.session
+        self.cart = None
+
+    def load(self) -> dict:
+        """
+        Загружает корзину.
+        :return: словарь, где ключ - идентификатор товара, значение - словарь с ценой и количеством.
+        """
+        self.cart = self.session.get(settings.CART_SESSION_ID) or dict()
+        return self.cart
+
+    def add(self, product_id: str, count: int, price: str):
+        """
+        Сохраняет добавление товара в корзину.
+        :param product_id: идентификатор товара
+        :param count: на сколько увеличилось количество товара
+        :param price: цена товара
+        """
+        self.save()
+
+    def delete(self, product_id: str, count: int):
+        """
+        Сохраняет удаление товара из корзины.
+        :param product_id: идентификатор товара
+        :param count: на сколько уменьшилось количество товара
+        """
+        self.save()
+
+    def set_many(self, items: dict):
+        """
+        Сохраняет изменение многих товаров корзины.
+        :param items: словарь, где ключ - идентификатор товара, значение - новые данные товара или None,
+        если товар удален
+        """
+        self.save()
+
+    def merge(self, items: dict):
+        """
+        Добавляет товары в корзину. Количество одинаковых товаров складывается.
+        :param items: словарь в формате корзины
+        """
+        cart = self.load()
+        for product_id, item in items.items():
+            if product_id in cart:
+                cart[product_id]['count'] += item['count']
+                cart[product_id]['price'] = item['price']
+            else:
+                cart[product_id] = dict(item)
+        self.save()
+
+    def save(self):
+        """Кладет корзину в сессию, что помечает сессию измененной."""
+        self.session[settings.CART_SESSION_ID] = self.cart
+
+    def clear(self):
+        """Удаляет корзину из сессии."""
+        self.cart = dict()
+        if settings.CART_SESSION_ID in self.session:
+            del self.session[settings.CART_SESSION_ID]
+
+
+class DatabaseBasketStorage:
+    """
+    Хранилище корзины в базе данных (модель BasketItem).
+    Корзина авторизованного пользователя привязана к пользователю и доступна с любого устройства.
+    Анонимная корзина привязана к токену, который сохраняется в сессии при первом добавлении товара,
+    и переносится в корзину пользователя при входе (merge_anonymous_basket).
+    Каждое изменение - это UPDATE или INSERT одной строки, сессия при этом не перезаписывается.
+    """
+    def __init__(self, request: Request, user: User | None = None):
+        user = user or request.user
+        self.session = request.session
+        self.user = user if user.is_authenticated else None
+
+    def get_owner_filter(self, create: bool = False) -> Q | None:
+        """
+        Возвращает условие отбора строк корзины текущего владельца.
+        :param create: создать токен анонимной корзины, если его еще нет
+        :return: объект Q или None, если у анонимного пользователя еще нет корзины.
+        """
+        if self.user is not None:
+            return Q(user=self.user)
+        token = self.session.get(BASKET_TOKEN_SESSION_KEY)
+        if not token and create:
+            token = self.session[BASKET_TOKEN_SESSION_KEY] = uuid.uuid4().hex
+        return Q(user__isnull=True, session_key=token) if token else None
+
+    def load(self) -> dict:
+        """
+        Загружает корзину одним запросом.
+        :return: словарь, где ключ - идентификатор товара, значение - словарь с ценой и количеством.
+        """
+        owner = self.get_owner_filter()
+        if owner is None:
+            return dict()
+        return {str(product_id): {'count': count, 'price': str(price)}
+                for product_id, count, price in BasketItem.objects.filter(owner).values_list(
+                    'product_id', 'count', 'price')}
+
+    def add(self, product_id: str, count: int, price: str):
+        """
+        Увеличивает количество товара в корзине. Если строки еще нет, создает ее.
+        :param product_id: идентификатор товара
+        :param count: на сколько увеличилось количество товара
+        :param price: цена товара
+        """
+        owner = self.get_owner_filter(create=True)
+        items = BasketItem.objects.filter(owner, product_id=product_id)
+        if items.update(count=F('count') + count, price=price):
+            return
+        session_key = '' if self.user is not None else self.session[BASKET_TOKEN_SESSION_KEY]
+        try:
+            with transaction.atomic():
+                BasketItem.objects.create(user=self.user, session_key=session_key,
+                                          product_id=product_id, count=count, price=price)
+        except IntegrityError:
+            # строку успел создать параллельный запрос
+            items.update(count=F('count') + count, price=price)
+
+    def delete(self, product_id: str, count: int):
+        """
+        Уменьшает количество товара в корзине. Если товара не остается, удаляет строку.
+        :param product_id: идентификатор товара
+        :param count: на сколько уменьшилось количество товара
+        """
+        owner = self.get_owner_filter()
+        if owner is None:
+            return
+        items = BasketItem.objects.filter(owner, product_id=product_id)
+        if not items.filter(count__gt=count).update(count=F('count') - count):
+            items.delete()
+
+    def set_many(self, items: dict):
+        """
+        Устанавливает количество многих товаров в одной транзакции: удаленные товары удаляются одним DELETE,
+        существующие строки обновляются одним bulk_update, новые создаются одним bulk_create.
+        :param items: словарь, где ключ - идентификатор товара, значение - новые данные товара или None,
+        если товар удален
+        """
+        removed = [product_id for product_id, item in items.items() if item is None]
+        changed = {product_id: item for product_id, item in items.items() if item is not None}
+        owner = self.get_owner_filter(create=bool(changed))
+        if owner is None:
+            return
+        session_key = '' if self.user is not None else self.session[BASKET_TOKEN_SESSION_KEY]
+        with transaction.atomic():
+            if removed:
+                BasketItem.objects.filter(owner, product_id__in=removed).delete()
+            existing = {str(item.product_id): item for item in BasketItem.objects.select_for_update().filter(
+                owner, product_id__in=list(changed))}
+            for product_id, item in existing.items():
+                item.count, item.price = changed[product_id]['count'], changed[product_id]['price']
+            BasketItem.objects.bulk_update(existing.values(), ['count', 'price'])
+            BasketItem.objects.bulk_create([
+                BasketItem(user=self.user, session_key=session_key, product_id=int(product_id),
+                           count=item['count'], price=item['price'])
+                for product_id, item in changed.items() if product_id not in existing
+            ])
+
+    def merge(self, items: dict):
+        """
+        Добавляет товары в корзину. Количество одинаковых товаров складывается, цена берется из items.
+        Существующие строки обновляются одним bulk_update, новые создаются одним bulk_create.
+        :param items: словарь в формате корзины
+        """
+        if not items:
+            return
+        owner = self.get_owner_filter(create=True)
+        session_key = '' if self.user is not None else self.session[BASKET_TOKEN_SESSION_KEY]
+        with transaction.atomic():
+            existing = {str(item.product_id): item for item in BasketItem.objects.select_for_update().filter(
+                owner, product_id__in=list(items))}
+            for product_id, item in existing.items():
+                item.count += items[product_id]['count']
+                item.price = items[product_id]['price']
+            BasketItem.objects.bulk_update(existing.values(), ['count', 'price'])
+            BasketItem.objects.bulk_create([
+                BasketItem(user=self.user, session_key=session_key, product_id=int(product_id),
+                           count=item['count'], price=item['price'])
+                for product_id, item in items.items() if product_id not in existing
+            ])
+
+    def save(self):
+        """Изменения сохраняются сразу в add и delete."""
+
+    def clear(self):
+        """Удаляет все товары из корзины."""
+        owner = self.get_owner_filter()
+        if owner is not None:
+            BasketItem.objects.filter(owner).delete()
+
+
+def read_basket_cookie(request: HttpRequest) -> dict | None:
+    """
+    Читает корзину из подписанной cookie.
+    :param request: запрос
+    :return: словарь в формате корзины или None, если cookie нет или подпись неверна.
+    """
+    value = request.COOKIES.get(settings.BASKET_COOKIE_NAME)
+    if not value:
+        return None
+    try:
+        items = signing.loads(value, salt=BASKET_COOKIE_SALT, max_age=settings.BASKET_COOKIE_AGE)
+    except signing.BadSignature:
+        return None
+    return {product_id: {'count': count, 'price': price} for product_id, (count, price) in items.items()}
+
+
+def write_basket_cookie(request: HttpRequest, cart: dict | None):
+    """
+    Запоминает новое значение cookie с корзиной. Саму cookie в ответ записывает BasketCookieMiddleware.
+    :param request: запрос
+    :param cart: корзина. Если она пуста или None, cookie удаляется.
+    """
+    request.basket_cookie = signing.dumps(
+        {product_id: [item['count'], item['price']] for product_id, item in cart.items()},
+        salt=BASKET_COOKIE_SALT, compress=True,
+    ) if cart else None
+
+
+class CookieBasketStorage:
+    """
+    Хранилище корзины в подписанной cookie для анонимных пользователей.
+    Небольшая анонимная корзина живет только в cookie, поэтому просмотр и изменение такой корзины
+    не создают и не перезаписывают сессию. Когда товаров становится больше BASKET_COOKIE_MAX_ITEMS
+    или пользователь входит в систему (без этого не оформить заказ), корзина переносится
+    в серверное хранилище BASKET_SERVER_STORAGE, и дальше используется только оно.
+    """
+    def __init__(self, request: Request, user: User | None = None):
+        user = user or request.user
+        self.request = getattr(request, '_request', request)
+        self.server = import_string(settings.BASKET_SERVER_STORAGE)(request, user=user)
+        self.anonymous = not user.is_authenticated
+        self.in_cookie = False
+        self.cart = None
+
+    def load(self) -> dict:
+        """
+        Загружает корзину из cookie, а если ее там нет - из серверного хранилища.
+        :return: словарь, где ключ - идентификатор товара, значение - словарь с ценой и количеством.
+        """
+        cart = read_basket_cookie(self.request) if self.anonymous else None
+        if cart is None:
+            cart = self.server.load()
+            self.in_cookie = self.anonymous and not cart
+        else:
+            self.in_cookie = True
+        self.cart = cart
+        return cart
+
+    def add(self, product_id: str, count: int, price: str):
+        """
+        Сохраняет добавление товара в корзину.
+        :param product_id: идентификатор товара
+        :param count: на сколько увеличилось количество товара
+        :param price: цена товара
+        """
+        if self.in_cookie:
+            self.save()
+        else:
+            self.server.add(product_id, count=count, price=price)
+
+    def delete(self, product_id: str, count: int):
+        """
+        Сохраняет удаление товара из корзины.
+        :param product_id: идентификатор товара
+        :param count: на сколько уменьшилось количество товара
+        """
+        if self.in_cookie:
+            self.save()
+        else:
+            self.server.delete(product_id, count=count)
+
+    def set_many(self, items: dict):
+        """
+        Сохраняет изменение многих товаров корзины.
+        :param items: словарь, где ключ - идентификатор товара, значение - новые данные товара или None,
+        если товар удален
+        """
+        if self.in_cookie:
+            self.save()
+        else:
+            self.server.set_many(items)
+
+    def save(self):
+        """Записывает корзину в cookie или переносит ее в серверное хранилище, если она стала большой."""
+        if not self.in_cookie:
+            self.server.save()
+        elif len(self.cart) > settings.BASKET_COOKIE_MAX_ITEMS:
+            self.server.merge(self.cart)
+            self.in_cookie = False
+            write_basket_cookie(self.request, None)
+        else:
+            write_basket_cookie(self.request, self.cart)
+
+    def clear(self):
+        """Очищает корзину в cookie и в серверном хранилище."""
+        if self.in_cookie:
+            write_basket_cookie(self.request, None)
+        else:
+            self.server.clear()
+        self.cart = dict()
+
+
+def merge_cookie_basket(request: Request, user: User):
+    """
+    Переносит корзину из cookie в серверное хранилище корзины пользователя, который только что вошел в систему.
+    :param request: запрос
+    :param user: пользователь
+    """
+    request = getattr(request, '_request', request)
+    cart = read_basket_cookie(request)
+    if cart:
+        import_string(settings.BASKET_SERVER_STORAGE)(request, user=user).merge(cart)
+    if cart is not None:
+        write_basket_cookie(request, None)
+
+
+def get_basket_storage(request: Request) -> SessionBasketStorage | DatabaseBasketStorage | CookieBasketStorage:
+    """
+    Создает хранилище корзины, указанное в настройке BASKET_STORAGE.
+    :param request: запрос
+    :return: экземпляр хранилища корзины.
+    """
+    return import_string(settings.BASKET_STORAGE)(request)
+
+
+def merge_anonymous_basket(request: Request, user: User):
+    """
+    Переносит анонимную корзину из базы данных в корзину пользователя, который только что вошел в систему.
+    :param request: запрос
+    :param user: пользователь
+    """
+    token = request.session.pop(BASKET_TOKEN_SESSION_KEY, None)
+    if not token:
+        return
+    anonymous_items = BasketItem.objects.filter(user__isnull=True, session_key=token)
+    with transaction.atomic():
+        DatabaseBasketStorage(request, user=user).merge({
+            str(product_id): {'count': count, 'price': price}
+            for product_id, count, price in anonymous_items.values_list('product_id', 'count', 'price')
+        })
+        anonymous_items.delete()
@@ -1,3 +1,189 @@
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from media_app.derivatives import get_srcset
+from products_app.models import Product, ProductImage
+from .models import BasketItem
+
+
+@override_settings(BASKET_STORAGE='basket_app.storage.DatabaseBasketStorage')
+class DatabaseBasketTestCase(TestCase):
+    """Проверяет хранение корзины в базе данных и перенос анонимной корзины при входе."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', password='Password123')
+        cls.products = [Product.objects.create(title='Product {index}'.format(index=index), price=100,
+                                               count=10, rating=5) for index in range(2)]
+
+    def add(self, product: Product, count: int):
+        """
+        Добавляет товар в корзину.
+        :param product: экземпляр модели Product
+        :param count: количество товара
+        """
+        response = self.client.post(reverse('basket_app:basket'), {'id': product.pk, 'count': count})
+        self.assertEqual(response.status_code, 200)
+
+    def get_basket(self) -> dict:
+        """
+        Получает корзину.
+        :return: словарь, где ключ - идентификатор товара, значение - количество товара в корзине.
+        """
+        return {item['id']: item['count'] for item in self.client.get(reverse('basket_app:basket')).json()}
+
+    def test_anonymous_basket(self):
+        self.assertEqual(self.get_basket(), {})
+        self.add(self.products[0], count=2)
+        self.add(self.products[0], count=1)
+        self.assertEqual(self.get_basket(), {self.products[0].pk: 3})
+
+        self.client.delete(reverse('basket_app:basket'), {'id': self.products[0].pk, 'count': 3},
+                           content_type='application/json')
+        self.assertEqual(self.get_basket(), {})
+        self.assertFalse(BasketItem.objects.exists())
+
+    def test_batch(self):
+        self.add(self.products[0], count=2)
+        response = self.client.post(reverse('basket_app:basket_batch'), {'operations': [
+            {'id': self.products[0].pk, 'action': 'remove', 'count': 2},
+            {'id': self.products[1].pk, 'action': 'set', 'count': 4},
+            {'id': self.products[1].pk, 'action': 'add', 'count': 1},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_basket(), {self.products[1].pk: 5})
+
+    def test_merge_on_login(self):
+        self.client.force_login(self.user)
+        self.add(self.products[0], count=1)
+        self.client.logout()
+
+        self.add(self.products[0], count=2)
+        self.add(self.products[1], count=1)
+        response = self.client.post(reverse('profileuser_app:sign-in'),
+                                    {'username': 'buyer', 'password': 'Password123'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.get_basket(), {self.products[0].pk: 3, self.products[1].pk: 1})
+        self.assertFalse(BasketItem.objects.filter(user__isnull=True).exists())
+
+
+class SessionBasketTestCase(TestCase):
+    """Проверяет, что просмотр пустой корзины не создает сессию."""
+    def test_empty_basket_does_not_create_session(self):
+        response = self.client.get(reverse('basket_app:basket'))
+        self.assertEqual(response.json(), [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+
+@override_settings(BASKET_STORAGE='basket_app.storage.CookieBasketStorage',
+                   BASKET_SERVER_STORAGE='basket_app.storage.DatabaseBasketStorage',
+                   BASKET_COOKIE_MAX_ITEMS=2)
+class CookieBasketTestCase(DatabaseBasketTestCase):
+    """Проверяет хранение небольшой анонимной корзины в cookie и ее перенос в базу данных."""
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.products.append(Product.objects.create(title='Product 2', price=100, count=10, rating=5))
+
+    def test_small_basket_lives_in_cookie(self):
+        self.add(self.products[0], count=2)
+        self.add(self.products[1], count=1)
+        self.assertIn(settings.BASKET_COOKIE_NAME, self.client.cookies)
+        self.assertEqual(self.get_basket(), {self.products[0].pk: 2, self.products[1].pk: 1})
+        self.assertFalse(Session.objects.exists())
+        self.assertFalse(BasketItem.objects.exists())
+
+    def test_tampered_cookie_is_ignored(self):
+        self.add(self.products[0], count=2)
+        self.client.cookies[settings.BASKET_COOKIE_NAME] = self.client.cookies[
+            settings.BASKET_COOKIE_NAME].value + 'x'
+        self.assertEqual(self.get_basket(), {})
+
+    def test_big_basket_is_promoted(self):
+        for product in self.products:
+            self.add(product, count=1)
+        self.assertEqual(self.client.cookies[settings.BASKET_COOKIE_NAME].value, '')
+        self.assertEqual(BasketItem.objects.filter(user__isnull=True).count(), 3)
+        self.add(self.products[0], count=1)
+        self.assertEqual(self.get_basket(), {self.products[0].pk: 2, self.products[1].pk: 1,
+                                             self.products[2].pk: 1})
+
+
+class BasketResponsesTestCase(TestCase):
+    """Проверяет ETag корзины, ответы с изменениями и кэш данных товаров."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [Product.objects.create(title='Product {index}'.format(index=index), price=100,
+                                               count=10, rating=5) for index in range(2)]
+
+    def setUp(self):
+        cache.clear()
+        for product in self.products:
+            self.client.post(reverse('basket_app:basket'), {'id': product.pk, 'count': 1})
+
+    def test_not_modified(self):
+        response = self.client.get(reverse('basket_app:basket'))
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(reverse('basket_app:basket'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        self.client.post(reverse('basket_app:basket'), {'id': self.products[0].pk, 'count': 1})
+        modified = self.client.get(reverse('basket_app:basket'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(modified.status_code, 200)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+
+    def test_product_change_changes_etag(self):
+        etag = self.client.get(reverse('basket_app:basket'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].title = 'New title'
+            self.products[0].save()
+        response = self.client.get(reverse('basket_app:basket'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['title'], 'New title')
+
+    def test_delta(self):
+        url = '{url}?delta=true'.format(url=reverse('basket_app:basket'))
+        data = self.client.post(url, {'id': self.products[0].pk, 'count': 2}).json()
+        self.assertEqual([(item['id'], item['count']) for item in data['items']], [(self.products[0].pk, 3)])
+        self.assertEqual(data['removed'], [])
+
+        data = self.client.delete(url, {'id': self.products[1].pk, 'count': 1}, content_type='application/json').json()
+        self.assertEqual((data['items'], data['removed']), ([], [self.products[1].pk]))
+
+    def test_batch_is_validated_as_a_whole(self):
+        response = self.client.post(reverse('basket_app:basket_batch'), [
+            {'id': self.products[0].pk, 'action': 'add', 'count': 5},
+            {'id': self.products[1].pk, 'action': 'set', 'count': 11},
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Product 1', str(response.json()))
+        self.assertEqual([item['count'] for item in self.client.get(reverse('basket_app:basket')).json()], [1, 1])
+
+    def test_batch_queries(self):
+        operations = [{'id': product.pk, 'action': 'set', 'count': 3} for product in self.products]
+        # чтение сессии + товары одним запросом (данные для ответа из кэша) + запись сессии в savepoint
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('basket_app:basket_batch'), {'operations': operations},
+                                        content_type='application/json')
+        self.assertEqual([item['count'] for item in response.json()], [3, 3])
+
+    def test_prices_are_current(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].price = 150
+            self.products[0].save()
+        response = self.client.get(reverse('basket_app:basket'))
+        self.assertEqual([item['price'] for item in response.json()], [150, 100])
+
+    def test_images_have_srcset(self):
+        image = ProductImage.objects.create(product=self.products[0], image='products/images/id_1/plane.jpg')
+        ProductImage.objects.filter(pk=image.pk).update(content_hash='0' * 32)
+        cache.clear()
+        images = self.client.get(reverse('basket_app:basket')).json()[0]['images']
+        self.assertEqual(images, [{'src': image.src(), 'alt': image.alt(), 'srcset': get_srcset('0' * 32, 'jpg'),
+                                   'srcsetWebp': get_srcset('0' * 32, 'webp')}])
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import BasketApiView
+from .views import BasketApiView, BasketBatchApiView
 
 app_name = "basket_app"
 
 urlpatterns = [
     path('api/basket', BasketApiView.as_view(), name='basket'),
+    path('api/basket/batch', BasketBatchApiView.as_view(), name='basket_batch'),
 ]
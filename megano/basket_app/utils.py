@@ -1,18 +1,106 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework.exceptions import ValidationError
+from products_app.cache import get_cache_versions
 from products_app.models import Product
+from products_app.utils import get_products_for_list
 from .serializers import BasketSerializer
 from .basket import Basket
 
+BASKET_PRODUCT_CACHE_KEY = 'basket-product:{pk}:{versions}'
+# модели, от которых зависят данные товара в корзине
+BASKET_CACHE_MODELS = ('product', 'productimage', 'tag', 'review')
+
+
+def get_versions_key() -> str:
+    """
+    Возвращает текущие версии моделей, от которых зависят данные товаров в корзине, одной строкой.
+    :return: строка вида product=1,productimage=2,...
+    """
+    versions = get_cache_versions(BASKET_CACHE_MODELS)
+    return ','.join('{model}={version}'.format(model=model, version=versions[model]) for model in sorted(versions))
+
 
-def get_serialized_data(basket: Basket) -> BasketSerializer.data:
+def get_product_summaries(product_ids: list[int], versions: str) -> dict[int, dict]:
+    """
+    Возвращает сериализованные данные товаров для корзины.
+    Данные каждого товара кэшируются отдельно под ключом с версиями моделей, поэтому после изменения
+    товара, изображения, тега или отзыва старые записи просто перестают находиться.
+    Товары, которых нет в кэше, загружаются и сериализуются одним набором запросов.
+    :param product_ids: идентификаторы товаров
+    :param versions: версии моделей (get_versions_key)
+    :return: словарь, где ключ - идентификатор товара, значение - данные товара. Удаленных товаров в нем нет.
     """
-    Сериализует данные. В контекст передает корзину.
+    keys = {BASKET_PRODUCT_CACHE_KEY.format(pk=pk, versions=versions): pk for pk in product_ids}
+    summaries = {keys[key]: summary for key, summary in cache.get_many(keys).items()}
+
+    missing = [pk for pk in product_ids if pk not in summaries]
+    if missing:
+        # удаленные товары тоже кэшируются (значением False), чтобы не искать их в базе при каждом запросе
+        fresh = dict.fromkeys(missing, False)
+        fresh.update({item['id']: dict(item) for item in BasketSerializer(
+            get_products_for_list(Product.objects.filter(pk__in=missing)), many=True).data})
+        cache.set_many({BASKET_PRODUCT_CACHE_KEY.format(pk=pk, versions=versions): summary
+                        for pk, summary in fresh.items()}, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+        summaries.update(fresh)
+    return {pk: summary for pk, summary in summaries.items() if summary}
+
+
+def get_basket_items(basket: Basket, product_ids: list[int], versions: str) -> list[dict]:
+    """
+    Собирает данные товаров корзины: данные товара из кэша плюс количество и цена из корзины.
     :param basket: Экземпляр класса Basket
+    :param product_ids: идентификаторы товаров, которые нужно вернуть
+    :param versions: версии моделей (get_versions_key)
+    :return: список из словарей с информацией о товарах в корзине.
+    """
+    summaries = get_product_summaries(product_ids, versions=versions)
+    return [dict(summaries[pk],
+                 count=basket.get_count_product_in_basket(product_pk=pk),
+                 price=basket.get_price_product_in_basket(product_pk=pk))
+            for pk in product_ids if pk in summaries]
+
+
+def get_serialized_data(basket: Basket, versions: str | None = None) -> list[dict]:
+    """
+    Сериализует всю корзину.
+    :param basket: Экземпляр класса Basket
+    :param versions: версии моделей (get_versions_key). Если не переданы, берутся из кэша
     :return: Сериализованные данные.
     """
-    return BasketSerializer(Product.objects.prefetch_related(
-        'review', 'product_img', 'tags').select_related('category').filter(pk__in=basket.cart.keys()),
-                                      many=True, context=basket).data
+    return get_basket_items(basket, sorted(int(pk) for pk in basket.cart), versions=versions or get_versions_key())
+
+
+def get_delta_data(basket: Basket, product_ids: list[int], versions: str | None = None) -> dict:
+    """
+    Сериализует только изменившиеся товары корзины.
+    :param basket: Экземпляр класса Basket
+    :param product_ids: идентификаторы товаров, которые были добавлены, изменены или удалены
+    :param versions: версии моделей (get_versions_key). Если не переданы, берутся из кэша
+    :return: словарь, где items - данные товаров, которые остались в корзине, removed - идентификаторы товаров,
+    которых в корзине больше нет.
+    """
+    product_ids = sorted(set(product_ids))
+    remaining = [pk for pk in product_ids if str(pk) in basket.cart]
+    return {
+        'items': get_basket_items(basket, remaining, versions=versions or get_versions_key()) if remaining else [],
+        'removed': [pk for pk in product_ids if str(pk) not in basket.cart],
+    }
+
+
+def get_basket_etag(basket: Basket, versions: str) -> str:
+    """
+    Формирует ETag корзины из ее содержимого, текущих цен и версий моделей, от которых зависят данные товаров.
+    :param basket: Экземпляр класса Basket
+    :param versions: версии моделей (get_versions_key)
+    :return: ETag в кавычках.
+    """
+    prices = sorted((pk, str(price)) for pk, price in basket.get_prices().items())
+    raw = json.dumps([sorted(basket.cart.items()), prices, versions], sort_keys=True)
+    return '"{digest}"'.format(digest=hashlib.md5(raw.encode()).hexdigest())
 
 
 def check_user_input_count(request_data: dict, product: Product, bk: Basket) -> int | ValidationError:
@@ -31,4 +119,56 @@ def check_user_input_count(request_data: dict, product: Product, bk: Basket) ->
     if bk.cart.get(str(product.pk), {}).get('count', 0) + quantity_products_user > product.count:
         raise ValidationError('Количество товаров на складе меньше запрашиваемого.')
 
-    return quantity_products_user
\ No newline at end of file
+    return quantity_products_user
+
+
+def get_batch_counts(operations: list, bk: Basket) -> dict[int, int]:
+    """
+    Применяет операции пакетного изменения корзины к текущим количествам товаров, не изменяя корзину.
+    Операция - словарь с ключами id, action (add, remove или set) и count.
+    :param operations: список операций из запроса
+    :param bk: Экземпляр класса Basket
+    :return: словарь, где ключ - идентификатор товара, значение - итоговое количество товара в корзине.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValidationError('Передайте список операций.')
+
+    counts = {}
+    for operation in operations:
+        try:
+            product_pk, action = int(operation['id']), operation.get('action', 'add')
+            count = int(operation.get('count', 1))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValidationError('Некорректная операция: {operation}.'.format(operation=operation))
+        if action not in ('add', 'remove', 'set') or count < 0 or (action != 'set' and count < 1):
+            raise ValidationError('Некорректная операция: {operation}.'.format(operation=operation))
+
+        current = counts.get(product_pk, bk.get_count_product_in_basket(product_pk=product_pk))
+        if action == 'add':
+            counts[product_pk] = current + count
+        elif action == 'remove':
+            counts[product_pk] = max(current - count, 0)
+        else:
+            counts[product_pk] = count
+    return counts
+
+
+def check_batch_counts(counts: dict[int, int]) -> dict[Product, int]:
+    """
+    Проверяет итоговые количества товаров пакетной операции одним запросом к базе данных.
+    Если каких-то товаров нет или их не хватает на складе, возвращается ошибка со списком всех таких товаров,
+    и корзина не изменяется.
+    :param counts: словарь, где ключ - идентификатор товара, значение - итоговое количество в корзине
+    :return: словарь, где ключ - экземпляр модели Product, значение - итоговое количество в корзине.
+    """
+    products = {product.pk: product for product in Product.objects.only(
+        'pk', 'title', 'price', 'count').filter(pk__in=counts)}
+
+    missing = [pk for pk in counts if pk not in products]
+    if missing:
+        raise ValidationError('Товары не найдены: {ids}.'.format(ids=', '.join(map(str, missing))))
+    not_enough = [product.title for pk, product in products.items() if counts[pk] > product.count]
+    if not_enough:
+        raise ValidationError('Количество товаров на складе меньше запрашиваемого: {titles}.'.format(
+            titles=', '.join(not_enough)))
+    return {product: counts[pk] for pk, product in products.items()}
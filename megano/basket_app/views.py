@@ -1,27 +1,86 @@
+from django.utils.http import parse_etags
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.generics import get_object_or_404
 from products_app.models import Product
 from .basket import Basket
-from .utils import get_serialized_data, check_user_input_count
+from .utils import (get_serialized_data, get_delta_data, get_basket_etag, get_versions_key,
+                    check_user_input_count, get_batch_counts, check_batch_counts)
 
 
-class BasketApiView(APIView):
+class BasketResponseMixin:
+    """
+    Миксин для API-view корзины. Формирует ответ после изменения корзины с ETag ее новой версии.
+    """
+    def get_changed_response(self, request: Request, bk: Basket, product_ids: list[int]) -> Response:
+        """
+        Формирует ответ после изменения корзины: всю корзину или, с параметром delta=true, только измененные товары.
+        :param request: запрос
+        :param bk: Экземпляр класса Basket
+        :param product_ids: идентификаторы товаров, которые были добавлены, изменены или удалены
+        :return: ответ с ETag новой версии корзины.
+        """
+        versions = get_versions_key()
+        etag = get_basket_etag(basket=bk, versions=versions)
+        if request.query_params.get('delta') in ('true', '1'):
+            data = dict(get_delta_data(basket=bk, product_ids=product_ids, versions=versions), version=etag)
+        else:
+            data = get_serialized_data(basket=bk, versions=versions)
+        return self.finalize(Response(data), etag=etag)
+
+    @staticmethod
+    def finalize(response: Response, etag: str) -> Response:
+        """
+        Добавляет в ответ ETag корзины. Корзина своя у каждого пользователя, поэтому кэшировать ее
+        можно только в браузере и только с проверкой ETag.
+        :param response: ответ
+        :param etag: ETag корзины
+        :return: ответ с заголовками ETag и Cache-Control.
+        """
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class BasketApiView(BasketResponseMixin, APIView):
     """
     Класс - API-view. Позволяет получить информацию о корзине, добавить в нее товар или удалить его.
+    Ответ содержит ETag корзины: если корзина не изменилась, get-запрос с If-None-Match получает 304.
+    С параметром delta=true post и delete возвращают только изменившийся товар, а не всю корзину.
     """
     def get(self, request: Request) -> Response:
-        return Response(get_serialized_data(basket=Basket(request)))
+        bk = Basket(request)
+        versions = get_versions_key()
+        etag = get_basket_etag(basket=bk, versions=versions)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return self.finalize(Response(status=status.HTTP_304_NOT_MODIFIED), etag=etag)
+        return self.finalize(Response(get_serialized_data(basket=bk, versions=versions)), etag=etag)
 
     def post(self, request: Request) -> Response:
         bk = Basket(request)
         product = get_object_or_404(Product, id=request.data.get('id', 0))
         bk.add(product, count=check_user_input_count(request.data, product=product, bk=bk))
-        return Response(get_serialized_data(basket=bk))
+        return self.get_changed_response(request, bk=bk, product_ids=[product.pk])
 
     def delete(self, request: Request) -> Response:
         bk = Basket(request)
-        bk.delete(get_object_or_404(Product, id=request.data.get('id', 0)), request.data.get('count', 0))
-        return Response(get_serialized_data(basket=bk))
+        product = get_object_or_404(Product, id=request.data.get('id', 0))
+        bk.delete(product, request.data.get('count', 0))
+        return self.get_changed_response(request, bk=bk, product_ids=[product.pk])
+
 
+class BasketBatchApiView(BasketResponseMixin, APIView):
+    """
+    Класс - API-view. Позволяет изменить количество многих товаров в корзине одним запросом.
+    Принимает список операций вида {"id": 1, "action": "add" | "remove" | "set", "count": 2}.
+    Все товары загружаются одним запросом, наличие на складе проверяется для всего пакета сразу,
+    и если хотя бы одна операция невалидна, корзина не изменяется.
+    """
+    def post(self, request: Request) -> Response:
+        bk = Basket(request)
+        operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        counts = check_batch_counts(get_batch_counts(operations, bk=bk))
+        bk.set_many(counts)
+        return self.get_changed_response(request, bk=bk, product_ids=[product.pk for product in counts])
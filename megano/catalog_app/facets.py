@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+from django.db.models import Count, F, IntegerField, Max, Min, Q, Value
+from django.db.models.functions import Cast, Floor, Least
+from django.db.models.query import QuerySet
+
+from products_app.models import Tag
+from .models import ProductSearchIndex
+
+PRICE_BUCKETS = 5
+
+
+def get_price_buckets(index: QuerySet, min_price: Decimal, max_price: Decimal) -> list[dict]:
+    """
+    Считает гистограмму цен: диапазон от минимальной до максимальной цены делится на PRICE_BUCKETS
+    равных интервалов, номер интервала каждого товара считается в базе данных одним GROUP BY.
+    :param index: QuerySet с записями поискового индекса отфильтрованных товаров
+    :param min_price: минимальная цена среди отфильтрованных товаров
+    :param max_price: максимальная цена среди отфильтрованных товаров
+    :return: список из словарей с границами интервала и количеством товаров в нем.
+    """
+    step = (max_price - min_price) / PRICE_BUCKETS
+    if not step:
+        return [{'min': min_price, 'max': max_price, 'count': index.count()}]
+
+    bucket = Least(
+        Cast(Floor((F('price') - Value(min_price)) / Value(step)), output_field=IntegerField()),
+        Value(PRICE_BUCKETS - 1),
+    )
+    counts = dict(index.annotate(bucket=bucket).values('bucket').annotate(count=Count('pk')).values_list(
+        'bucket', 'count').order_by())
+    return [{
+        'min': round(min_price + step * number, 2),
+        'max': max_price if number == PRICE_BUCKETS - 1 else round(min_price + step * (number + 1), 2),
+        'count': counts.get(number, 0),
+    } for number in range(PRICE_BUCKETS)]
+
+
+def get_facets(products: QuerySet) -> dict:
+    """
+    Считает количество отфильтрованных товаров по тегам, категориям, бесплатной доставке, наличию
+    и интервалам цены. Количество запросов не зависит ни от числа товаров, ни от числа значений фильтров:
+    один агрегат по поисковому индексу (всего, бесплатная доставка, в наличии, минимальная и максимальная цена),
+    один GROUP BY по интервалам цены, один GROUP BY по категориям и один по связям товаров с тегами.
+    Счетчики считаются по уже отфильтрованным товарам.
+    :param products: QuerySet с отфильтрованными товарами (результат main_filter)
+    :return: словарь со счетчиками для боковой панели каталога.
+    """
+    product_ids = products.order_by().values('pk')
+    index = ProductSearchIndex.objects.filter(product_id__in=product_ids)
+
+    summary = index.aggregate(
+        total=Count('pk'),
+        free_delivery=Count('pk', filter=Q(freeDelivery=True)),
+        available=Count('pk', filter=Q(available=True)),
+        min_price=Min('price'),
+        max_price=Max('price'),
+    )
+    if not summary['total']:
+        return {'total': 0, 'freeDelivery': 0, 'available': 0, 'prices': [], 'categories': [], 'tags': []}
+
+    categories = index.exclude(category=None).values('category_id', 'category__title').annotate(
+        count=Count('pk')).order_by('-count', 'category_id')
+    tags = Tag.product.through.objects.filter(product_id__in=product_ids).values('tag_id', 'tag__name').annotate(
+        count=Count('pk')).order_by('-count', 'tag_id')
+
+    return {
+        'total': summary['total'],
+        'freeDelivery': summary['free_delivery'],
+        'available': summary['available'],
+        'prices': get_price_buckets(index=index, min_price=summary['min_price'], max_price=summary['max_price']),
+        'categories': [{'id': item['category_id'], 'title': item['category__title'], 'count': item['count']}
+                       for item in categories],
+        'tags': [{'id': item['tag_id'], 'name': item['tag__name'], 'count': item['count']} for item in tags],
+    }
@@ -0,0 +1,158 @@
+import re
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Func, Prefetch, QuerySet, Value
+
+from products_app.models import Product, ProductSpecification, Tag
+
+FULLTEXT_TABLE = 'catalog_product_fts'
+# веса колонок при ранжировании: название, описание, полное описание, теги, характеристики
+COLUMN_WEIGHTS = (10.0, 3.0, 1.0, 5.0, 2.0)
+POSTGRES_WEIGHTS = ('A', 'B', 'D', 'A', 'C')
+
+
+def is_fulltext_supported() -> bool:
+    """
+    Проверяет, поддерживает ли база данных полнотекстовый поиск: FTS5 в SQLite или tsvector в PostgreSQL.
+    :return: True, если таблица полнотекстового поиска есть.
+    """
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def get_search_terms(query: str) -> list[str]:
+    """
+    Разбивает поисковый запрос на слова в нижнем регистре. Знаки препинания и операторы отбрасываются.
+    :param query: поисковый запрос
+    :return: список слов.
+    """
+    return re.findall(r'\w+', query.lower())
+
+
+def get_document_columns(product: Product) -> tuple[str, ...]:
+    """
+    Формирует текст документа товара для полнотекстового поиска.
+    :param product: экземпляр модели Product с предзагруженными тегами и характеристиками
+    :return: кортеж из названия, описания, полного описания, тегов и характеристик.
+    """
+    return (
+        product.title,
+        product.description,
+        product.fullDescription,
+        ' '.join(tag.name for tag in product.tags.all()),
+        ' '.join('{name} {value}'.format(name=specification.name, value=specification.value)
+                 for specification in product.specification.all()),
+    )
+
+
+def update_search_documents(product_ids: Iterable[int]):
+    """
+    Пересчитывает документы полнотекстового поиска товаров. Документы удаленных товаров удаляются.
+    :param product_ids: идентификаторы товаров
+    """
+    product_ids = [int(pk) for pk in set(product_ids)]
+    if not product_ids or not is_fulltext_supported():
+        return
+
+    products = Product.objects.filter(pk__in=product_ids).only(
+        'pk', 'title', 'description', 'fullDescription'
+    ).prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('pk', 'name')),
+        Prefetch('specification', queryset=ProductSpecification.objects.only('pk', 'name', 'value', 'product_id')),
+    )
+    rows = [(product.pk, *get_document_columns(product)) for product in products]
+
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {table} WHERE product_id IN ({params})'.format(
+            table=FULLTEXT_TABLE, params=', '.join(['%s'] * len(product_ids))), product_ids)
+        if not rows:
+            return
+        if connection.vendor == 'sqlite':
+            cursor.executemany(
+                'INSERT INTO {table} (product_id, title, description, full_description, tags, specifications) '
+                'VALUES (%s, %s, %s, %s, %s, %s)'.format(table=FULLTEXT_TABLE), rows)
+        else:
+            document = ' || '.join("setweight(to_tsvector('simple', %s), '{weight}')".format(weight=weight)
+                                   for weight in POSTGRES_WEIGHTS)
+            cursor.executemany('INSERT INTO {table} (product_id, document) VALUES (%s, {document})'.format(
+                table=FULLTEXT_TABLE, document=document), rows)
+
+
+def rebuild_search_documents(batch_size: int = 500):
+    """
+    Полностью пересобирает документы полнотекстового поиска.
+    :param batch_size: количество товаров, обрабатываемых за один проход
+    """
+    if not is_fulltext_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {table}'.format(table=FULLTEXT_TABLE))
+    product_ids = list(Product.objects.values_list('pk', flat=True))
+    for start in range(0, len(product_ids), batch_size):
+        update_search_documents(product_ids[start:start + batch_size])
+
+
+class SearchDocumentSQL(Func):
+    """
+    Фрагмент SQL над документом полнотекстового поиска товара.
+    Таблица документов подставляется в шаблон по алиасу JOIN'а, поэтому фрагмент работает и во вложенных запросах.
+    """
+    def __init__(self, sql: str, params: list, output_field):
+        super().__init__(F('search_document'), output_field=output_field)
+        self.sql, self.params = sql, params
+
+    def as_sql(self, compiler, connection, **extra_context):
+        document, = self.get_source_expressions()
+        return self.sql.format(table=compiler.quote_name_unless_alias(document.alias)), list(self.params)
+
+
+def filter_by_search(products: QuerySet, query: str, rank: bool = False) -> QuerySet | None:
+    """
+    Отбирает товары, найденные полнотекстовым поиском, JOIN'ом с таблицей документов.
+    Каждое слово запроса ищется как префикс, товар должен содержать все слова.
+    Фильтрация и ранжирование выполняются в том же SQL-запросе, что и остальные фильтры каталога.
+    :param products: QuerySet с товарами
+    :param query: поисковый запрос
+    :param rank: добавить аннотацию search_rank (bm25 в SQLite FTS5 или ts_rank в PostgreSQL),
+    чем меньше значение, тем релевантнее товар
+    :return: отфильтрованный QuerySet или None, если база данных не поддерживает полнотекстовый поиск.
+    """
+    if not is_fulltext_supported():
+        return None
+    terms = get_search_terms(query)
+    if not terms:
+        # запрос без слов ничего не находит, но аннотация нужна для сортировки по релевантности
+        products = products.none()
+        return products.annotate(search_rank=Value(0.0, output_field=FloatField())) if rank else products
+
+    if connection.vendor == 'sqlite':
+        # в FTS5 скрытая колонка с именем таблицы обозначает весь документ
+        document = '{{table}}."{table}"'.format(table=FULLTEXT_TABLE)
+        match = SearchDocumentSQL('{document} MATCH %s'.format(document=document),
+                                  [' '.join('"{term}"*'.format(term=term) for term in terms)], BooleanField())
+        search_rank = SearchDocumentSQL('bm25({document}, 0, {weights})'.format(
+            document=document, weights=', '.join(map(str, COLUMN_WEIGHTS))), [], FloatField())
+    else:
+        ts_query = ' & '.join('{term}:*'.format(term=term) for term in terms)
+        match = SearchDocumentSQL('{table}."document" @@ to_tsquery(\'simple\', %s)', [ts_query], BooleanField())
+        search_rank = SearchDocumentSQL('-ts_rank({table}."document", to_tsquery(\'simple\', %s))',
+                                        [ts_query], FloatField())
+    products = products.filter(search_document__isnull=False).filter(match)
+    if rank:
+        products = products.annotate(search_rank=search_rank)
+    return products
+
+
+def search_products(query: str, limit: int | None = None) -> list[int] | None:
+    """
+    Ищет товары по названию, описаниям, тегам и характеристикам.
+    :param query: поисковый запрос
+    :param limit: максимальное количество результатов
+    :return: идентификаторы товаров от более релевантных к менее релевантным
+    или None, если база данных не поддерживает полнотекстовый поиск.
+    """
+    products = filter_by_search(Product.objects.all(), query, rank=True)
+    if products is None:
+        return None
+    product_ids = products.order_by('search_rank', 'pk').values_list('pk', flat=True)
+    return list(product_ids[:limit] if limit else product_ids)
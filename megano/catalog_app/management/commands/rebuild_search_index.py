@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from catalog_app.fulltext import rebuild_search_documents
+from catalog_app.models import ProductSearchIndex
+from catalog_app.search_index import refresh_search_index
+
+
+class Command(BaseCommand):
+    """
+    Команда полностью пересобирает поисковый индекс каталога и документы полнотекстового поиска.
+    Нужна после загрузки фикстур и при первом развертывании.
+    """
+    help = 'Пересобирает поисковый индекс каталога'
+
+    def handle(self, *args, **options):
+        ProductSearchIndex.objects.all().delete()
+        refresh_search_index()
+        rebuild_search_documents()
+        self.stdout.write(self.style.SUCCESS(
+            'Проиндексировано товаров: {count}'.format(count=ProductSearchIndex.objects.count())
+        ))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0001_initial'),
+        ('catalog_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchIndex',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to='products_app.product', verbose_name='Товар')),
+                ('title_tokens', models.CharField(blank=True, max_length=256, verbose_name='Слова из названия')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена с учетом акции')),
+                ('tags_mask', models.BigIntegerField(default=0, verbose_name='Битовая маска тегов')),
+                ('reviews_count', models.IntegerField(default=0, verbose_name='Количество отзывов')),
+                ('rating', models.IntegerField(default=0, verbose_name='Количество звёзд')),
+                ('date', models.DateField(verbose_name='Дата создания')),
+                ('freeDelivery', models.BooleanField(default=False, verbose_name='Бесплатная доставка')),
+                ('available', models.BooleanField(default=False, verbose_name='В наличии')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog_app.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+                'ordering': ('pk',),
+                'indexes': [models.Index(fields=['price'], name='catalog_app_price_db5337_idx'), models.Index(fields=['category', 'price'], name='catalog_app_categor_032b25_idx'), models.Index(fields=['available', 'price'], name='catalog_app_availab_96a419_idx'), models.Index(fields=['rating'], name='catalog_app_rating_554647_idx'), models.Index(fields=['reviews_count'], name='catalog_app_reviews_b2f831_idx'), models.Index(fields=['date'], name='catalog_app_date_81acab_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:30
+
+from django.db import migrations
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE catalog_product_fts USING fts5(
+    product_id UNINDEXED, title, description, full_description, tags, specifications,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+SQLITE_FILL = """
+INSERT INTO catalog_product_fts (product_id, title, description, full_description, tags, specifications)
+SELECT product.id, product.title, product.description, product."fullDescription",
+       COALESCE((SELECT GROUP_CONCAT(tag.name, ' ') FROM products_app_tag tag
+                 JOIN products_app_tag_product link ON link.tag_id = tag.id
+                 WHERE link.product_id = product.id), ''),
+       COALESCE((SELECT GROUP_CONCAT(spec.name || ' ' || spec.value, ' ') FROM products_app_productspecification spec
+                 WHERE spec.product_id = product.id), '')
+FROM products_app_product product
+"""
+
+POSTGRES_CREATE = """
+CREATE TABLE catalog_product_fts (
+    product_id bigint PRIMARY KEY REFERENCES products_app_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+    document tsvector NOT NULL
+)
+"""
+
+POSTGRES_INDEX = """
+CREATE INDEX catalog_product_fts_document_gin ON catalog_product_fts USING GIN (document)
+"""
+
+POSTGRES_FILL = """
+INSERT INTO catalog_product_fts (product_id, document)
+SELECT product.id,
+       setweight(to_tsvector('simple', product.title), 'A')
+       || setweight(to_tsvector('simple', product.description), 'B')
+       || setweight(to_tsvector('simple', product."fullDescription"), 'D')
+       || setweight(to_tsvector('simple', COALESCE((
+              SELECT string_agg(tag.name, ' ') FROM products_app_tag tag
+              JOIN products_app_tag_product link ON link.tag_id = tag.id
+              WHERE link.product_id = product.id), '')), 'A')
+       || setweight(to_tsvector('simple', COALESCE((
+              SELECT string_agg(spec.name || ' ' || spec.value, ' ') FROM products_app_productspecification spec
+              WHERE spec.product_id = product.id), '')), 'C')
+FROM products_app_product product
+"""
+
+
+def create_fulltext_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        statements = (SQLITE_CREATE, SQLITE_FILL)
+    elif schema_editor.connection.vendor == 'postgresql':
+        statements = (POSTGRES_CREATE, POSTGRES_INDEX, POSTGRES_FILL)
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_fulltext_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE catalog_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog_app', '0002_product_search_index'),
+        ('products_app', '0004_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_table, drop_fulltext_table),
+    ]
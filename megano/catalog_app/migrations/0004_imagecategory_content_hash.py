@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog_app', '0003_product_fulltext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagecategory',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Хеш содержимого изображения'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.1 on 2026-10-17 23:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0008_review_popularity_counted'),
+        ('catalog_app', '0004_imagecategory_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='products_app.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Документ полнотекстового поиска',
+                'verbose_name_plural': 'Документы полнотекстового поиска',
+                'db_table': 'catalog_product_fts',
+                'managed': False,
+            },
+        ),
+    ]
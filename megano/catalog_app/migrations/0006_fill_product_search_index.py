@@ -0,0 +1,49 @@
+# Generated by Django 4.2.1 on 2026-10-17 23:20
+
+from django.db import migrations
+
+TAG_MASK_BITS = 63
+BATCH_SIZE = 500
+
+
+def fill_search_index(apps, schema_editor):
+    Product = apps.get_model('products_app', 'Product')
+    ProductSearchIndex = apps.get_model('catalog_app', 'ProductSearchIndex')
+    entries = []
+    for product in Product.objects.prefetch_related('tags').iterator(chunk_size=BATCH_SIZE):
+        tags_mask = 0
+        for tag in product.tags.all():
+            if tag.pk < TAG_MASK_BITS:
+                tags_mask |= 1 << tag.pk
+        entries.append(ProductSearchIndex(
+            product_id=product.pk,
+            title_tokens=' '.join(product.title.lower().split()),
+            price=product.effective_price,
+            tags_mask=tags_mask,
+            category_id=product.category_id,
+            reviews_count=product.reviews_count,
+            rating=product.rating,
+            date=product.date,
+            freeDelivery=product.freeDelivery,
+            available=product.count > 0,
+        ))
+    ProductSearchIndex.objects.bulk_create(
+        entries,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=('product',),
+        update_fields=('title_tokens', 'price', 'tags_mask', 'category', 'reviews_count',
+                       'rating', 'date', 'freeDelivery', 'available'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog_app', '0005_product_search_document'),
+        ('products_app', '0004_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
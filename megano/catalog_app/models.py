@@ -1,4 +1,5 @@
 from django.db import models
+from media_app.derivatives import get_srcset
 
 
 def category_path(instance: 'ImageCategory', filename: str) -> str:
@@ -45,6 +46,8 @@ class ImageCategory(models.Model):
     Модель изображения категории.
     """
     image = models.ImageField(upload_to=category_path, default='', verbose_name='Изображение')
+    content_hash = models.CharField(max_length=32, blank=True, default='', editable=False,
+                                    verbose_name='Хеш содержимого изображения')
     category = models.ForeignKey(Category, on_delete=models.CASCADE,
                                  related_name='category_img', verbose_name='Категория')
 
@@ -69,8 +72,74 @@ class ImageCategory(models.Model):
         """
         return self.category.title
 
+    def srcset(self):
+        """
+        Метод для сериализатора.
+        :return: уменьшенные копии изображения в формате JPEG для атрибута srcset.
+        """
+        return get_srcset(self.content_hash, 'jpg')
+
+    def srcset_webp(self):
+        """
+        Метод для сериализатора.
+        :return: уменьшенные копии изображения в формате WebP для атрибута srcset.
+        """
+        return get_srcset(self.content_hash, 'webp')
+
     def __str__(self):
         return 'Изображение {category}.'.format(
             category=self.category
         )
 
+
+class ProductSearchIndex(models.Model):
+    """
+    Модель поискового индекса каталога.
+    Денормализованная запись о товаре, по которой фильтруется и сортируется каталог без JOIN'ов по тегам и отзывам.
+    """
+    product = models.OneToOneField('products_app.Product', on_delete=models.CASCADE, primary_key=True,
+                                   related_name='search_index', verbose_name='Товар')
+    title_tokens = models.CharField(max_length=256, blank=True, null=False, verbose_name='Слова из названия')
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Цена с учетом акции')
+    tags_mask = models.BigIntegerField(default=0, verbose_name='Битовая маска тегов')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True,
+                                 related_name='+', verbose_name='Категория')
+    reviews_count = models.IntegerField(default=0, verbose_name='Количество отзывов')
+    rating = models.IntegerField(default=0, verbose_name='Количество звёзд')
+    date = models.DateField(verbose_name='Дата создания')
+    freeDelivery = models.BooleanField(default=False, verbose_name='Бесплатная доставка')
+    available = models.BooleanField(default=False, verbose_name='В наличии')
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        ordering = ('pk',)
+        indexes = [
+            models.Index(fields=('price',)),
+            models.Index(fields=('category', 'price')),
+            models.Index(fields=('available', 'price')),
+            models.Index(fields=('rating',)),
+            models.Index(fields=('reviews_count',)),
+            models.Index(fields=('date',)),
+        ]
+
+    def __str__(self):
+        return 'Индекс товара #{pk}'.format(pk=self.pk)
+
+
+class ProductSearchDocument(models.Model):
+    """
+    Документ полнотекстового поиска товара.
+    Таблица создается миграцией (FTS5 в SQLite, tsvector в PostgreSQL), модель нужна только для JOIN в запросах каталога.
+    """
+    product = models.OneToOneField('products_app.Product', on_delete=models.DO_NOTHING, primary_key=True,
+                                   related_name='search_document', verbose_name='Товар')
+
+    class Meta:
+        managed = False
+        db_table = 'catalog_product_fts'
+        verbose_name = 'Документ полнотекстового поиска'
+        verbose_name_plural = 'Документы полнотекстового поиска'
+
+    def __str__(self):
+        return 'Документ товара #{pk}'.format(pk=self.pk)
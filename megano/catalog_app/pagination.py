@@ -0,0 +1,182 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, OrderBy, Q
+from django.db.models.query import QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+class CatalogPagination(PageNumberPagination):
+    """
+    Постраничная пагинация в формате фронтенда: номер страницы приходит в currentPage, размер - в limit.
+    """
+    page_query_param = 'currentPage'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def get_paginated_response(self, data) -> Response:
+        """
+        Формирует ответ с товарами и информацией о страницах.
+        :param data: сериализованные данные страницы
+        :return: ответ с ключами items, currentPage и lastPage.
+        """
+        return Response({
+            'items': data,
+            'currentPage': self.page.number,
+            'lastPage': self.page.paginator.num_pages,
+        })
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset/cursor). Вместо OFFSET запоминает значения полей сортировки последней записи
+    и продолжает выборку условием WHERE (поле, pk) > (значение, pk), поэтому любая страница стоит как первая.
+    Порядок берется из order_by переданного QuerySet. Последним полем сортировки должен быть pk.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 20
+    max_page_size = 100
+
+    def get_page_size(self, request: Request) -> int:
+        """
+        Возвращает размер страницы из запроса.
+        :param request: запрос
+        :return: размер страницы, ограниченный max_page_size.
+        """
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    @staticmethod
+    def get_ordering(queryset: QuerySet) -> list[str]:
+        """
+        Возвращает поля сортировки QuerySet. Если среди них нет pk, добавляет его для однозначности курсора.
+        :param queryset: QuerySet
+        :return: список полей сортировки.
+        """
+        ordering = list(queryset.query.order_by) or ['pk']
+        if ordering[-1].lstrip('-') not in ('pk', 'id'):
+            ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+        return ordering
+
+    def decode_cursor(self, request: Request, length: int) -> list | None:
+        """
+        Декодирует курсор из запроса.
+        :param request: запрос
+        :param length: количество полей сортировки
+        :return: значения полей сортировки последней записи предыдущей страницы или None для первой страницы.
+        Возвращает ошибку 404, если курсор поврежден или не подходит к сортировке.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound('Некорректный курсор.')
+        if (not isinstance(values, list) or len(values) != length or values[-1] is None
+                or any(isinstance(value, (list, dict)) for value in values)):
+            raise NotFound('Некорректный курсор.')
+        return values
+
+    @staticmethod
+    def encode_cursor(values: list) -> str:
+        """
+        Кодирует значения полей сортировки в курсор.
+        :param values: значения полей сортировки
+        :return: строка курсора.
+        """
+        return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+    @staticmethod
+    def get_order_by(ordering: list[str]) -> list[OrderBy]:
+        """
+        Превращает поля сортировки в выражения с явным местом NULL: NULL считается меньше любого значения,
+        как в SQLite, поэтому при сортировке по возрастанию он идет первым, по убыванию - последним.
+        Например, у товара без строки поискового индекса цена NULL.
+        :param ordering: поля сортировки
+        :return: список выражений для order_by.
+        """
+        return [F(field[1:]).desc(nulls_last=True) if field.startswith('-') else F(field).asc(nulls_first=True)
+                for field in ordering]
+
+    @staticmethod
+    def get_cursor_filter(ordering: list[str], values: list) -> Q:
+        """
+        Строит условие "после курсора" для лексикографического порядка по нескольким полям.
+        NULL учитывается так же, как в get_order_by: он меньше любого значения.
+        :param ordering: поля сортировки
+        :param values: значения полей последней записи предыдущей страницы
+        :return: объект Q.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            is_null = Q(**{'{name}__isnull'.format(name=name): True})
+            if value is None:
+                # после NULL по возрастанию идут все значения, по убыванию - ничего
+                after = None if descending else ~is_null
+                field_equal = is_null
+            else:
+                lookup = 'lt' if descending else 'gt'
+                after = Q(**{'{name}__{lookup}'.format(name=name, lookup=lookup): value})
+                if descending:
+                    after |= is_null
+                field_equal = Q(**{name: value})
+            if after is not None:
+                condition |= equal & after
+            equal &= field_equal
+        return condition
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> list:
+        """
+        Возвращает страницу записей после курсора.
+        :param queryset: отсортированный QuerySet
+        :param request: запрос
+        :param view: представление
+        :return: список записей страницы. Возвращает ошибку 404, если курсор не подходит к полям сортировки.
+        """
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        values = self.decode_cursor(request, length=len(self.ordering))
+        cursor_fields = {
+            '_cursor_{index}'.format(index=index): F(field.lstrip('-'))
+            for index, field in enumerate(self.ordering)
+        }
+        try:
+            if values is not None:
+                queryset = queryset.filter(self.get_cursor_filter(self.ordering, values))
+            page = list(queryset.annotate(**cursor_fields).order_by(
+                *self.get_order_by(self.ordering))[:self.page_size + 1])
+        except (TypeError, ValueError, ValidationError):
+            if values is None:
+                raise
+            raise NotFound('Некорректный курсор.')
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+
+        self.next_cursor = None
+        if self.has_next:
+            self.next_cursor = self.encode_cursor([getattr(page[-1], name) for name in cursor_fields])
+        return page
+
+    def get_paginated_response(self, data) -> Response:
+        """
+        Формирует ответ со страницей и курсором на следующую.
+        :param data: сериализованные данные страницы
+        :return: ответ с ключами items и nextCursor.
+        """
+        return Response({
+            'items': data,
+            'nextCursor': self.next_cursor,
+        })
@@ -0,0 +1,88 @@
+from typing import Iterable
+
+from django.db.models import OuterRef, Subquery
+
+from products_app.models import Product
+from .models import ProductSearchIndex
+
+TAG_MASK_BITS = 63  # столько тегов помещается в знаковое 64-битное поле tags_mask
+
+INDEX_UPDATE_FIELDS = ('title_tokens', 'price', 'tags_mask', 'category', 'reviews_count',
+                       'rating', 'date', 'freeDelivery', 'available')
+
+
+def get_title_tokens(title: str) -> str:
+    """
+    Разбивает название товара на слова в нижнем регистре.
+    :param title: название товара
+    :return: нормализованная строка со словами названия.
+    """
+    return ' '.join(title.lower().split())
+
+
+def get_tags_mask(tag_ids: Iterable[int]) -> int:
+    """
+    Собирает битовую маску из идентификаторов тегов.
+    Теги с идентификатором больше TAG_MASK_BITS в маску не попадают и фильтруются через JOIN.
+    :param tag_ids: идентификаторы тегов
+    :return: битовая маска тегов.
+    """
+    mask = 0
+    for tag_id in tag_ids:
+        if int(tag_id) < TAG_MASK_BITS:
+            mask |= 1 << int(tag_id)
+    return mask
+
+
+def build_index_entry(product: Product) -> ProductSearchIndex:
+    """
+    Формирует запись поискового индекса для товара.
+    :param product: экземпляр модели Product с предзагруженными тегами
+    :return: несохраненный экземпляр ProductSearchIndex.
+    """
+    return ProductSearchIndex(
+        product_id=product.pk,
+        title_tokens=get_title_tokens(product.title),
+        price=product.effective_price,
+        tags_mask=get_tags_mask(tag.pk for tag in product.tags.all()),
+        category_id=product.category_id,
+        reviews_count=product.reviews_count,
+        rating=product.rating,
+        date=product.date,
+        freeDelivery=product.freeDelivery,
+        available=product.count > 0,
+    )
+
+
+def refresh_search_index(product_ids: Iterable[int] | None = None, batch_size: int = 500):
+    """
+    Пересчитывает записи поискового индекса.
+    :param product_ids: идентификаторы товаров. Если не переданы, пересчитывается весь индекс.
+    :param batch_size: количество записей, сохраняемых одним запросом
+    """
+    products = Product.objects.prefetch_related('tags')
+    if product_ids is not None:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        products = products.filter(pk__in=product_ids)
+
+    ProductSearchIndex.objects.bulk_create(
+        [build_index_entry(product) for product in products],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=('product',),
+        update_fields=INDEX_UPDATE_FIELDS,
+    )
+
+
+def refresh_review_aggregates(product_id: Product.pk):
+    """
+    Копирует количество отзывов и среднюю оценку товара в поисковый индекс одним UPDATE.
+    :param product_id: идентификатор товара
+    """
+    product = Product.objects.filter(pk=OuterRef('product_id'))
+    ProductSearchIndex.objects.filter(product_id=product_id).update(
+        reviews_count=Subquery(product.values('reviews_count')),
+        rating=Subquery(product.values('rating')),
+    )
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from media_app.utils import get_image_data
 from .models import Category
 
 
@@ -15,28 +16,26 @@ class CategoryImageMixin(serializers.Serializer):
         """
         try:
             image = instance.category_img.all()[0]
-            return {'src': image.src(), 'alt': image.alt()}
+            return get_image_data(image)
         except IndexError:
             return {}
 
 
-class SubCategorySerializer(CategoryImageMixin, serializers.ModelSerializer):
+class CategoryTreeSerializer(CategoryImageMixin, serializers.ModelSerializer):
     """
     Класс сериализатор. Основан на модели категории.
+    Рекурсивно сериализует дерево категорий любой глубины, собранное функцией build_category_tree.
     """
-
-    class Meta:
-        model = Category
-        fields = ('id', 'title', 'image')
-
-
-
-class CategorySerializer(CategoryImageMixin, serializers.ModelSerializer):
-    """
-    Класс сериализатор. Основан на модели категории.
-    """
-    subcategories = SubCategorySerializer(many=True, read_only=True, required=False)
+    subcategories = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
         fields = ('id', 'title', 'image', 'subcategories')
+
+    def get_subcategories(self, instance: Category) -> list[dict]:
+        """
+        Метод сериализатора. Возвращает подкатегории.
+        :param instance: экземпляр модели Category с атрибутом tree_children
+        :return: список сериализованных подкатегорий.
+        """
+        return CategoryTreeSerializer(instance.tree_children, many=True, context=self.context).data
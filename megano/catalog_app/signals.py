@@ -0,0 +1,133 @@
+from functools import partial
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from products_app.cache import bump_cache_version
+from products_app.models import Product, ProductSpecification, Tag
+from products_app.signals import review_aggregates_changed, products_stock_changed, product_prices_changed
+from .models import Category, ImageCategory
+from .fulltext import update_search_documents
+from .search_index import refresh_search_index, refresh_review_aggregates
+from .suggest import suggest_index, PRODUCT, TAG, CATEGORY
+
+
+def refresh_product_indexes(product_ids: Iterable[int]):
+    """
+    Обновляет поисковый индекс каталога и документы полнотекстового поиска товаров.
+    :param product_ids: идентификаторы товаров
+    """
+    refresh_search_index(product_ids=product_ids)
+    update_search_documents(product_ids)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance: Product, raw: bool = False, **kwargs):
+    """
+    Обновляет запись поискового индекса и документ полнотекстового поиска после сохранения товара.
+    При загрузке фикстур (raw) индекс не трогается: его нужно пересобрать командой rebuild_search_index.
+    """
+    if not raw:
+        refresh_product_indexes(product_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance: Product, **kwargs):
+    """Удаляет документ полнотекстового поиска удаленного товара."""
+    update_search_documents([instance.pk])
+
+
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def index_product_specification(sender, instance: ProductSpecification, raw: bool = False, **kwargs):
+    """Обновляет документ полнотекстового поиска товара после изменения его характеристик."""
+    if not raw and instance.product_id is not None:
+        update_search_documents([instance.product_id])
+
+
+@receiver(m2m_changed, sender=Tag.product.through)
+def index_product_tags(sender, instance: Tag | Product, action: str, reverse: bool, pk_set: set | None, **kwargs):
+    """
+    Обновляет маску тегов в поисковом индексе и теги в документах полнотекстового поиска.
+    Если изменение идет со стороны товара (product.tags), то пересчитывается только этот товар,
+    иначе - все товары, которых коснулось изменение тега.
+    """
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_product_indexes(product_ids=[instance.pk])
+        return
+
+    if action == 'pre_clear':
+        instance._indexed_product_ids = list(instance.product.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        refresh_product_indexes(product_ids=getattr(instance, '_indexed_product_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_product_indexes(product_ids=pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def index_renamed_tag(sender, instance: Tag, created: bool, raw: bool = False, **kwargs):
+    """Обновляет документы полнотекстового поиска товаров после переименования тега."""
+    if not created and not raw:
+        update_search_documents(instance.product.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tag_products(sender, instance: Tag, **kwargs):
+    """Запоминает товары удаляемого тега: после удаления связи с ними уже не получить."""
+    instance._indexed_product_ids = list(instance.product.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def index_deleted_tag(sender, instance: Tag, **kwargs):
+    """Убирает удаленный тег из маски тегов товаров и из документов полнотекстового поиска."""
+    refresh_product_indexes(product_ids=getattr(instance, '_indexed_product_ids', []))
+
+
+@receiver(products_stock_changed)
+@receiver(product_prices_changed)
+def index_changed_products(sender, product_ids: list, **kwargs):
+    """Обновляет наличие и цену товаров в поисковом индексе после изменения запросом UPDATE."""
+    refresh_search_index(product_ids=product_ids)
+
+
+@receiver(review_aggregates_changed)
+def index_review_aggregates(sender, product_id: int, **kwargs):
+    """Переносит количество отзывов и среднюю оценку товара в поисковый индекс."""
+    refresh_review_aggregates(product_id=product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ImageCategory)
+@receiver(post_delete, sender=ImageCategory)
+def invalidate_cached_categories(sender, **kwargs):
+    """Меняет версию категорий или их изображений в кэше, чтобы закэшированные ответы устарели."""
+    bump_cache_version(sender)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Category)
+def suggest_saved_object(sender, instance: Product | Tag | Category, **kwargs):
+    """
+    Добавляет или обновляет название товара, тега или категории в индексе подсказок.
+    Индекс и его версия меняются после фиксации транзакции: при откате в индексе не остается лишних названий,
+    а другие процессы не перестраивают индекс по незафиксированным данным.
+    """
+    if sender is Tag:
+        kind, title = TAG, instance.name
+    else:
+        kind, title = PRODUCT if sender is Product else CATEGORY, instance.title
+    transaction.on_commit(partial(suggest_index.update, kind, instance.pk, title))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Category)
+def unsuggest_deleted_object(sender, instance: Product | Tag | Category, **kwargs):
+    """Удаляет товар, тег или категорию из индекса подсказок после фиксации транзакции."""
+    transaction.on_commit(partial(suggest_index.remove, {Product: PRODUCT, Tag: TAG, Category: CATEGORY}[sender],
+                                  instance.pk))
@@ -0,0 +1,174 @@
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.core.cache import cache
+
+from products_app.models import Product, Tag
+from .models import Category
+
+SUGGEST_VERSION_KEY = 'suggest-index-version'
+# виды записей индекса. Идентификатор записи хранится как id * 4 + вид, чтобы уместить ссылку в одно число
+PRODUCT, TAG, CATEGORY = 0, 1, 2
+KIND_NAMES = {PRODUCT: 'product', TAG: 'tag', CATEGORY: 'category'}
+
+
+def get_words(text: str) -> list[str]:
+    """
+    Разбивает текст на слова в нижнем регистре.
+    :param text: текст
+    :return: список уникальных слов в порядке появления.
+    """
+    return list(dict.fromkeys(re.findall(r'\w+', text.lower())))
+
+
+class SuggestIndex:
+    """
+    Префиксный индекс в памяти процесса для подсказок строки поиска по названиям товаров, тегов и категорий.
+    Хранится как отсортированный массив слов (keys) и параллельный ему массив ссылок на записи (refs):
+    поиск по префиксу - это bisect по keys, а не запрос к базе данных. Одинаковые слова хранятся
+    одной строкой (sys.intern), ссылки - 64-битными числами в array, названия - в словаре по ссылке.
+    Индекс строится при первом обращении и дальше обновляется сигналами моделей. Номер версии индекса
+    хранится в кэше: если его изменил другой процесс, индекс этого процесса перестраивается.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.keys: list[str] = []
+        self.refs = array('q')
+        self.titles: dict[int, str] = {}
+        self.version = None
+
+    @staticmethod
+    def get_ref(kind: int, pk: int) -> int:
+        """
+        Кодирует вид и идентификатор записи в одно число.
+        :param kind: вид записи (PRODUCT, TAG или CATEGORY)
+        :param pk: идентификатор записи
+        :return: ссылка на запись.
+        """
+        return pk * 4 + kind
+
+    def build(self):
+        """
+        Строит индекс заново тремя запросами: товары, теги и категории.
+        Если версии в кэше нет (кэш очищен или запись вытеснена), она создается, иначе индекс считался бы
+        устаревшим и перестраивался при каждом запросе.
+        """
+        with self.lock:
+            cache.add(SUGGEST_VERSION_KEY, time.time_ns(), timeout=None)
+            version = cache.get(SUGGEST_VERSION_KEY)
+            entries = []
+            titles = {}
+            for kind, items in ((PRODUCT, Product.objects.values_list('pk', 'title')),
+                                (TAG, Tag.objects.values_list('pk', 'name')),
+                                (CATEGORY, Category.objects.values_list('pk', 'title'))):
+                for pk, title in items:
+                    ref = self.get_ref(kind, pk)
+                    titles[ref] = title
+                    entries.extend((sys.intern(word), ref) for word in get_words(title))
+            entries.sort()
+            self.keys = [word for word, ref in entries]
+            self.refs = array('q', (ref for word, ref in entries))
+            self.titles = titles
+            self.version = version
+
+    def ensure_actual(self):
+        """Строит индекс, если он еще не построен или устарел из-за изменений в другом процессе."""
+        if self.version is None or cache.get(SUGGEST_VERSION_KEY) != self.version:
+            self.build()
+
+    def bump_version(self):
+        """
+        Увеличивает версию индекса в кэше после изменения.
+        Если до изменения индекс этого процесса был актуален, он остается актуальным и с новой версией.
+        """
+        try:
+            version = cache.incr(SUGGEST_VERSION_KEY)
+        except ValueError:
+            # версия создается из текущего времени, чтобы не совпасть ни с одной из использованных ранее
+            cache.add(SUGGEST_VERSION_KEY, time.time_ns(), timeout=None)
+            version = None
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+        else:
+            self.version = None
+
+    def _insert(self, ref: int, title: str):
+        for word in get_words(title):
+            low, high = bisect_left(self.keys, word), bisect_right(self.keys, word)
+            position = low + bisect_left(self.refs[low:high], ref)
+            self.keys.insert(position, sys.intern(word))
+            self.refs.insert(position, ref)
+        self.titles[ref] = title
+
+    def _delete(self, ref: int):
+        title = self.titles.pop(ref, None)
+        if title is None:
+            return
+        for word in get_words(title):
+            low, high = bisect_left(self.keys, word), bisect_right(self.keys, word)
+            position = low + bisect_left(self.refs[low:high], ref)
+            if position < high and self.refs[position] == ref:
+                del self.keys[position]
+                del self.refs[position]
+
+    def update(self, kind: int, pk: int, title: str):
+        """
+        Добавляет или обновляет запись в индексе.
+        :param kind: вид записи (PRODUCT, TAG или CATEGORY)
+        :param pk: идентификатор записи
+        :param title: название
+        """
+        with self.lock:
+            if self.version is not None:
+                ref = self.get_ref(kind, pk)
+                self._delete(ref)
+                self._insert(ref, title)
+            self.bump_version()
+
+    def remove(self, kind: int, pk: int):
+        """
+        Удаляет запись из индекса.
+        :param kind: вид записи (PRODUCT, TAG или CATEGORY)
+        :param pk: идентификатор записи
+        """
+        with self.lock:
+            if self.version is not None:
+                self._delete(self.get_ref(kind, pk))
+            self.bump_version()
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """
+        Ищет записи, в названии которых есть слова, начинающиеся с каждого слова запроса.
+        Кандидаты берутся по самому длинному слову запроса, остальные слова проверяются по названию.
+        Товары идут первыми, затем теги и категории, внутри вида - более короткие названия.
+        :param query: начало поискового запроса
+        :param limit: максимальное количество подсказок
+        :return: список из словарей с видом, идентификатором и названием записи.
+        """
+        terms = get_words(query)
+        if not terms:
+            return []
+        self.ensure_actual()
+
+        with self.lock:
+            prefix = max(terms, key=len)
+            position = bisect_left(self.keys, prefix)
+            candidates = {}
+            while position < len(self.keys) and self.keys[position].startswith(prefix):
+                ref = self.refs[position]
+                position += 1
+                if ref in candidates:
+                    continue
+                words = get_words(self.titles[ref])
+                if all(any(word.startswith(term) for word in words) for term in terms):
+                    candidates[ref] = self.titles[ref]
+
+        found = sorted(candidates.items(), key=lambda item: (item[0] % 4, len(item[1]), item[1]))[:limit]
+        return [{'type': KIND_NAMES[ref % 4], 'id': ref // 4, 'title': title} for ref, title in found]
+
+
+suggest_index = SuggestIndex()
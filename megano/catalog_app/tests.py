@@ -1,3 +1,358 @@
+import io
+from importlib import import_module
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from products_app.models import Product, ProductSpecification, Tag
+from .fulltext import search_products
+from .models import Category, ImageCategory, ProductSearchIndex
+from .pagination import KeysetPagination
+from .search_index import TAG_MASK_BITS
+from .suggest import suggest_index
+from .utils import get_category_tree
+
+
+class SearchIndexTestCase(TestCase):
+    """Проверяет синхронизацию поискового индекса каталога с товарами и тегами."""
+    def setUp(self):
+        self.phone = Product.objects.create(title='Смартфон  Galaxy', price=100, count=1, rating=5)
+        self.case = Product.objects.create(title='Чехол', price=10, count=0, rating=4)
+        self.tag = Tag.objects.create(name='Новинка')
+        self.rare_tag = Tag.objects.create(pk=TAG_MASK_BITS + 1, name='Редкий')
+
+    def get_catalog_ids(self, tags: list[int]) -> list[int]:
+        response = self.client.get(reverse('catalog_app:catalog'), {'tags[]': tags},
+                                   HTTP_REFERER='http://testserver/catalog/')
+        return [item['id'] for item in response.json()['items']]
+
+    def test_index_follows_product(self):
+        entry = ProductSearchIndex.objects.get(pk=self.phone.pk)
+        self.assertEqual((entry.title_tokens, entry.price, entry.available), ('смартфон galaxy', 100, True))
+
+        self.phone.title = 'Телефон'
+        self.phone.price = 150
+        self.phone.count = 0
+        self.phone.save()
+        entry.refresh_from_db()
+        self.assertEqual((entry.title_tokens, entry.price, entry.available), ('телефон', 150, False))
+
+        self.phone.delete()
+        self.assertFalse(ProductSearchIndex.objects.filter(pk=entry.pk).exists())
+
+    def test_tags_mask_follows_m2m(self):
+        self.tag.product.add(self.phone, self.case)
+        self.assertEqual(set(ProductSearchIndex.objects.values_list('tags_mask', flat=True)), {1 << self.tag.pk})
+
+        self.phone.tags.remove(self.tag)
+        self.assertEqual(ProductSearchIndex.objects.get(pk=self.phone.pk).tags_mask, 0)
+
+        self.tag.product.clear()
+        self.assertEqual(ProductSearchIndex.objects.get(pk=self.case.pk).tags_mask, 0)
+
+        self.case.tags.add(self.tag)
+        self.assertEqual(ProductSearchIndex.objects.get(pk=self.case.pk).tags_mask, 1 << self.tag.pk)
+        self.tag.delete()
+        self.assertEqual(ProductSearchIndex.objects.get(pk=self.case.pk).tags_mask, 0)
+
+    def test_tags_outside_mask(self):
+        self.rare_tag.product.add(self.case)
+        self.tag.product.add(self.phone, self.case)
+        self.assertEqual(ProductSearchIndex.objects.get(pk=self.case.pk).tags_mask, 1 << self.tag.pk)
+
+        self.assertEqual(self.get_catalog_ids([self.rare_tag.pk]), [self.case.pk])
+        self.assertEqual(self.get_catalog_ids([self.tag.pk, self.rare_tag.pk]), [self.case.pk])
+        self.assertEqual(self.get_catalog_ids([self.tag.pk]), [self.phone.pk, self.case.pk])
+
+    def test_migration_fills_index(self):
+        self.tag.product.add(self.case)
+        self.rare_tag.product.add(self.case)
+        ProductSearchIndex.objects.all().delete()
+
+        migration = import_module('catalog_app.migrations.0006_fill_product_search_index')
+        state = MigrationExecutor(connection).loader.project_state(('catalog_app', '0006_fill_product_search_index'))
+        migration.fill_search_index(state.apps, None)
+        self.assertEqual(dict(ProductSearchIndex.objects.values_list('pk', 'tags_mask')),
+                         {self.phone.pk: 0, self.case.pk: 1 << self.tag.pk})
+        self.assertEqual(ProductSearchIndex.objects.get(pk=self.phone.pk).title_tokens, 'смартфон galaxy')
+
+    def test_rebuild_command(self):
+        self.tag.product.add(self.case)
+        ProductSearchIndex.objects.filter(pk=self.phone.pk).delete()
+        ProductSearchIndex.objects.filter(pk=self.case.pk).update(tags_mask=0, price=1, title_tokens='')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM catalog_product_fts')
+
+        output = io.StringIO()
+        call_command('rebuild_search_index', stdout=output)
+        self.assertIn('Проиндексировано товаров: 2', output.getvalue())
+        self.assertEqual(list(ProductSearchIndex.objects.values_list('pk', 'title_tokens', 'price', 'tags_mask')),
+                         [(self.phone.pk, 'смартфон galaxy', 100, 0), (self.case.pk, 'чехол', 10, 1 << self.tag.pk)])
+        self.assertEqual(search_products('чехол'), [self.case.pk])
+
+
+class FullTextSearchTestCase(TestCase):
+    """Проверяет полнотекстовый поиск товаров и его синхронизацию с моделями."""
+    def setUp(self):
+        self.phone = Product.objects.create(title='Смартфон Galaxy', description='Телефон с большим экраном',
+                                            price=100, count=1, rating=5)
+        self.case = Product.objects.create(title='Чехол', description='Чехол для смартфона Galaxy',
+                                           price=10, count=1, rating=5)
+        self.tag = Tag.objects.create(name='Гаджеты')
+        self.tag.product.add(self.case)
+        ProductSpecification.objects.create(name='Материал', value='Силикон', product=self.case)
+
+    def test_prefix_and_ranking(self):
+        self.assertEqual(search_products('смартф'), [self.phone.pk, self.case.pk])
+        self.assertEqual(search_products('GALAXY чехол'), [self.case.pk])
+        self.assertEqual(search_products('гадж'), [self.case.pk])
+        self.assertEqual(search_products('силикон'), [self.case.pk])
+        self.assertEqual(search_products('"; DROP TABLE'), [])
+
+    def test_documents_follow_models(self):
+        self.tag.name = 'Аксессуары'
+        self.tag.save()
+        self.assertEqual(search_products('аксесс'), [self.case.pk])
+        self.assertEqual(search_products('гадж'), [])
+
+        ProductSpecification.objects.filter(product=self.case).delete()
+        self.assertEqual(search_products('силикон'), [])
+
+        self.case.delete()
+        self.assertEqual(search_products('чехол'), [])
+
+    def test_catalog_relevance(self):
+        response = self.client.get(reverse('catalog_app:catalog'), {'filter[name]': 'смартф', 'sort': 'relevance'},
+                                   HTTP_REFERER='http://testserver/catalog/')
+        self.assertEqual([item['id'] for item in response.json()['items']], [self.phone.pk, self.case.pk])
+
+    def test_catalog_query_without_terms(self):
+        for params in ({'filter[name]': '!!!'}, {'filter[name]': '!!!', 'sort': 'relevance', 'limit': 2, 'cursor': ''},
+                       {'filter[name]': '"; --', 'sort': 'price'}):
+            response = self.client.get(reverse('catalog_app:catalog'), params,
+                                       HTTP_REFERER='http://testserver/catalog/')
+            self.assertEqual(response.status_code, 200, params)
+            self.assertEqual(response.json()['items'], [], params)
+
+    def test_catalog_filters_and_cursor(self):
+        cheap = [Product.objects.create(title='Смартфон {index}'.format(index=index), price=5, count=1, rating=5)
+                 for index in range(3)]
+        expensive = [Product.objects.create(title='Смартфон Pro {index}'.format(index=index),
+                                            description='Смартфон смартфон', price=500, count=1, rating=5)
+                     for index in range(3)]
+        expected = [pk for pk in search_products('смартф') if pk not in {product.pk for product in cheap}]
+        self.assertEqual(set(expected), {self.phone.pk, self.case.pk, *(product.pk for product in expensive)})
+
+        params = {'filter[name]': 'смартф', 'filter[minPrice]': 10, 'limit': 2, 'cursor': ''}
+        ids = []
+        while params['cursor'] is not None:
+            data = self.client.get(reverse('catalog_app:catalog'), params,
+                                   HTTP_REFERER='http://testserver/catalog/').json()
+            ids.extend(item['id'] for item in data['items'])
+            params['cursor'] = data['nextCursor']
+        self.assertEqual(ids, expected)
+
+
+class SuggestIndexTestCase(TestCase):
+    """Проверяет подсказки строки поиска из префиксного индекса в памяти."""
+    def setUp(self):
+        cache.clear()
+        self.phone = Product.objects.create(title='Смартфон Galaxy', price=100, count=1, rating=5)
+        self.case = Product.objects.create(title='Чехол для Galaxy', price=10, count=1, rating=5)
+        self.tag = Tag.objects.create(name='Галантерея')
+        self.category = Category.objects.create(title='Смартфоны')
+
+    def test_suggest_without_queries(self):
+        suggest_index.search('gal')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('catalog_app:search_suggest'), {'q': 'GAL'})
+        self.assertEqual(response.json(), [
+            {'type': 'product', 'id': self.phone.pk, 'title': 'Смартфон Galaxy'},
+            {'type': 'product', 'id': self.case.pk, 'title': 'Чехол для Galaxy'},
+        ])
+        self.assertEqual([item['type'] for item in suggest_index.search('смартф')], ['product', 'category'])
+        self.assertEqual(suggest_index.search('галант')[0]['id'], self.tag.pk)
+        self.assertEqual(suggest_index.search('чех gal')[0]['id'], self.case.pk)
+        self.assertEqual(suggest_index.search('"; --'), [])
+
+    def test_index_follows_models(self):
+        suggest_index.search('gal')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.case.title = 'Чехол книжка'
+            self.case.save()
+            self.tag.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual([item['id'] for item in suggest_index.search('galaxy')], [self.phone.pk])
+            self.assertEqual(suggest_index.search('книж')[0]['id'], self.case.pk)
+            self.assertEqual(suggest_index.search('галант'), [])
+
+    def test_rollback_leaves_index_unchanged(self):
+        suggest_index.search('gal')
+        version, phone_pk = cache.get('suggest-index-version'), self.phone.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Product.objects.create(title='Фантом Galaxy', price=1, count=1, rating=5)
+                    self.phone.delete()
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+        self.assertEqual(cache.get('suggest-index-version'), version)
+        with self.assertNumQueries(0):
+            self.assertEqual([item['id'] for item in suggest_index.search('galaxy')], [phone_pk, self.case.pk])
+            self.assertEqual(suggest_index.search('фантом'), [])
+
+    def test_empty_cache(self):
+        cache.clear()
+        with self.assertNumQueries(3):
+            suggest_index.search('gal')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(suggest_index.search('gal')), 2)
+            suggest_index.search('смартф')
+
+    def test_rebuild_after_change_in_other_process(self):
+        suggest_index.search('gal')
+        cache.incr('suggest-index-version')
+        Product.objects.filter(pk=self.phone.pk).update(title='Планшет')
+        with self.assertNumQueries(3):
+            self.assertEqual(suggest_index.search('план')[0]['id'], self.phone.pk)
+
+
+class FacetsTestCase(TestCase):
+    """Проверяет счетчики фильтров каталога."""
+    def setUp(self):
+        self.phones = Category.objects.create(title='Телефоны')
+        self.tag = Tag.objects.create(name='Новинка')
+        self.products = [
+            Product.objects.create(title='Товар {price}'.format(price=price), price=price, count=count, rating=5,
+                                   freeDelivery=free, category=self.phones if price < 300 else None)
+            for price, count, free in ((100, 1, True), (200, 0, False), (300, 5, False), (600, 2, True))
+        ]
+        self.tag.product.add(*self.products[:3])
+
+    def get_facets(self, params: dict) -> dict:
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('catalog_app:catalog'), params,
+                                       HTTP_REFERER='http://testserver/catalog/')
+        return response.json()['facets']
+
+    def test_facets(self):
+        facets = self.get_facets({})
+        self.assertEqual((facets['total'], facets['freeDelivery'], facets['available']), (4, 2, 3))
+        self.assertEqual(facets['categories'], [{'id': self.phones.pk, 'title': 'Телефоны', 'count': 2}])
+        self.assertEqual(facets['tags'], [{'id': self.tag.pk, 'name': 'Новинка', 'count': 3}])
+        self.assertEqual([bucket['count'] for bucket in facets['prices']], [1, 1, 1, 0, 1])
+        self.assertEqual((facets['prices'][0]['min'], facets['prices'][-1]['max']), (100, 600))
+
+    def test_facets_follow_filter(self):
+        facets = self.get_facets({'filter[available]': 'true'})
+        self.assertEqual((facets['total'], facets['freeDelivery'], facets['available']), (3, 2, 3))
+        self.assertEqual(facets['tags'][0]['count'], 2)
+
+
+class CategoryTreeTestCase(TestCase):
+    """Проверяет кэширование дерева категорий и его сброс после изменения категорий и изображений."""
+    def setUp(self):
+        cache.clear()
+        self.root = Category.objects.create(title='Electronics')
+        self.child = Category.objects.create(title='Phones', parent=self.root)
+
+    def test_queries(self):
+        with self.assertNumQueries(2):
+            tree = get_category_tree()
+        self.assertEqual([(node['title'], [child['title'] for child in node['subcategories']]) for node in tree],
+                         [('Electronics', ['Phones'])])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('catalog_app:categories')).json(), tree)
+
+    def test_invalidation(self):
+        get_category_tree()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.child.title = 'Smartphones'
+            self.child.save()
+        with self.assertNumQueries(2):
+            self.assertEqual(get_category_tree()[0]['subcategories'][0]['title'], 'Smartphones')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ImageCategory.objects.create(category=self.root, image='categories/images/root.png')
+        self.assertEqual(get_category_tree()[0]['image']['src'], '/media/categories/images/root.png')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertEqual(get_category_tree()[0]['image'], {})
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Проверяет пагинацию по курсору: обход всех страниц, одинаковые значения сортировки, NULL и плохие курсоры."""
+    def setUp(self):
+        self.products = [Product.objects.create(title='Товар {index}'.format(index=index), price=price,
+                                                count=1, rating=5)
+                         for index, price in enumerate((100, 100, 300, 100, 50, 300))]
+
+    def walk_catalog(self, sort_type: str) -> list[int]:
+        """
+        Проходит все страницы каталога по курсору.
+        :param sort_type: направление сортировки по цене
+        :return: идентификаторы товаров в порядке выдачи.
+        """
+        params = {'sort': 'price', 'sortType': sort_type, 'limit': 2, 'cursor': ''}
+        ids = []
+        while params['cursor'] is not None:
+            data = self.client.get(reverse('catalog_app:catalog'), params,
+                                   HTTP_REFERER='http://testserver/catalog/').json()
+            ids.extend(item['id'] for item in data['items'])
+            params['cursor'] = data['nextCursor']
+        return ids
+
+    def walk_queryset(self, ordering: tuple[str, ...]) -> list[int]:
+        """
+        Проходит все страницы QuerySet товаров по курсору.
+        :param ordering: поля сортировки
+        :return: идентификаторы товаров в порядке выдачи.
+        """
+        factory = APIRequestFactory()
+        ids, cursor = [], ''
+        while cursor is not None:
+            paginator = KeysetPagination()
+            request = Request(factory.get('/', {'cursor': cursor, 'limit': 2}))
+            ids.extend(product.pk for product in paginator.paginate_queryset(
+                Product.objects.order_by(*ordering), request))
+            cursor = paginator.next_cursor
+        return ids
+
+    def test_round_trip_and_ties(self):
+        by_page = self.client.get(reverse('catalog_app:catalog'), {'sort': 'price', 'sortType': 'dec', 'limit': 100},
+                                  HTTP_REFERER='http://testserver/catalog/').json()['items']
+        self.assertEqual(self.walk_catalog('dec'), [item['id'] for item in by_page])
+        # sortType=inc в формате фронтенда - по убыванию
+        expected = sorted(self.products, key=lambda product: (-product.price, -product.pk))
+        self.assertEqual(self.walk_catalog('inc'), [product.pk for product in expected])
+
+    def test_null_values(self):
+        without_index = self.products[2]
+        ProductSearchIndex.objects.filter(pk=without_index.pk).delete()
+        others = sorted((product for product in self.products if product != without_index),
+                        key=lambda product: (product.price, product.pk))
+        self.assertEqual(self.walk_queryset(('search_index__price', 'pk')),
+                         [without_index.pk] + [product.pk for product in others])
+        self.assertEqual(self.walk_queryset(('-search_index__price', '-pk')),
+                         [product.pk for product in reversed(others)] + [without_index.pk])
 
-# Create your tests here.
+    def test_bad_cursors(self):
+        url = reverse('catalog_app:catalog')
+        params = {'sort': 'price', 'sortType': 'dec'}
+        for values in ({'a': 1}, ['x'], [100, 'x'], ['abc', 1], [[1], 1], [100, None]):
+            response = self.client.get(url, {**params, 'cursor': KeysetPagination.encode_cursor(values)},
+                                       HTTP_REFERER='http://testserver/catalog/')
+            self.assertEqual(response.status_code, 404, values)
+        response = self.client.get(url, {**params, 'cursor': '!!!'}, HTTP_REFERER='http://testserver/catalog/')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(url, {**params, 'cursor': KeysetPagination.encode_cursor([None, 1])},
+                                   HTTP_REFERER='http://testserver/catalog/')
+        self.assertEqual(response.status_code, 200)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import CategoryListApiView, BannersListApiView, CatalogApiView
+from .views import CategoryListApiView, BannersListApiView, CatalogApiView, SearchSuggestApiView
 
 app_name = "catalog_app"
 
@@ -7,4 +7,5 @@ urlpatterns = [
     path('api/categories', CategoryListApiView.as_view(), name='categories'),
     path('api/banners', BannersListApiView.as_view(), name='banners'),
     path('api/catalog', CatalogApiView.as_view(), name='catalog'),
+    path('api/search/suggest', SearchSuggestApiView.as_view(), name='search_suggest'),
 ]
\ No newline at end of file
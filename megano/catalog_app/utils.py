@@ -1,7 +1,17 @@
-from django.db.models import Count
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Prefetch
+from products_app.cache import get_cache_versions
 from products_app.models import Product
+from products_app.utils import get_products_for_list
 from rest_framework.request import Request
 from django.db.models.query import QuerySet
+from .fulltext import filter_by_search
+from .models import Category, ImageCategory
+from .search_index import get_tags_mask, get_title_tokens, TAG_MASK_BITS
+from .serializers import CategoryTreeSerializer
+
+CATEGORY_TREE_CACHE_KEY = 'category-tree:{category}:{image}'
 
 
 def get_query_params(request: Request) -> tuple:
@@ -30,23 +40,29 @@ def get_query_params(request: Request) -> tuple:
     ), full_body_request.get('sortType', '')
 
 
+SORT_FIELDS = {
+    'price': 'price',
+    'rating': 'rating',
+    'date': 'date',
+    'reviews': 'reviews_count',
+}
+
+
 def sort_desired_products(products: QuerySet, sort: str, type_sort: str):
     """
-    Функция, сортирующая готовые данные.
+    Функция, сортирующая готовые данные по полям поискового индекса.
     :param products: готовый QuerySet
     :param sort: Параметр, по которому производить сортировку
     :param type_sort: вид сортировки (по убыванию или возрастанию)
     :return: отсортированный QuerySet
     """
+    if sort not in SORT_FIELDS:
+        return products
     type_sort = '-' if type_sort == 'inc' else ''
-    if sort == 'reviews':
-        return products.annotate(quantity_review=Count('review')).order_by('{type_sort}quantity_review'.format(
-            type_sort=type_sort
-        ))
-    return products.order_by('{type_sort}{sort}'.format(
-        type_sort=type_sort,
-        sort=sort
-    ))
+    return products.order_by(
+        '{type_sort}search_index__{field}'.format(type_sort=type_sort, field=SORT_FIELDS[sort]),
+        '{type_sort}pk'.format(type_sort=type_sort),
+    )
 
 
 def filter_category(category: list[str], products: QuerySet):
@@ -57,39 +73,111 @@ def filter_category(category: list[str], products: QuerySet):
     :return: Отфильтрованный QuerySet с товарами по категории, если она запрошена.
     """
     if len(category) == 2:
-        return products.filter(category__title=' '.join(category[-1].split('%20')))
+        return products.filter(search_index__category__title=' '.join(category[-1].split('%20')))
 
     path, digit = category[0].split('catalog/')
     if digit:
-        return products.filter(category__id=int(digit[:-1]))
+        return products.filter(search_index__category_id=int(digit[:-1]))
+    return products
+
+
+def filter_tags(tags: list[str], products: QuerySet):
+    """
+    Фильтрует товары по тегам. Товар должен содержать все выбранные теги.
+    Теги из битовой маски проверяются одним побитовым И, остальные - через JOIN.
+    :param tags: идентификаторы тегов
+    :param products: QuerySet с товарами.
+    :return: Отфильтрованный QuerySet с товарами.
+    """
+    tag_ids = [int(tag) for tag in tags if str(tag).isdigit()]
+    mask = get_tags_mask(tag_ids)
+    if mask:
+        products = products.annotate(
+            selected_tags=F('search_index__tags_mask').bitand(mask)
+        ).filter(selected_tags=mask)
+
+    for tag_id in tag_ids:
+        if tag_id >= TAG_MASK_BITS:
+            products = products.filter(tags__id=tag_id)
     return products
 
 
 def main_filter(request):
     """
     Функция, фильтрующая всевозможные данные.
+    Фильтрация и сортировка идут по поисковому индексу ProductSearchIndex.
+    Поиск по тексту идет по документам полнотекстового поиска (название, описания, теги, характеристики).
+    Если в запросе нет сортировки (или sort=relevance), найденные товары сортируются по релевантности.
     :param request: запрос
     :return: готовый QuerySet с уже отсортированными значениями.
     """
     title, min_price, max_price, free_del, available, tags, category, sort, type_sort = get_query_params(request=request)
-    desired_products = Product.objects.prefetch_related(
-        'review', 'product_img', 'tags').select_related('category').filter(
-        price__range=(min_price, max_price))
+    desired_products = get_products_for_list()
+
+    if min_price:
+        desired_products = desired_products.filter(search_index__price__gte=min_price)
+
+    if max_price:
+        desired_products = desired_products.filter(search_index__price__lte=max_price)
 
     if free_del:
-        desired_products = desired_products.filter(freeDelivery=free_del)
+        desired_products = desired_products.filter(search_index__freeDelivery=True)
 
-    if title:
-        desired_products = desired_products.filter(title__icontains=title.title())
+    by_relevance = bool(title) and sort not in SORT_FIELDS
+    found_products = filter_by_search(desired_products, title, rank=by_relevance) if title else None
+    if found_products is not None:
+        desired_products = found_products
+    else:
+        by_relevance = False
+        for word in get_title_tokens(title).split():
+            desired_products = desired_products.filter(search_index__title_tokens__contains=word)
 
     if available:
-        desired_products = desired_products.exclude(count=0)
+        desired_products = desired_products.filter(search_index__available=True)
 
     if tags:
-        for tag in tags:
-            desired_products = desired_products.filter(tags__id=tag)
+        desired_products = filter_tags(tags=tags, products=desired_products)
 
     desired_products = filter_category(category=category, products=desired_products)
 
+    if by_relevance:
+        return desired_products.order_by('search_rank', 'pk')
     return sort_desired_products(products=desired_products, sort=sort, type_sort=type_sort)
 
+
+def build_category_tree() -> list[Category]:
+    """
+    Загружает все категории и их изображения двумя запросами и собирает из них дерево в памяти.
+    Дочерние категории складываются в атрибут tree_children.
+    :return: список корневых категорий.
+    """
+    categories = list(Category.objects.only('pk', 'title', 'parent_id').prefetch_related(
+        Prefetch('category_img', queryset=ImageCategory.objects.only('pk', 'image', 'content_hash', 'category_id'))
+    ))
+    nodes = {category.pk: category for category in categories}
+    roots = []
+    for category in categories:
+        category.tree_children = []
+    for category in categories:
+        parent = nodes.get(category.parent_id)
+        if parent is None:
+            roots.append(category)
+        else:
+            parent.tree_children.append(category)
+    return roots
+
+
+def get_category_tree() -> list[dict]:
+    """
+    Возвращает сериализованное дерево категорий.
+    Дерево хранится в кэше и пересобирается после изменения категорий или их изображений
+    или по истечении RESPONSE_CACHE_TIMEOUT.
+    :return: список корневых категорий с вложенными подкатегориями.
+    """
+    versions = get_cache_versions(('category', 'imagecategory'))
+    key = CATEGORY_TREE_CACHE_KEY.format(category=versions['category'], image=versions['imagecategory'])
+    tree = cache.get(key)
+    if tree is None:
+        tree = CategoryTreeSerializer(build_category_tree(), many=True).data
+        cache.set(key, tree, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+    return tree
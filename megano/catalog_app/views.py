@@ -3,52 +3,60 @@ from rest_framework.views import APIView
 from rest_framework.request import Request
 from rest_framework.response import Response
 from products_app.models import Product
+from products_app.cache import CachedResponseMixin
 from products_app.serializers import FewerInfoProductSerializer
-from .models import Category
-from .serializers import CategorySerializer
-from .utils import main_filter
+from products_app.utils import get_products_for_list
+from .facets import get_facets
+from .pagination import CatalogPagination, KeysetPagination
+from .suggest import suggest_index
+from .utils import main_filter, get_category_tree
 
 
-class CategoryListApiView(ListAPIView):
-    """Класс API-view. Предоставляет информацию о категориях."""
-    queryset = Category.objects.all()
-    serializer_class = CategorySerializer
-
-    def get(self, request: Request, *args, **kwargs) -> Response:
+class CategoryListApiView(APIView):
+    """Класс API-view. Предоставляет дерево категорий."""
+    def get(self, request: Request) -> Response:
         """Метод - get. Формирует ответ для пользователя"""
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return Response(get_category_tree())
 
 
-class BannersListApiView(ListAPIView):
+class BannersListApiView(CachedResponseMixin, ListAPIView):
     """Класс API-view. Предоставляет информацию о товарах в избранных категориях."""
-    queryset: Product = Product.objects.prefetch_related(
-        'review',
-        'product_img',
-        'tags',
-    ).select_related(
-        'category'
-    ).filter(category__main=True)
+    cache_models = ('product', 'saleproduct', 'tag', 'category', 'productimage', 'review')
+    queryset: Product = get_products_for_list(Product.objects.filter(category__main=True))
     serializer_class = FewerInfoProductSerializer
 
-    def get(self, request: Request, *args, **kwargs) -> Response:
-        """Метод - get. Формирует ответ для пользователя"""
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Метод - list. Формирует ответ для пользователя"""
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
 
 class CatalogApiView(APIView):
-    """Класс API-view. Позволяет отфильтровать товары."""
+    """
+    Класс API-view. Позволяет отфильтровать товары.
+    По умолчанию отдает страницу по номеру (currentPage, limit).
+    Если в запросе есть параметр cursor, то включается пагинация по ключу сортировки.
+    В ключе facets ответа - счетчики товаров по тегам, категориям, доставке, наличию и интервалам цены.
+    """
     def get(self, request: Request) -> Response:
         """Метод - get. Формирует ответ для пользователя"""
-        return Response({'items': FewerInfoProductSerializer(main_filter(request), many=True).data})
-
-
-
-
-
-
-
-
+        if KeysetPagination.cursor_query_param in request.query_params:
+            paginator = KeysetPagination()
+        else:
+            paginator = CatalogPagination()
+        products = main_filter(request)
+        page = paginator.paginate_queryset(products, request, view=self)
+        response = paginator.get_paginated_response(FewerInfoProductSerializer(page, many=True).data)
+        response.data['facets'] = get_facets(products)
+        return response
+
+
+class SearchSuggestApiView(APIView):
+    """
+    Класс API-view. Предоставляет подсказки для строки поиска по параметру q:
+    товары, теги и категории из префиксного индекса в памяти процесса.
+    """
+    def get(self, request: Request) -> Response:
+        """Метод - get. Формирует ответ для пользователя"""
+        return Response(suggest_index.search(request.query_params.get('q', '')))
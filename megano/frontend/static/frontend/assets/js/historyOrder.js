@@ -1,12 +1,13 @@
 var mix = {
 	methods: {
 		getHistoryOrder() {
-			this.getData("/api/orders")
+			this.getData("/api/orders", {summary: true, cursor: this.nextCursor || ''})
 				.then(data => {
-					console.log(data)
-					this.orders = data
+					this.orders = [...this.orders, ...data.items]
+					this.nextCursor = data.nextCursor
 				}).catch(() => {
 				this.orders = []
+				this.nextCursor = null
 				console.warn('Ошибка при получении списка заказов')
 			})
 		}
@@ -17,6 +18,7 @@ var mix = {
 	data() {
 		return {
 			orders: [],
+			nextCursor: null,
 		}
 	}
-}
\ No newline at end of file
+}
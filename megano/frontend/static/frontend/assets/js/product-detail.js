@@ -32,8 +32,8 @@ var mix = {
                 email: this.review.email,
                 text: this.review.text,
                 rate: this.review.rate
-            }).then(({data}) => {
-                this.product.reviews = data
+            }).then(() => {
+                this.getProduct()
                 alert('Отзыв опубликован')
                 this.review.author = ''
                 this.review.email = ''
@@ -43,6 +43,16 @@ var mix = {
                 console.warn('Ошибка при публикации отзыва')
             })
         },
+        getMoreReviews() {
+            this.getData(`/api/product/${this.product.id}/reviews`, {
+                cursor: this.product.reviewsNextCursor
+            }).then(data => {
+                this.product.reviews = [...this.product.reviews, ...data.items]
+                this.product.reviewsNextCursor = data.nextCursor
+            }).catch(() => {
+                console.warn('Ошибка при получении отзывов')
+            })
+        },
         setActivePhoto(index) {
             this.activePhoto = index
         }
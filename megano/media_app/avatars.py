@@ -0,0 +1,99 @@
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .derivatives import encode_image, prepare_image, write_file_atomically
+
+AVATARS_DIR = 'users/avatars'
+AVATAR_MAX_SIDE = 512
+AVATAR_MAX_UPLOAD_SIZE = 2_097_152
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def get_avatar_name(content_hash: str, extension: str) -> str:
+    """
+    Формирует путь до аватара относительно MEDIA_ROOT по хешу его содержимого.
+    Одинаковые аватары разных пользователей хранятся одним файлом.
+    :param content_hash: хеш содержимого нормализованного изображения
+    :param extension: расширение файла
+    :return: путь, например users/avatars/ab/ab12....jpg.
+    """
+    return '{dir}/{prefix}/{hash}.{extension}'.format(
+        dir=AVATARS_DIR, prefix=content_hash[:2], hash=content_hash, extension=extension)
+
+
+class UploadTooLarge(ValueError):
+    """Загруженный файл больше допустимого размера."""
+
+
+@contextmanager
+def spool_upload(upload: UploadedFile, max_size: int = AVATAR_MAX_UPLOAD_SIZE) -> Iterator[str]:
+    """
+    Возвращает путь до загруженного файла на диске, не читая его в память целиком.
+    Если Django уже сохранил загрузку во временный файл (TemporaryFileUploadHandler), используется он,
+    иначе загрузка по частям переписывается в свой временный файл, который удаляется при выходе из блока.
+    Размер проверяется по фактически полученным данным, а не по заявленному клиентом.
+    :param upload: загруженный файл
+    :param max_size: максимальный размер в байтах
+    :return: путь до файла. Возвращает ошибку UploadTooLarge, если файл больше max_size.
+    """
+    too_large = UploadTooLarge('Размер файла превышает {size} байт'.format(size=max_size))
+    if hasattr(upload, 'temporary_file_path'):
+        if upload.size > max_size:
+            raise too_large
+        yield upload.temporary_file_path()
+        return
+
+    descriptor, path = tempfile.mkstemp(dir=settings.FILE_UPLOAD_TEMP_DIR, suffix='.upload')
+    try:
+        size = 0
+        with os.fdopen(descriptor, 'wb') as file:
+            for chunk in upload.chunks(chunk_size=UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise too_large
+                file.write(chunk)
+        yield path
+    finally:
+        os.unlink(path)
+
+
+def normalize_avatar(path: str, media_root: str) -> str | None:
+    """
+    Проверяет и нормализует аватар: декодирует изображение, поворачивает по EXIF, удаляет метаданные,
+    уменьшает до AVATAR_MAX_SIDE и сохраняет в JPEG (или в PNG, если есть прозрачность) под именем из хеша
+    содержимого. Если такой файл уже есть, он не перезаписывается, а у него обновляется время изменения:
+    по нему delete_orphan_avatars решает, что файл давно никому не нужен. Функция не обращается к базе данных
+    и настройкам Django, поэтому выполняется в пуле процессов.
+    :param path: путь до временного файла с загрузкой
+    :param media_root: MEDIA_ROOT
+    :return: путь до аватара относительно MEDIA_ROOT или None, если файл - не изображение.
+    """
+    try:
+        with Image.open(path) as source:
+            source.verify()
+        with Image.open(path) as source:
+            image = ImageOps.exif_transpose(source)
+            image.load()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        return None
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image_format, extension = ('PNG', 'png') if has_alpha else ('JPEG', 'jpg')
+    image = prepare_image(image, image_format)
+    image.thumbnail((AVATAR_MAX_SIDE, AVATAR_MAX_SIDE), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    data = encode_image(image, image_format)
+
+    name = get_avatar_name(hashlib.sha256(data).hexdigest()[:32], extension)
+    target = os.path.join(media_root, name)
+    try:
+        os.utime(target)
+    except FileNotFoundError:
+        write_file_atomically(target, data)
+    return name
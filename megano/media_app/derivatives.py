@@ -0,0 +1,225 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from itertools import repeat
+from typing import Callable, Iterable
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+DERIVATIVES_DIR = 'derivatives'
+DERIVATIVE_WIDTHS = (160, 320, 640)
+# формат Pillow и расширение файла. JPEG - для браузеров без поддержки WebP
+DERIVATIVE_FORMATS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+DERIVATIVE_QUALITY = 80
+HASH_CHUNK_SIZE = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_content_hash(path: str) -> str:
+    """
+    Считает хеш содержимого файла, читая его по частям.
+    :param path: путь до файла
+    :return: первые 32 символа sha256 в шестнадцатеричном виде.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def get_derivative_name(content_hash: str, width: int, extension: str) -> str:
+    """
+    Формирует путь до производного изображения относительно MEDIA_ROOT.
+    Путь зависит только от содержимого исходного файла, поэтому одинаковые изображения
+    обрабатываются один раз, а замена изображения сразу дает новые адреса.
+    :param content_hash: хеш содержимого исходного файла
+    :param width: ширина
+    :param extension: расширение файла
+    :return: путь, например derivatives/ab/ab12.../320.webp.
+    """
+    return '{dir}/{prefix}/{hash}/{width}.{extension}'.format(
+        dir=DERIVATIVES_DIR, prefix=content_hash[:2], hash=content_hash, width=width, extension=extension
+    )
+
+
+def write_file_atomically(path: str, data: bytes):
+    """
+    Записывает данные во временный файл рядом с целевым и переименовывает его,
+    чтобы никто не прочитал недописанный файл.
+    :param path: путь до файла
+    :param data: содержимое файла
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def encode_image(image: Image.Image, image_format: str) -> bytes:
+    """
+    Кодирует изображение в указанный формат. Метаданные исходного файла (EXIF и т.д.) не сохраняются.
+    :param image: изображение
+    :param image_format: формат Pillow, например WEBP
+    :return: содержимое файла.
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=DERIVATIVE_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def save_image_atomically(image: Image.Image, path: str, image_format: str):
+    """
+    Кодирует изображение и атомарно записывает его в файл.
+    :param image: изображение
+    :param path: путь до файла
+    :param image_format: формат Pillow, например WEBP
+    """
+    write_file_atomically(path, encode_image(image, image_format))
+
+
+def prepare_image(image: Image.Image, image_format: str) -> Image.Image:
+    """
+    Приводит изображение к режиму, который поддерживает формат: у JPEG нет прозрачности,
+    поэтому прозрачные области заливаются белым. В остальных форматах прозрачность сохраняется.
+    :param image: изображение
+    :param image_format: формат Pillow
+    :return: изображение в режиме RGB или RGBA.
+    """
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if not has_alpha:
+        return image.convert('RGB')
+    image = image.convert('RGBA')
+    if image_format != 'JPEG':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def resize_to_width(image: Image.Image, width: int) -> Image.Image:
+    """
+    Уменьшает изображение до указанной ширины с сохранением пропорций. Изображения меньше не увеличиваются.
+    :param image: изображение
+    :param width: ширина
+    :return: уменьшенная копия изображения.
+    """
+    if image.width <= width:
+        return image.copy()
+    height = max(round(image.height * width / image.width), 1)
+    return image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def build_derivatives(name: str, media_root: str) -> str | None:
+    """
+    Создает уменьшенные копии изображения всех ширин DERIVATIVE_WIDTHS в форматах DERIVATIVE_FORMATS.
+    Уже существующие копии не пересоздаются. Функция не обращается к базе данных и настройкам Django,
+    поэтому выполняется в отдельном процессе.
+    :param name: путь до исходного файла относительно MEDIA_ROOT
+    :param media_root: MEDIA_ROOT
+    :return: хеш содержимого исходного файла или None, если файла нет или это не изображение.
+    """
+    path = os.path.join(media_root, name)
+    if not name or not os.path.isfile(path):
+        return None
+    content_hash = get_content_hash(path)
+    targets = [(width, image_format, os.path.join(media_root, get_derivative_name(content_hash, width, extension)))
+               for width in DERIVATIVE_WIDTHS for image_format, extension in DERIVATIVE_FORMATS.items()]
+    targets = [target for target in targets if not os.path.exists(target[2])]
+    if not targets:
+        return content_hash
+
+    try:
+        with Image.open(path) as source:
+            source = ImageOps.exif_transpose(source)
+            source.load()
+            converted = {image_format: prepare_image(source, image_format)
+                         for image_format in {image_format for width, image_format, target in targets}}
+            for width, image_format, target in targets:
+                save_image_atomically(resize_to_width(converted[image_format], width), target, image_format)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+    return content_hash
+
+
+def get_srcset(content_hash: str, extension: str) -> str:
+    """
+    Формирует значение атрибута srcset из производных изображений.
+    :param content_hash: хеш содержимого исходного файла. Если пустой, производные еще не созданы
+    :param extension: расширение производных файлов (webp или jpg)
+    :return: строка вида "/media/.../160.webp 160w, /media/.../320.webp 320w" или пустая строка.
+    """
+    if not content_hash:
+        return ''
+    return ', '.join('{url}{name} {width}w'.format(
+        url=settings.MEDIA_URL, name=get_derivative_name(content_hash, width, extension), width=width
+    ) for width in DERIVATIVE_WIDTHS)
+
+
+def get_executor() -> Executor:
+    """
+    Возвращает общий для процесса пул процессов для обработки загруженных изображений.
+    Процессы запускаются через spawn, чтобы не копировать потоки и соединения с базой данных веб-сервера.
+    :return: ProcessPoolExecutor на IMAGE_DERIVATIVE_WORKERS процессов.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def submit_to_pool(function: Callable, *args) -> Future:
+    """
+    Отправляет функцию в общий пул процессов. Если IMAGE_DERIVATIVE_WORKERS равен 0,
+    функция выполняется сразу в текущем процессе.
+    :param function: функция уровня модуля (ее нужно передать в другой процесс)
+    :param args: аргументы функции
+    :return: Future с результатом функции.
+    """
+    if not settings.IMAGE_DERIVATIVE_WORKERS:
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+    return get_executor().submit(function, *args)
+
+
+def submit_derivatives(name: str) -> Future:
+    """
+    Отправляет создание производных изображения в пул процессов.
+    :param name: путь до исходного файла относительно MEDIA_ROOT
+    :return: Future с хешем содержимого файла.
+    """
+    return submit_to_pool(build_derivatives, name, str(settings.MEDIA_ROOT))
+
+
+def build_derivatives_many(names: Iterable[str], workers: int) -> dict[str, str | None]:
+    """
+    Создает производные для многих изображений в отдельном пуле процессов.
+    :param names: пути до исходных файлов относительно MEDIA_ROOT
+    :param workers: количество процессов. 0 - обработка в текущем процессе
+    :return: словарь, где ключ - путь до файла, значение - хеш содержимого или None.
+    """
+    names = list(dict.fromkeys(names))
+    media_root = str(settings.MEDIA_ROOT)
+    if not workers:
+        return {name: build_derivatives(name, media_root) for name in names}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return dict(zip(names, executor.map(build_derivatives, names, repeat(media_root), chunksize=4)))
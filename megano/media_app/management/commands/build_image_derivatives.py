@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalog_app.models import ImageCategory
+from media_app.derivatives import build_derivatives_many
+from products_app.cache import bump_cache_version
+from products_app.models import ProductImage
+
+
+class Command(BaseCommand):
+    """
+    Команда создает уменьшенные копии (JPEG и WebP) изображений товаров и категорий в пуле процессов
+    и сохраняет хеши содержимого, по которым сериализаторы формируют srcset.
+    Нужна после загрузки фикстур и для изображений, загруженных до появления уменьшенных копий.
+    """
+    help = 'Создает уменьшенные копии изображений товаров и категорий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Обработать все изображения, а не только те, у которых еще нет копий')
+        parser.add_argument('--workers', type=int, default=max(settings.IMAGE_DERIVATIVE_WORKERS, 1),
+                            help='Количество процессов. 0 - обработка в текущем процессе')
+
+    def handle(self, *args, **options):
+        images = {model: list(model.objects.exclude(image='').only('pk', 'image', 'content_hash'))
+                  for model in (ProductImage, ImageCategory)}
+        if not options['all']:
+            images = {model: [image for image in items if not image.content_hash] for model, items in images.items()}
+
+        hashes = build_derivatives_many((image.image.name for items in images.values() for image in items),
+                                        workers=options['workers'])
+        updated = 0
+        for model, items in images.items():
+            changed = []
+            for image in items:
+                content_hash = hashes[image.image.name]
+                if content_hash and content_hash != image.content_hash:
+                    image.content_hash = content_hash
+                    changed.append(image)
+            if changed:
+                model.objects.bulk_update(changed, ['content_hash'], batch_size=500)
+                bump_cache_version(model)
+            updated += len(changed)
+
+        failed = sum(1 for content_hash in hashes.values() if not content_hash)
+        self.stdout.write(self.style.SUCCESS('Обновлено изображений: {count}, не удалось обработать: {failed}'.format(
+            count=updated, failed=failed)))
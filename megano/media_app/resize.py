@@ -0,0 +1,225 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from catalog_app.models import ImageCategory
+from products_app.models import ProductImage
+from profileuser_app.models import AvatarUser
+from .derivatives import prepare_image, save_image_atomically
+
+try:
+    import fcntl
+except ImportError:  # Windows: между процессами копии не блокируются, только между потоками
+    fcntl = None
+
+# формат Pillow и Content-Type уменьшенной копии в зависимости от расширения исходного файла
+RESIZE_FORMATS = {
+    '.jpg': ('JPEG', 'image/jpeg'),
+    '.jpeg': ('JPEG', 'image/jpeg'),
+    '.png': ('PNG', 'image/png'),
+    '.gif': ('PNG', 'image/png'),
+    '.webp': ('WEBP', 'image/webp'),
+}
+TOUCH_INTERVAL = 60 * 60  # время последнего обращения к копии обновляется не чаще раза в час
+EVICT_RATIO = 0.9  # при переполнении кэш очищается до этой доли от максимального размера
+CACHE_SIZE_KEY = 'media:resize_cache_size'  # размер дискового кэша копий в байтах, общий для процессов
+
+_locks: dict[str, list] = {}
+_locks_guard = threading.Lock()
+
+
+@dataclass
+class ResizedVariant:
+    """Уменьшенная копия изображения: исходный файл, размер и путь в дисковом кэше."""
+    name: str
+    source: Path
+    width: int
+    height: int
+    key: str
+    path: Path
+    image_format: str
+    content_type: str
+
+    @property
+    def etag(self) -> str:
+        """Сильный ETag: ключ зависит от пути, размера и времени изменения исходного файла и от размера копии."""
+        return '"{key}"'.format(key=self.key)
+
+
+def get_cache_root() -> Path:
+    """
+    Возвращает папку дискового кэша уменьшенных копий.
+    :return: MEDIA_RESIZE_CACHE_ROOT.
+    """
+    return Path(settings.MEDIA_RESIZE_CACHE_ROOT)
+
+
+def get_variant(name: str, width: int, height: int) -> ResizedVariant | None:
+    """
+    Находит исходный файл и вычисляет ключ его уменьшенной копии. Обращается только к файловой системе.
+    :param name: путь до исходного файла относительно MEDIA_ROOT
+    :param width: максимальная ширина копии
+    :param height: максимальная высота копии
+    :return: описание копии или None, если файла нет, он вне MEDIA_ROOT или это не изображение.
+    """
+    media_root = Path(settings.MEDIA_ROOT).resolve()
+    source = (media_root / name).resolve()
+    extension = source.suffix.lower()
+    if media_root not in source.parents or extension not in RESIZE_FORMATS:
+        return None
+    try:
+        stat = source.stat()
+    except OSError:
+        return None
+
+    raw_key = '{name}|{mtime}|{size}|{width}x{height}'.format(
+        name=name, mtime=stat.st_mtime_ns, size=stat.st_size, width=width, height=height)
+    key = hashlib.sha256(raw_key.encode()).hexdigest()[:40]
+    image_format, content_type = RESIZE_FORMATS[extension]
+    return ResizedVariant(name=name, source=source, width=width, height=height, key=key,
+                          path=get_cache_root() / key[:2] / key, image_format=image_format, content_type=content_type)
+
+
+def is_resizable(name: str) -> bool:
+    """
+    Проверяет, что файл - изображение товара, категории или аватар пользователя.
+    Остальные файлы из MEDIA_ROOT через этот эндпоинт не отдаются.
+    :param name: путь до файла относительно MEDIA_ROOT
+    :return: True, если файл принадлежит одной из моделей.
+    """
+    return (ProductImage.objects.filter(image=name).exists()
+            or ImageCategory.objects.filter(image=name).exists()
+            or AvatarUser.objects.filter(avatar=name).exists())
+
+
+@contextmanager
+def single_flight(key: str) -> Iterator[None]:
+    """
+    Пропускает в блок только один поток и один процесс на ключ, остальные ждут.
+    Внутри процесса используется threading.Lock на ключ, между процессами - flock на файл блокировки.
+    Там, где нет fcntl (Windows), процессы не блокируют друг друга: одну копию могут создать дважды,
+    но запись атомарная, поэтому результат тот же.
+    Файл общий для ключей с одинаковыми первыми двумя символами, поэтому файлов блокировок не больше 256.
+    :param key: ключ уменьшенной копии
+    """
+    with _locks_guard:
+        entry = _locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            if fcntl is None:
+                yield
+                return
+            lock_dir = get_cache_root() / 'locks'
+            lock_dir.mkdir(parents=True, exist_ok=True)
+            with open(lock_dir / '{stripe}.lock'.format(stripe=key[:2]), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[key]
+
+
+def render_variant(variant: ResizedVariant):
+    """
+    Уменьшает исходное изображение так, чтобы оно поместилось в width x height (без увеличения),
+    и атомарно записывает его в дисковый кэш.
+    :param variant: описание копии
+    """
+    with Image.open(variant.source) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+        image = prepare_image(image, variant.image_format)
+        image.thumbnail((variant.width, variant.height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        save_image_atomically(image, str(variant.path), variant.image_format)
+
+
+def evict_variants(max_size: int | None = None):
+    """
+    Удаляет давно не использовавшиеся копии, если размер кэша превысил MEDIA_RESIZE_CACHE_MAX_SIZE.
+    Время последнего использования хранится во времени изменения файла (см. open_variant).
+    Обходит весь кэш, поэтому вызывается не после каждой копии, а когда счетчик размера превысил предел
+    (см. track_variant_size). Посчитанный размер сохраняется в счетчик.
+    :param max_size: максимальный размер кэша в байтах
+    """
+    max_size = settings.MEDIA_RESIZE_CACHE_MAX_SIZE if max_size is None else max_size
+    files = []
+    for directory in get_cache_root().iterdir():
+        if directory.name == 'locks' or not directory.is_dir():
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for mtime, size, path in files)
+    if total > max_size:
+        for mtime, size, path in sorted(files):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            if total <= max_size * EVICT_RATIO:
+                break
+    cache.set(CACHE_SIZE_KEY, total, timeout=None)
+
+
+def track_variant_size(size: int):
+    """
+    Прибавляет размер новой копии к счетчику размера кэша и запускает очистку, если счетчик превысил предел.
+    Счетчик приблизительный (копии, созданные во время очистки, могут не попасть в него),
+    и пересчитывается при каждой очистке. Если счетчика нет, он заполняется обходом кэша.
+    :param size: размер файла копии в байтах
+    """
+    try:
+        total = cache.incr(CACHE_SIZE_KEY, size)
+    except ValueError:
+        evict_variants()
+        return
+    if total > settings.MEDIA_RESIZE_CACHE_MAX_SIZE:
+        evict_variants()
+
+
+def open_variant(variant: ResizedVariant) -> BinaryIO | None:
+    """
+    Открывает уменьшенную копию из дискового кэша. Если ее нет, создает: одновременные запросы одной и той же копии
+    ждут, пока ее создаст первый из них. Перед созданием проверяется, что файл принадлежит изображению в базе данных.
+    :param variant: описание копии
+    :return: открытый файл копии или None, если исходный файл нельзя уменьшать или это не изображение.
+    """
+    try:
+        file = open(variant.path, 'rb')
+    except FileNotFoundError:
+        if not is_resizable(variant.name):
+            return None
+        with single_flight(variant.key):
+            rendered = not variant.path.exists()
+            if rendered:
+                try:
+                    render_variant(variant)
+                except (UnidentifiedImageError, Image.DecompressionBombError):
+                    return None
+            file = open(variant.path, 'rb')
+        if rendered:
+            track_variant_size(os.fstat(file.fileno()).st_size)
+        return file
+
+    if time.time() - os.fstat(file.fileno()).st_mtime > TOUCH_INTERVAL:
+        os.utime(file.fileno())
+    return file
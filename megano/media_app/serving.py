@@ -0,0 +1,171 @@
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import BinaryIO, Iterator
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+STREAM_CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def resolve_file(root: str | Path, name: str) -> tuple[Path, os.stat_result]:
+    """
+    Находит файл внутри папки. Пути, выходящие за пределы папки, не допускаются.
+    :param root: папка (MEDIA_ROOT или STATIC_ROOT)
+    :param name: путь до файла относительно папки
+    :return: кортеж из абсолютного пути и результата stat.
+    """
+    root = Path(root).resolve()
+    path = (root / name).resolve()
+    if root not in path.parents:
+        raise Http404('Файл не найден')
+    try:
+        stat = path.stat()
+    except OSError:
+        raise Http404('Файл не найден')
+    if not path.is_file():
+        raise Http404('Файл не найден')
+    return path, stat
+
+
+def get_file_etag(stat: os.stat_result) -> str:
+    """
+    Формирует ETag файла из времени изменения и размера (как у nginx), не читая файл.
+    :param stat: результат stat файла
+    :return: ETag в кавычках.
+    """
+    return '"{mtime:x}-{size:x}"'.format(mtime=stat.st_mtime_ns, size=stat.st_size)
+
+
+def get_byte_range(request: HttpRequest, size: int, etag: str, last_modified: int) -> tuple[int, int] | None:
+    """
+    Разбирает заголовок Range. Поддерживается один диапазон: bytes=начало-конец, bytes=начало- и bytes=-длина.
+    Если заголовок If-Range не совпадает с текущей версией файла, диапазон игнорируется.
+    :param request: запрос
+    :param size: размер файла
+    :param etag: ETag файла
+    :param last_modified: время изменения файла (timestamp)
+    :return: кортеж из первого и последнего байта включительно или None, если нужно отдать весь файл.
+    Возвращает ошибку ValueError, если диапазон не пересекается с файлом.
+    """
+    header = request.headers.get('Range', '').replace(' ', '')
+    match = RANGE_PATTERN.match(header)
+    if not match or match.groups() == ('', ''):
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None
+
+    start, end = match.groups()
+    if not start:
+        length = int(end)
+        if not length:
+            raise ValueError('Пустой диапазон')
+        return max(size - length, 0), size - 1
+    start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError('Диапазон за пределами файла')
+    return start, end
+
+
+def read_file_range(file: BinaryIO, start: int, length: int) -> Iterator[bytes]:
+    """
+    Читает часть файла по частям и закрывает файл.
+    :param file: открытый файл
+    :param start: первый байт
+    :param length: количество байт
+    """
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def get_offload_response(path: Path, name: str) -> HttpResponse | None:
+    """
+    Формирует пустой ответ, тело которого отправит веб-сервер (MEDIA_OFFLOAD):
+    nginx по заголовку X-Accel-Redirect (internal location MEDIA_OFFLOAD_PREFIX, путь URL-кодируется)
+    или Apache/lighttpd по X-Sendfile (абсолютный путь до файла).
+    Диапазоны и условные запросы в этом случае обрабатывает веб-сервер.
+    :param path: абсолютный путь до файла
+    :param name: путь до файла относительно MEDIA_ROOT
+    :return: ответ или None, если выгрузка отключена.
+    """
+    if not settings.MEDIA_OFFLOAD:
+        return None
+    response = HttpResponse()
+    del response['Content-Type']  # тип файла определит веб-сервер
+    if settings.MEDIA_OFFLOAD == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = '{prefix}/{name}'.format(
+            prefix=settings.MEDIA_OFFLOAD_PREFIX.rstrip('/'), name=quote(name))
+    else:
+        response['X-Sendfile'] = str(path)
+    return response
+
+
+def serve_file(request: HttpRequest, root: str | Path, name: str, cache_control: str,
+               offload: bool = False) -> HttpResponse:
+    """
+    Отдает файл с поддержкой условных запросов (ETag, Last-Modified), диапазонов байт (Range)
+    и заголовком Cache-Control. Файл целиком отдается через FileResponse, чтобы сервер мог использовать
+    wsgi.file_wrapper (sendfile), диапазон читается по частям генератором.
+    :param request: запрос
+    :param root: папка с файлами
+    :param name: путь до файла относительно папки
+    :param cache_control: значение заголовка Cache-Control
+    :param offload: разрешить передать отправку файла веб-серверу (см. get_offload_response)
+    :return: ответ 200, 206, 304, 412 или 416.
+    """
+    path, stat = resolve_file(root, name)
+    etag, last_modified = get_file_etag(stat), int(stat.st_mtime)
+    if offload:
+        response = get_offload_response(path, name)
+        if response is not None:
+            response['Cache-Control'] = cache_control
+            return response
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        conditional['ETag'] = etag
+        conditional['Cache-Control'] = cache_control
+        return conditional
+
+    size = stat.st_size
+    try:
+        byte_range = get_byte_range(request, size, etag, last_modified)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */{size}'.format(size=size)
+        return response
+
+    content_type, encoding = mimetypes.guess_type(str(path))
+    content_type = content_type or 'application/octet-stream'
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(read_file_range(open(path, 'rb'), start, end - start + 1),
+                                         status=206, content_type=content_type)
+        response['Content-Range'] = 'bytes {start}-{end}/{size}'.format(start=start, end=end, size=size)
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Length'] = size
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,36 @@
+import threading
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from catalog_app.models import ImageCategory
+from products_app.models import ProductImage
+from .derivatives import submit_derivatives
+from .utils import save_content_hash
+
+
+@receiver(pre_save, sender=ProductImage)
+@receiver(pre_save, sender=ImageCategory)
+def reset_content_hash(sender, instance: ProductImage | ImageCategory, raw: bool = False, **kwargs):
+    """Сбрасывает хеш содержимого, если файл изображения заменили: прежние уменьшенные копии к нему не относятся."""
+    if raw or instance.pk is None or not instance.content_hash:
+        return
+    stored_name = sender.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+    if stored_name != instance.image.name:
+        instance.content_hash = ''
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=ImageCategory)
+def schedule_image_derivatives(sender, instance: ProductImage | ImageCategory, raw: bool = False, **kwargs):
+    """
+    После сохранения транзакции отправляет новое изображение в пул процессов для создания уменьшенных копий.
+    При загрузке фикстур (raw) копии не создаются: их нужно создать командой build_image_derivatives.
+    """
+    if raw or instance.content_hash or not instance.image:
+        return
+    name = instance.image.name
+    callback = partial(save_content_hash, sender, instance.pk, name, caller_thread=threading.get_ident())
+    transaction.on_commit(lambda: submit_derivatives(name).add_done_callback(callback))
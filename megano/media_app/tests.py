@@ -0,0 +1,268 @@
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import FileResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from catalog_app.models import Category, ImageCategory
+from products_app.models import Product, ProductImage
+from . import resize, views
+from .derivatives import DERIVATIVE_WIDTHS, build_derivatives, get_derivative_name
+from .utils import save_content_hash
+
+
+def get_image_file(name: str, size: tuple[int, int] = (800, 400), mode: str = 'RGBA') -> SimpleUploadedFile:
+    """
+    Создает файл изображения PNG для загрузки.
+    :param name: имя файла
+    :param size: размер изображения
+    :param mode: режим изображения
+    :return: загружаемый файл.
+    """
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'red').save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageDerivativesTestCase(TestCase):
+    """Проверяет создание уменьшенных копий изображений и их выдачу в srcset."""
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root.name, IMAGE_DERIVATIVE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.product = Product.objects.create(title='Смартфон', price=100, count=1, rating=5)
+
+    def test_build_derivatives(self):
+        path = os.path.join(self.media_root.name, 'source.png')
+        Image.new('RGBA', (800, 400), 'red').save(path)
+
+        content_hash = build_derivatives('source.png', self.media_root.name)
+        for width in DERIVATIVE_WIDTHS:
+            with Image.open(os.path.join(self.media_root.name, get_derivative_name(content_hash, width, 'webp'))) as image:
+                self.assertEqual(image.size, (width, width // 2))
+            with Image.open(os.path.join(self.media_root.name, get_derivative_name(content_hash, width, 'jpg'))) as image:
+                self.assertEqual((image.format, image.mode), ('JPEG', 'RGB'))
+
+        self.assertIsNone(build_derivatives('missing.png', self.media_root.name))
+        with open(os.path.join(self.media_root.name, 'broken.png'), 'wb') as file:
+            file.write(b'not an image')
+        self.assertIsNone(build_derivatives('broken.png', self.media_root.name))
+
+    def test_upload_and_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=self.product, image=get_image_file('phone.png'))
+        image.refresh_from_db()
+        self.assertEqual(len(image.content_hash), 32)
+
+        response = self.client.get(reverse('products_app:product_detail', kwargs={'pk': self.product.pk}))
+        data, = response.json()['images']
+        self.assertIn('/media/derivatives/{prefix}/{hash}/320.webp 320w'.format(
+            prefix=image.content_hash[:2], hash=image.content_hash), data['srcsetWebp'])
+        self.assertEqual(data['srcset'].count('.jpg'), len(DERIVATIVE_WIDTHS))
+
+        image.image = get_image_file('phone-blue.png', mode='RGB')
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        old_hash, image.content_hash = image.content_hash, ''
+        image.refresh_from_db()
+        self.assertNotIn(image.content_hash, ('', old_hash))
+
+    def test_backfill_command(self):
+        category = Category.objects.create(title='Телефоны')
+        with self.captureOnCommitCallbacks(execute=False):
+            product_image = ProductImage.objects.create(product=self.product, image=get_image_file('phone.png'))
+            category_image = ImageCategory.objects.create(category=category, image=get_image_file('phones.png'))
+
+        call_command('build_image_derivatives', workers=2, stdout=io.StringIO())
+        product_image.refresh_from_db()
+        category_image.refresh_from_db()
+        self.assertEqual(product_image.content_hash, category_image.content_hash)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.media_root.name, get_derivative_name(product_image.content_hash, DERIVATIVE_WIDTHS[0], 'webp'))))
+
+    def test_done_future_keeps_request_connection(self):
+        # если Future готов до add_done_callback, функция выполняется в потоке запроса
+        future = Future()
+        future.set_result(None)
+        save_content_hash(ProductImage, self.product.pk, 'missing.png', future, caller_thread=threading.get_ident())
+        self.assertEqual(Product.objects.filter(pk=self.product.pk).count(), 1)
+
+
+class ResizedImageTestCase(TestCase):
+    """Проверяет уменьшение изображений по запросу и дисковый кэш уменьшенных копий."""
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.cache_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.addCleanup(self.cache_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root.name, MEDIA_RESIZE_CACHE_ROOT=self.cache_root.name,
+                                              IMAGE_DERIVATIVE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.delete(resize.CACHE_SIZE_KEY)
+        product = Product.objects.create(title='Смартфон', price=100, count=1, rating=5)
+        with self.captureOnCommitCallbacks(execute=False):
+            self.image = ProductImage.objects.create(product=product, image=get_image_file('phone.png'))
+
+    def get_url(self, name: str, size: str = '100x100') -> str:
+        return '/media/resize/{size}/{name}'.format(size=size, name=name)
+
+    def test_resize_and_etag(self):
+        response = self.client.get(self.get_url(self.image.image.name))
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/png'))
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (100, 50))
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.get_url(self.image.image.name))
+            self.assertEqual(response['ETag'], etag)
+            b''.join(response.streaming_content)
+            response = self.client.get(self.get_url(self.image.image.name), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_only_model_images(self):
+        with open(os.path.join(self.media_root.name, 'secret.png'), 'wb') as file:
+            file.write(self.image.image.open('rb').read())
+        for url in (self.get_url('secret.png'), self.get_url('../secret.png'),
+                    self.get_url(self.image.image.name, size='5000x10')):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_concurrent_requests_resize_once(self):
+        variant = resize.get_variant(self.image.image.name, 50, 50)
+        render = resize.render_variant
+        calls = []
+
+        def slow_render(*args):
+            calls.append(args)
+            time.sleep(0.1)
+            render(*args)
+
+        files = []
+        with mock.patch.object(resize, 'render_variant', slow_render), \
+                mock.patch.object(resize, 'is_resizable', return_value=True):
+            threads = [threading.Thread(target=lambda: files.append(resize.open_variant(variant))) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({file.read() for file in files}), 1)
+        for file in files:
+            file.close()
+
+    def test_single_flight_without_fcntl(self):
+        variant = resize.get_variant(self.image.image.name, 50, 50)
+        with mock.patch.object(resize, 'fcntl', None), mock.patch.object(resize, 'is_resizable', return_value=True):
+            resize.open_variant(variant).close()
+        self.assertTrue(variant.path.exists())
+        self.assertFalse((Path(self.cache_root.name) / 'locks').exists())
+
+    def test_eviction(self):
+        variants = [resize.get_variant(self.image.image.name, size, size) for size in (40, 60, 80)]
+        for age, variant in enumerate(reversed(variants)):
+            resize.open_variant(variant).close()
+            os.utime(variant.path, (time.time() - age * 100, time.time() - age * 100))
+        sizes = [variant.path.stat().st_size for variant in variants]
+        resize.evict_variants(max_size=sum(sizes) - 1)
+        self.assertEqual([variant.path.exists() for variant in variants], [False, True, True])
+        self.assertEqual(cache.get(resize.CACHE_SIZE_KEY), sum(sizes[1:]))
+
+    def test_eviction_runs_on_size_counter(self):
+        variants = [resize.get_variant(self.image.image.name, size, size) for size in (40, 60, 80)]
+        with mock.patch.object(resize, 'evict_variants', wraps=resize.evict_variants) as evict_variants:
+            resize.open_variant(variants[0]).close()
+            self.assertEqual(evict_variants.call_count, 1)
+            resize.open_variant(variants[1]).close()
+            self.assertEqual(evict_variants.call_count, 1)
+            self.assertEqual(cache.get(resize.CACHE_SIZE_KEY),
+                             sum(variant.path.stat().st_size for variant in variants[:2]))
+
+            max_size = cache.get(resize.CACHE_SIZE_KEY)
+            with override_settings(MEDIA_RESIZE_CACHE_MAX_SIZE=max_size):
+                resize.open_variant(variants[2]).close()
+        self.assertEqual(evict_variants.call_count, 2)
+        self.assertFalse(variants[0].path.exists())
+        total = sum(variant.path.stat().st_size for variant in variants if variant.path.exists())
+        self.assertEqual(cache.get(resize.CACHE_SIZE_KEY), total)
+        self.assertLessEqual(total, max_size * resize.EVICT_RATIO)
+
+
+class MediaServingTestCase(TestCase):
+    """Проверяет раздачу медиафайлов и статики: условные запросы, диапазоны, кэширование и выгрузку веб-серверу."""
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.static_root = os.path.join(self.media_root.name, 'static')
+        settings_override = override_settings(MEDIA_ROOT=self.media_root.name, STATIC_ROOT=self.static_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for name in ('docs/file.txt', 'derivatives/ab/abc/160.webp', 'static/app.0123456789ab.js', 'static/app.js'):
+            os.makedirs(os.path.dirname(os.path.join(self.media_root.name, name)), exist_ok=True)
+            with open(os.path.join(self.media_root.name, name), 'wb') as file:
+                file.write(b'0123456789')
+
+    def test_conditional_requests(self):
+        response = self.client.get('/media/docs/file.txt')
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual((response['Content-Type'], response['Content-Length']), ('text/plain', '10'))
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual((response['Accept-Ranges'], response['Cache-Control']), ('bytes', 'public, max-age=86400'))
+
+        not_modified = self.client.get('/media/docs/file.txt', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((not_modified.status_code, not_modified['ETag']), (304, response['ETag']))
+        not_modified = self.client.get('/media/docs/file.txt', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(self.client.get('/media/derivatives/ab/abc/160.webp')['Cache-Control'],
+                         'public, max-age=31536000, immutable')
+        self.assertEqual(self.client.get('/media/../etc/passwd').status_code, 404)
+
+    def test_ranges(self):
+        etag = self.client.get('/media/docs/file.txt')['ETag']
+        for header, status_code, content in (('bytes=2-5', 206, b'2345'), ('bytes=-3', 206, b'789'),
+                                             ('bytes=8-100', 206, b'89'), ('bytes=0-1,4-5', 200, b'0123456789')):
+            response = self.client.get('/media/docs/file.txt', HTTP_RANGE=header, HTTP_IF_RANGE=etag)
+            self.assertEqual((response.status_code, b''.join(response.streaming_content)), (status_code, content))
+        response = self.client.get('/media/docs/file.txt', HTTP_RANGE='bytes=2-5')
+        self.assertNotIsInstance(response, FileResponse)
+        self.assertEqual((response['Content-Range'], response['Content-Length']), ('bytes 2-5/10', '4'))
+
+        response = self.client.get('/media/docs/file.txt', HTTP_RANGE='bytes=20-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */10'))
+        response = self.client.get('/media/docs/file.txt', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_offload(self):
+        with self.settings(MEDIA_OFFLOAD='x-accel-redirect'):
+            response = self.client.get('/media/docs/file.txt')
+        self.assertEqual((response['X-Accel-Redirect'], response.content), ('/protected-media/docs/file.txt', b''))
+        with open(os.path.join(self.media_root.name, 'docs/отчет 1.txt'), 'wb') as file:
+            file.write(b'0')
+        with self.settings(MEDIA_OFFLOAD='x-accel-redirect'):
+            response = self.client.get('/media/docs/отчет 1.txt')
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/docs/%D0%BE%D1%82%D1%87%D0%B5%D1%82%201.txt')
+        with self.settings(MEDIA_OFFLOAD='x-sendfile'):
+            response = self.client.get('/media/docs/file.txt')
+        self.assertEqual(response['X-Sendfile'], os.path.join(os.path.realpath(self.media_root.name), 'docs/file.txt'))
+
+    def test_hashed_static(self):
+        with mock.patch.object(views.staticfiles_storage, 'hashed_files', {'app.js': 'app.0123456789ab.js'},
+                               create=True):
+            response = self.client.get('/static/app.0123456789ab.js')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertEqual(self.client.get('/static/app.js')['Cache-Control'], 'public, max-age=86400')
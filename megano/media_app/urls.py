@@ -0,0 +1,11 @@
+from django.urls import path
+
+from .views import MediaFileView, ResizedImageView, StaticFileView
+
+app_name = 'media_app'
+
+urlpatterns = [
+    path('media/resize/<int:width>x<int:height>/<path:name>', ResizedImageView.as_view(), name='resize_image'),
+    path('media/<path:name>', MediaFileView.as_view(), name='media_file'),
+    path('static/<path:name>', StaticFileView.as_view(), name='static_file'),
+]
@@ -0,0 +1,40 @@
+import threading
+from concurrent.futures import Future
+
+from django.db import connection
+
+from products_app.cache import bump_cache_version
+from products_app.models import ProductImage
+from catalog_app.models import ImageCategory
+
+
+def get_image_data(image: ProductImage | ImageCategory) -> dict[str, str]:
+    """
+    Формирует описание изображения для фронтенда.
+    :param image: экземпляр модели ProductImage или ImageCategory
+    :return: словарь с адресом оригинала, альтернативным текстом и наборами уменьшенных копий (srcset)
+    в форматах JPEG и WebP. Пока копии не созданы, наборы пустые.
+    """
+    return {'src': image.src(), 'alt': image.alt(), 'srcset': image.srcset(), 'srcsetWebp': image.srcset_webp()}
+
+
+def save_content_hash(model: type[ProductImage | ImageCategory], pk: int, name: str, future: Future,
+                      caller_thread: int | None = None):
+    """
+    Сохраняет хеш содержимого изображения после создания уменьшенных копий.
+    Хеш записывается, только если изображение за это время не заменили.
+    :param model: ProductImage или ImageCategory
+    :param pk: идентификатор изображения
+    :param name: путь до обработанного файла относительно MEDIA_ROOT
+    :param future: Future с результатом build_derivatives
+    :param caller_thread: идентификатор потока, который отправил изображение в пул. Если функцию вызвал
+    служебный поток пула, его соединение с базой данных закрывается. Если Future уже был готов,
+    функция выполняется в потоке запроса, и его соединение закрывать нельзя
+    """
+    try:
+        content_hash = future.result()
+        if content_hash and model.objects.filter(pk=pk, image=name).update(content_hash=content_hash):
+            bump_cache_version(model)
+    finally:
+        if caller_thread is not None and threading.get_ident() != caller_thread:
+            connection.close()
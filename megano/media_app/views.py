@@ -0,0 +1,79 @@
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.views import View
+
+from .avatars import AVATARS_DIR
+from .derivatives import DERIVATIVES_DIR
+from .resize import get_variant, open_variant
+from .serving import IMMUTABLE_CACHE_CONTROL, serve_file
+
+# файлы, имя которых меняется вместе с содержимым: уменьшенные копии и аватары (по хешу),
+# статика после collectstatic в режиме манифеста (имя.хеш.расширение)
+CONTENT_ADDRESSED_MEDIA = re.compile(r'^({derivatives}|{avatars}/[0-9a-f]{{2}}/[0-9a-f]{{32}}\.\w+$)'.format(
+    derivatives=DERIVATIVES_DIR + '/', avatars=AVATARS_DIR))
+HASHED_STATIC = re.compile(r'^(?P<name>.+)\.[0-9a-f]{12}(?P<extension>\.[^./]+)$')
+
+
+class ResizedImageView(View):
+    """
+    Класс view. Отдает изображение товара, категории или аватар, уменьшенные до размера из адреса:
+    /media/resize/<ширина>x<высота>/<путь до файла>. Копии создаются при первом запросе и хранятся
+    в дисковом кэше, ответ отдается с сильным ETag.
+    """
+    def get(self, request: HttpRequest, width: int, height: int, name: str) -> HttpResponse:
+        """Метод - get. Формирует ответ для пользователя"""
+        max_side = settings.MEDIA_RESIZE_MAX_SIDE
+        if not (0 < width <= max_side and 0 < height <= max_side):
+            raise Http404('Недопустимый размер изображения')
+        variant = get_variant(name=name, width=width, height=height)
+        if variant is None:
+            raise Http404('Изображение не найдено')
+
+        if variant.etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            file = open_variant(variant)
+            if file is None:
+                raise Http404('Изображение не найдено')
+            response = FileResponse(file, content_type=variant.content_type)
+        response['ETag'] = variant.etag
+        response['Cache-Control'] = 'public, max-age={age}'.format(age=settings.MEDIA_RESIZE_CACHE_AGE)
+        return response
+
+
+class MediaFileView(View):
+    """
+    Класс view. Отдает загруженные файлы из MEDIA_ROOT с поддержкой ETag/Last-Modified и Range.
+    Файлы, имя которых зависит от содержимого, кэшируются браузером навсегда, остальные - на MEDIA_CACHE_AGE.
+    Если задан MEDIA_OFFLOAD, сам файл отправляет веб-сервер (X-Accel-Redirect или X-Sendfile).
+    """
+    def get(self, request: HttpRequest, name: str) -> HttpResponse:
+        """Метод - get. Формирует ответ для пользователя"""
+        if CONTENT_ADDRESSED_MEDIA.match(name):
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = 'public, max-age={age}'.format(age=settings.MEDIA_CACHE_AGE)
+        return serve_file(request, root=settings.MEDIA_ROOT, name=name, cache_control=cache_control, offload=True)
+
+
+class StaticFileView(View):
+    """
+    Класс view. Отдает собранную командой collectstatic статику из STATIC_ROOT, когда DEBUG выключен.
+    В режиме манифеста (STATIC_MANIFEST) в шаблонах используются имена с хешем содержимого,
+    такие файлы кэшируются браузером навсегда.
+    """
+    def get(self, request: HttpRequest, name: str) -> HttpResponse:
+        """Метод - get. Формирует ответ для пользователя"""
+        if not settings.STATIC_ROOT:
+            raise Http404('Статика не собрана')
+        match = HASHED_STATIC.match(name)
+        hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+        if match and hashed_files.get(match.group('name') + match.group('extension')) == name:
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = 'public, max-age={age}'.format(age=settings.MEDIA_CACHE_AGE)
+        return serve_file(request, root=settings.STATIC_ROOT, name=name, cache_control=cache_control)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
     "orders_app.apps.OrdersAppConfig",
     "products_app.apps.ProductsAppConfig",
     "profileuser_app.apps.ProfileuserAppConfig",
+    "media_app.apps.MediaAppConfig",
 ]
 
 MIDDLEWARE = [
@@ -52,6 +54,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "basket_app.middleware.BasketCookieMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -84,6 +87,11 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Тестовая база в файле, а не в памяти: параллельные соединения
+        # (тесты конкурентной оплаты) ждут блокировку, а не падают с ошибкой. Файл лежит во временной папке.
+        "TEST": {
+            "NAME": Path(tempfile.gettempdir()) / "megano_test_db.sqlite3",
+        },
     }
 }
 
@@ -123,10 +131,44 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "static"
+
+# Режим манифеста: collectstatic добавляет к именам файлов хеш содержимого, шаблоны ссылаются на них,
+# а StaticFileView отдает такие файлы с Cache-Control: immutable. Перед запуском нужно выполнить collectstatic.
+STATIC_MANIFEST = not DEBUG
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.ManifestStaticFilesStorage" if STATIC_MANIFEST
+        else "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "uploaded_files"
 
+# Медиафайлы отдает media_app.views.MediaFileView. Чтобы файл отправлял веб-сервер, а не Django,
+# задайте MEDIA_OFFLOAD: "x-accel-redirect" (nginx, internal location MEDIA_OFFLOAD_PREFIX
+# с alias на MEDIA_ROOT) или "x-sendfile" (Apache mod_xsendfile, lighttpd).
+MEDIA_OFFLOAD = None
+MEDIA_OFFLOAD_PREFIX = "/protected-media/"
+MEDIA_CACHE_AGE = 60 * 60 * 24
+
+# Количество процессов, в которых создаются уменьшенные копии загруженных изображений.
+# 0 - изображения обрабатываются сразу в процессе, который их сохранил.
+IMAGE_DERIVATIVE_WORKERS = 2
+
+# Дисковый кэш изображений, уменьшенных по запросу /media/resize/<ширина>x<высота>/<путь>.
+# Когда размер кэша превышает MEDIA_RESIZE_CACHE_MAX_SIZE байт, удаляются давно не запрашивавшиеся копии.
+# Размер считается счетчиком в CACHES, папка обходится только при переполнении.
+MEDIA_RESIZE_CACHE_ROOT = BASE_DIR / "resize_cache"
+MEDIA_RESIZE_CACHE_MAX_SIZE = 512 * 1024 * 1024
+MEDIA_RESIZE_CACHE_AGE = 60 * 60 * 24
+MEDIA_RESIZE_MAX_SIDE = 2000
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -140,3 +182,36 @@ REST_FRAMEWORK = {
 }
 
 CART_SESSION_ID = "cart"
+
+# Хранилище корзины: в сессии (basket_app.storage.SessionBasketStorage),
+# в базе данных с переносом анонимной корзины при входе (basket_app.storage.DatabaseBasketStorage)
+# или в подписанной cookie для небольших анонимных корзин (basket_app.storage.CookieBasketStorage).
+BASKET_STORAGE = "basket_app.storage.SessionBasketStorage"
+
+# Серверное хранилище, в которое CookieBasketStorage переносит корзину
+# после входа пользователя или когда в ней становится больше BASKET_COOKIE_MAX_ITEMS товаров.
+BASKET_SERVER_STORAGE = "basket_app.storage.DatabaseBasketStorage"
+BASKET_COOKIE_NAME = "basket"
+BASKET_COOKIE_AGE = 60 * 60 * 24 * 14
+BASKET_COOKIE_MAX_ITEMS = 20
+
+# Кэш ответов витринных эндпоинтов (баннеры, популярные товары, теги и т.д.) и версий моделей.
+# Кэш должен быть общим для всех процессов: версии меняют и другие воркеры, и команды
+# (refresh_effective_prices, refresh_popularity, build_image_derivatives). Поэтому LocMemCache
+# не подходит (см. products_app.checks), а для нескольких серверов нужен Redis:
+# "django.core.cache.backends.redis.RedisCache".
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "OPTIONS": {
+            "MAX_ENTRIES": 10000,
+        },
+    }
+}
+
+# Ответы инвалидируются версиями моделей, срок жизни ограничен на случай, если версия изменилась мимо кэша.
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# Тесты работают с кэшем во временной папке
+TEST_RUNNER = "megano.test_runner.TestRunner"
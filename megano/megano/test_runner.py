@@ -0,0 +1,25 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Запускает тесты с кэшем во временной папке. Файловый кэш переживает перезапуск, поэтому без этого
+    версии и ответы, закэшированные прошлым запуском тестов или сервером разработки, попадали бы в тесты.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='megano-test-cache-')
+        self.cache_settings = override_settings(CACHES={
+            alias: {**options, 'LOCATION': self.cache_dir} for alias, options in settings.CACHES.items()
+        })
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
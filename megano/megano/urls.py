@@ -15,8 +15,6 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
@@ -28,7 +26,5 @@ urlpatterns = [
     path("", include("orders_app.urls")),
     path("", include("products_app.urls")),
     path("", include("profileuser_app.urls")),
+    path("", include("media_app.urls")),
 ]
-
-if settings.DEBUG:
-    urlpatterns.extend(static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT))
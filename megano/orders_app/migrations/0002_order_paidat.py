@@ -0,0 +1,25 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:35
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_paid_at(apps, schema_editor):
+    Order = apps.get_model('orders_app', 'Order')
+    Order.objects.filter(status='accepted').update(paidAt=F('createdAt'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='paidAt',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Дата оплаты'),
+        ),
+        migrations.RunPython(fill_paid_at, migrations.RunPython.noop),
+    ]
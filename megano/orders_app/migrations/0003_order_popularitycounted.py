@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:57
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def mark_counted_orders(apps, schema_editor):
+    Order = apps.get_model('orders_app', 'Order')
+    ProductPopularity = apps.get_model('products_app', 'ProductPopularity')
+    refreshed_at = ProductPopularity.objects.aggregate(refreshed_at=Max('updatedAt'))['refreshed_at']
+    if refreshed_at is not None:
+        Order.objects.filter(status='accepted', paidAt__lte=refreshed_at).update(popularityCounted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_app', '0002_order_paidat'),
+        ('products_app', '0005_productpopularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='popularityCounted',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Учтен в популярности товаров'),
+        ),
+        migrations.RunPython(mark_counted_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-17 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_app', '0003_order_popularitycounted'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user_profile', '-createdAt', '-id'], name='orders_user_created_idx'),
+        ),
+    ]
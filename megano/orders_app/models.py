@@ -8,6 +8,9 @@ class Order(models.Model):
     Модель заказа.
     """
     createdAt = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    paidAt = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='Дата оплаты')
+    popularityCounted = models.BooleanField(default=False, db_index=True, editable=False,
+                                            verbose_name='Учтен в популярности товаров')
     user_profile: ProfileUser = models.ForeignKey(ProfileUser, on_delete=models.PROTECT,
                                                   related_name='orders', verbose_name='Пользователь')
     deliveryType = models.CharField(max_length=32, blank=True, null=False, verbose_name='Тип доставки')
@@ -22,6 +25,10 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ('pk',)
+        indexes = [
+            # история заказов пользователя постранично: WHERE user_profile_id = ... ORDER BY createdAt DESC, id DESC
+            models.Index(fields=('user_profile', '-createdAt', '-id'), name='orders_user_created_idx'),
+        ]
 
     def fullName(self) -> str:
         """
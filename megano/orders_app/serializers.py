@@ -1,25 +1,41 @@
 from rest_framework import serializers
 from products_app.serializers import FewerInfoProductSerializer
+from products_app.models import Product
 from .models import Order
 from .utils import get_nice_data
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderProductSerializer(FewerInfoProductSerializer):
     """
-    Сериализатор заказа.
+    Сериализатор товара в заказе. Вместо количества товара на складе возвращает количество товара в заказе.
+    Количество передается в контексте под ключом quantities.
+    """
+    count = serializers.SerializerMethodField()
+
+    def get_count(self, instance: Product) -> int:
+        """
+        Метод сериализатора. Возвращает количество товара в заказе.
+        :param instance: экземпляр модели Product
+        :return: Количество товара в заказе.
+        """
+        return self.context.get('quantities', {}).get(instance.pk, 0)
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """
+    Сериализатор заказа без товаров. Используется в кратком режиме истории заказов.
     """
     createdAt = serializers.SerializerMethodField()
     orderId = serializers.SerializerMethodField()
     fullName = serializers.StringRelatedField()
     email = serializers.StringRelatedField()
     phone = serializers.StringRelatedField()
-    products = FewerInfoProductSerializer(many=True, required=True)
 
     class Meta:
         model = Order
         fields = ('id', 'createdAt', 'fullName', 'email',
                   'phone', 'deliveryType', 'paymentType', 'totalCost',
-                  'status', 'city', 'address', 'products', 'orderId')
+                  'status', 'city', 'address', 'orderId')
 
     def get_createdAt(self, instance: Order) -> str:
         """
@@ -33,5 +49,27 @@ class OrderSerializer(serializers.ModelSerializer):
         return instance.pk
 
 
+class OrderSerializer(OrderSummarySerializer):
+    """
+    Сериализатор заказа.
+    """
+    products = serializers.SerializerMethodField()
+
+    class Meta(OrderSummarySerializer.Meta):
+        fields = ('id', 'createdAt', 'fullName', 'email',
+                  'phone', 'deliveryType', 'paymentType', 'totalCost',
+                  'status', 'city', 'address', 'products', 'orderId')
+
+    def get_products(self, instance: Order) -> list[dict]:
+        """
+        Метод сериализатора. Возвращает товары заказа с количеством каждого товара в заказе.
+        Заказ должен быть загружен через get_orders_with_products.
+        :param instance: Экземпляр модели Order
+        :return: список из словарей с информацией о товарах.
+        """
+        quantities = {item.product_id: item.quantity for item in instance.basket_quantities}
+        return OrderProductSerializer(instance.products.all(), many=True, context={'quantities': quantities}).data
+
+
 
 
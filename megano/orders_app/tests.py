@@ -1,3 +1,222 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products_app.models import Product, ProductImage, SaleProduct, Tag
+from profileuser_app.models import ProfileUser
+from .models import Order, QuantityProductsInBasket
+
+
+class ConcurrentPaymentTestCase(TransactionTestCase):
+    """
+    Проверяет, что параллельные оплаты заказов с одним и тем же товаром
+    не продают больше, чем есть на складе.
+    """
+    stock = 3
+    payments = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='Password123')
+        profile = ProfileUser.objects.create(pk=self.user.pk, user=self.user, fullName='Иванов Иван Иванович',
+                                             email='buyer@mail.ru', phone='89990000000')
+        self.product = Product.objects.create(title='Product', price=100, count=self.stock, rating=5)
+        self.orders = []
+        for _ in range(self.payments):
+            order = Order.objects.create(user_profile=profile, totalCost=100, status='unconfirmed',
+                                         deliveryType='ordinary', paymentType='online',
+                                         city='Москва', address='Красная площадь, 1')
+            order.products.add(self.product)
+            QuantityProductsInBasket.objects.create(order=order, product=self.product, quantity=1)
+            self.orders.append(order)
+
+    def pay(self, order: Order, statuses: list):
+        """
+        Оплачивает заказ в отдельном потоке.
+        :param order: Экземпляр модели Order
+        :param statuses: список, в который складываются статус-коды ответов
+        """
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            response = client.post(reverse('orders_app:payment', kwargs={'pk': order.pk}), {
+                'number': '54789342', 'name': 'Иванов Иван Иванович', 'month': '02', 'year': '2030', 'code': '123'
+            }, format='json')
+            statuses.append(response.status_code)
+        finally:
+            connection.close()
+
+    def test_concurrent_payments(self):
+        statuses = []
+        threads = [threading.Thread(target=self.pay, args=(order, statuses)) for order in self.orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(statuses), self.payments)
+        self.assertEqual(statuses.count(200), self.stock)
+        self.assertEqual(statuses.count(400), self.payments - self.stock)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).count, 0)
+        self.assertEqual(Order.objects.filter(status='accepted').count(), self.stock)
+
+    def test_order_cannot_be_paid_twice(self):
+        statuses = []
+        self.pay(self.orders[0], statuses)
+        self.pay(self.orders[0], statuses)
+        self.assertEqual(statuses, [200, 400])
+        self.assertEqual(Product.objects.get(pk=self.product.pk).count, self.stock - 1)
+
+
+class OrderDetailQueriesTestCase(TestCase):
+    """
+    Проверяет, что детальная информация о заказе загружается за постоянное количество запросов
+    и содержит количество товаров в заказе, а не на складе.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', password='Password123')
+        cls.profile = ProfileUser.objects.create(pk=cls.user.pk, user=cls.user, fullName='Иванов Иван Иванович')
+        cls.tag = Tag.objects.create(name='tag')
+
+    def create_order(self, quantity: int) -> Order:
+        """
+        Создает заказ с товарами, у каждого из которых есть изображение и тег.
+        :param quantity: количество товаров в заказе
+        :return: созданный заказ.
+        """
+        order = Order.objects.create(user_profile=self.profile, totalCost=100, status='unconfirmed')
+        for index in range(quantity):
+            product = Product.objects.create(title='Product {index}'.format(index=index), price=100, count=50,
+                                             rating=5)
+            ProductImage.objects.create(product=product, image='products/images/id_1/plane.jpg')
+            product.tags.add(self.tag)
+            order.products.add(product)
+            QuantityProductsInBasket.objects.create(order=order, product=product, quantity=index + 1)
+        return order
+
+    def get_order(self, order: Order) -> tuple[dict, int]:
+        """
+        Запрашивает детальную информацию о заказе.
+        :param order: Экземпляр модели Order
+        :return: данные ответа и количество выполненных запросов.
+        """
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('orders_app:order_details', kwargs={'pk': order.pk}))
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(context.captured_queries)
+
+    def test_quantities(self):
+        data, _ = self.get_order(self.create_order(quantity=3))
+        self.assertEqual(sorted(product['count'] for product in data['products']), [1, 2, 3])
+
+    def test_queries_do_not_depend_on_products_quantity(self):
+        _, few_queries = self.get_order(self.create_order(quantity=2))
+        _, many_queries = self.get_order(self.create_order(quantity=6))
+        self.assertEqual(few_queries, many_queries)
+
+
+class OrderCreationTestCase(TestCase):
+    """
+    Проверяет оформление заказа: количество запросов не зависит от количества товаров в корзине,
+    стоимость считается по текущим ценам с учетом акций, количество товаров сохраняется для каждой позиции.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', password='Password123')
+        cls.profile = ProfileUser.objects.create(pk=cls.user.pk, user=cls.user, fullName='Иванов Иван Иванович')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def create_order(self, quantity: int) -> tuple[Order, dict[int, int], Decimal, int]:
+        """
+        Кладет товары в корзину и оформляет заказ. На первый товар действует акция.
+        :param quantity: количество позиций в корзине
+        :return: заказ, количество каждого товара, ожидаемая стоимость и количество запросов оформления.
+        """
+        counts, total_cost = {}, Decimal(0)
+        for index in range(quantity):
+            product = Product.objects.create(title='Product {index}'.format(index=index), price=100 + index,
+                                             count=50, rating=5)
+            price = product.price
+            if index == 0:
+                SaleProduct.objects.create(product=product, salePrice=60, dateTo=timezone.localdate())
+                price = Decimal(60)
+            counts[product.pk] = index + 1
+            total_cost += price * counts[product.pk]
+            self.client.post(reverse('basket_app:basket'), {'id': product.pk, 'count': counts[product.pk]})
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('orders_app:orders'), [{'id': pk} for pk in counts],
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return Order.objects.get(pk=response.json()['orderId']), counts, total_cost, len(context.captured_queries)
+
+    def test_totals_and_quantities(self):
+        order, counts, total_cost, _ = self.create_order(quantity=3)
+        self.assertEqual((order.totalCost, order.status), (total_cost, 'unconfirmed'))
+        self.assertEqual(set(order.products.values_list('pk', flat=True)), set(counts))
+        self.assertEqual(dict(QuantityProductsInBasket.objects.filter(order=order).values_list(
+            'product_id', 'quantity')), counts)
+
+    def test_queries_do_not_depend_on_products_quantity(self):
+        _, _, _, few_queries = self.create_order(quantity=2)
+        _, _, _, many_queries = self.create_order(quantity=6)
+        self.assertEqual(few_queries, many_queries)
+
+
+class OrderHistoryTestCase(TestCase):
+    """Проверяет постраничную историю заказов и ее краткий режим."""
+    orders_quantity = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', password='Password123')
+        cls.profile = ProfileUser.objects.create(pk=cls.user.pk, user=cls.user, fullName='Иванов Иван Иванович')
+        product = Product.objects.create(title='Product', price=100, count=50, rating=5)
+        for _ in range(cls.orders_quantity):
+            order = Order.objects.create(user_profile=cls.profile, totalCost=100, status='unconfirmed')
+            order.products.add(product)
+            QuantityProductsInBasket.objects.create(order=order, product=product, quantity=2)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    @skipUnless(connection.vendor == 'sqlite', 'план запроса проверяется в SQLite')
+    def test_pages_use_index(self):
+        orders = Order.objects.filter(user_profile=self.profile).order_by('-createdAt', '-pk')
+        plan = orders.filter(createdAt__lt=timezone.now())[:2].explain()
+        self.assertIn('orders_user_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_cursor_pages(self):
+        orders, cursor = [], ''
+        while cursor is not None:
+            data = self.client.get(reverse('orders_app:orders'), {'cursor': cursor, 'limit': 2}).json()
+            self.assertLessEqual(len(data['items']), 2)
+            orders.extend(order['id'] for order in data['items'])
+            cursor = data['nextCursor']
+        self.assertEqual(orders, list(Order.objects.order_by('-createdAt', '-pk').values_list('pk', flat=True)))
+
+    def test_page_numbers(self):
+        data = self.client.get(reverse('orders_app:orders'), {'currentPage': 2, 'limit': 2}).json()
+        self.assertEqual((data['currentPage'], data['lastPage'], len(data['items'])), (2, 3, 2))
+        self.assertEqual(data['items'][0]['products'][0]['count'], 2)
+
+    def test_summary(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('orders_app:orders'), {'summary': 'true', 'cursor': ''})
+        self.assertEqual(len(response.json()['items']), self.orders_quantity)
+        self.assertNotIn('products', response.json()['items'][0])
+        self.assertEqual(response.json()['items'][0]['fullName'], 'Иванов Иван Иванович')
@@ -1,8 +1,14 @@
 from rest_framework.exceptions import ValidationError
 from rest_framework.request import Request
-from django.db.models.query import QuerySet
+from django.db import transaction
+from django.db.models import Case, F, Prefetch, Q, QuerySet, When
+from django.utils import timezone
 from basket_app.basket import Basket
 from products_app.models import Product
+from products_app.signals import products_stock_changed
+from products_app.pricing import get_effective_prices
+from products_app.utils import get_products_for_list
+from profileuser_app.models import ProfileUser
 from profileuser_app.utils import validate_fullname_user
 from .models import Order, QuantityProductsInBasket
 from decimal import Decimal
@@ -18,6 +24,24 @@ def get_nice_data(date: datetime) -> str:
     return datetime.strftime(date, '%d %B %Y, %H:%M:%S')
 
 
+def get_orders_with_products(orders: QuerySet | None = None) -> QuerySet:
+    """
+    Подготавливает QuerySet заказов для OrderSerializer.
+    Профиль пользователя загружается через JOIN, товары с акциями, изображениями и тегами
+    и количество товаров в заказе - отдельными запросами на весь список заказов.
+    Количество товаров складывается в атрибут basket_quantities каждого заказа.
+    :param orders: QuerySet с заказами. По умолчанию - все заказы.
+    :return: QuerySet с предзагруженными профилем, товарами и их количеством.
+    """
+    if orders is None:
+        orders = Order.objects.all()
+    return orders.select_related('user_profile').prefetch_related(
+        Prefetch('products', queryset=get_products_for_list()),
+        Prefetch('quantityproductsinbasket_set', to_attr='basket_quantities',
+                 queryset=QuantityProductsInBasket.objects.only('order_id', 'product_id', 'quantity')),
+    )
+
+
 def get_order_user_or_400(request: Request, pk: Order.pk, payment: bool = False) -> Order:
     """
     Проверяет, что заказ принадлежит пользователю, который делает запрос.
@@ -30,11 +54,10 @@ def get_order_user_or_400(request: Request, pk: Order.pk, payment: bool = False)
     :return: Возвращается заказ, если валидация данных прошла успешно
     """
     if not payment:
-        order = Order.objects.select_related('user_profile').prefetch_related(
-                'products').filter(id=pk, user_profile_id=request.user.pk).first()
+        order = get_orders_with_products().filter(id=pk, user_profile_id=request.user.pk).first()
     else:
-        order = Order.objects.select_related('user_profile').prefetch_related(
-                'products').filter(id=pk, user_profile_id=request.user.pk, status='unconfirmed').first()
+        order = Order.objects.select_related('user_profile').filter(
+                id=pk, user_profile_id=request.user.pk, status='unconfirmed').first()
         if order and not all([order.fullName, order.email, order.phone, order.deliveryType,
                               order.paymentType, order.city, order.address]):
             raise ValidationError('Заказ содержит не все данные.')
@@ -66,19 +89,33 @@ def get_detail_payment_data(payment_data: dict) -> tuple:
     return tuple(payment_data.get(info) for info in ['number', 'name', 'month', 'year', 'code'])
 
 
-def save_number_products_in_basket(order_pk: Order.pk, products: QuerySet, bk: Basket):
+def create_order(user_pk: ProfileUser.pk, product_ids: list, bk: Basket) -> Order:
     """
-    Сохраняет количество товара в корзине на момент оформления заказа в базу данных.
-    :param order_pk: Идентификатор заказа
-    :param products: QuerySet с товарами
+    Оформляет заказ в одной транзакции.
+    Стоимость считается по текущим ценам с учетом действующих акций (get_effective_prices),
+    а не по ценам, сохраненным в корзине.
+    Связи заказа с товарами и количество товаров сохраняются через bulk_create.
+    :param user_pk: Идентификатор профиля пользователя
+    :param product_ids: Идентификаторы товаров из запроса
     :param bk: Экземпляр класса Basket
-    """
-    for product in products:
-        QuantityProductsInBasket.objects.create(
-            order_id=order_pk,
-            product_id=product.pk,
-            quantity=bk.get_count_product_in_basket(product_pk=product.pk)
+    :return: Созданный заказ.
+    """
+    prices = get_effective_prices(product_ids)
+    quantities = {product_pk: bk.get_count_product_in_basket(product_pk=product_pk) for product_pk in prices}
+    with transaction.atomic():
+        order = Order.objects.create(
+            user_profile_id=user_pk,
+            totalCost=sum((prices[product_pk] * quantities[product_pk] for product_pk in prices), Decimal(0)),
+            status='unconfirmed'
+        )
+        Order.products.through.objects.bulk_create(
+            [Order.products.through(order_id=order.pk, product_id=product_pk) for product_pk in prices]
         )
+        QuantityProductsInBasket.objects.bulk_create(
+            [QuantityProductsInBasket(order_id=order.pk, product_id=product_pk, quantity=quantities[product_pk])
+             for product_pk in prices]
+        )
+    return order
 
 
 def setup_order(order: Order, params: tuple) -> None:
@@ -94,33 +131,49 @@ def setup_order(order: Order, params: tuple) -> None:
     order.fullName, order.email, order.phone, order.deliveryType, order.paymentType, order.city, order.address = params
 
 
-def setup_count_products_in_basket(order_pk: Order.pk, data: dict):
+def remove_goods_from_warehouse(order: Order):
     """
-    Модифицирует сериализованные данные.
-    Значение поля count с информацией о количестве товара на складе заменяет на количество товара в корзине.
-    :param order_pk: Идентификатор заказа
-    :param data: Сериализованные данные
+    Уменьшает количество товара на складе после оформления покупки.
+    Количество берется из сохраненных при оформлении заказа QuantityProductsInBasket.
+    Все товары списываются одним запросом UPDATE ... SET count = count - quantity WHERE count >= quantity,
+    поэтому параллельные оплаты не затирают друг друга. Вызывать нужно внутри транзакции.
+    :param order: Экземпляр модели Order
+    :return: Возвращает ошибку, если какого-то товара на складе не хватает.
     """
-    for index in range(len(data.get('products', list()))):
-        product_info: QuantityProductsInBasket = QuantityProductsInBasket.objects.filter(
-            order_id=order_pk,
-            product_id=data['products'][index]['id']
-        ).first()
+    quantities = dict(QuantityProductsInBasket.objects.filter(order_id=order.pk).values_list('product_id', 'quantity'))
+    if not quantities:
+        return
+
+    enough_goods = Q()
+    for product_id, quantity in quantities.items():
+        enough_goods |= Q(pk=product_id, count__gte=quantity)
+
+    updated = Product.objects.filter(enough_goods).update(count=Case(
+        *[When(pk=product_id, then=F('count') - quantity) for product_id, quantity in quantities.items()],
+        default=F('count'),
+    ))
+    if updated != len(quantities):
+        oversold = [title for product_id, title, count in Product.objects.filter(
+            pk__in=quantities).values_list('pk', 'title', 'count') if count < quantities[product_id]]
+        raise ValidationError('Товаров на складе меньше, чем в заказе: {titles}.'.format(titles=', '.join(oversold)))
 
-        data['products'][index]['count'] = product_info.quantity
+    products_stock_changed.send(sender=Product, product_ids=list(quantities))
 
 
-def remove_goods_from_warehouse(order: Order, bk: Basket):
+def pay_order(order: Order):
     """
-    Уменьшает количество товара на складе после оформления покупки.
+    Оплачивает заказ: меняет статус и списывает товары со склада в одной транзакции.
+    Статус меняется условным UPDATE, поэтому один и тот же заказ нельзя оплатить дважды.
+    Время оплаты (paidAt) используется при расчете популярности товаров.
     :param order: Экземпляр модели Order
-    :param bk: Экземпляр класса Basket
-    :return: Уменьшает количество товара на складе
-    """
-    for item in order.products.all():
-        product = Product.objects.get(id=item.pk)
-        product.count -= bk.get_count_product_in_basket(product_pk=product.pk)
-        product.save()
+    :return: Возвращает ошибку, если заказ уже оплачен или товаров на складе не хватает.
+    """
+    with transaction.atomic():
+        paid_at = timezone.now()
+        if not Order.objects.filter(pk=order.pk, status='unconfirmed').update(status='accepted', paidAt=paid_at):
+            raise ValidationError('Заказ уже оплачен.')
+        remove_goods_from_warehouse(order=order)
+    order.status, order.paidAt = 'accepted', paid_at
 
 
 def check_delivery_type_and_price_setting(order: Order):
@@ -4,41 +4,40 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from basket_app.basket import Basket
-from products_app.models import Product
-from profileuser_app.models import ProfileUser
+from catalog_app.pagination import CatalogPagination, KeysetPagination
 from .models import Order
-from .serializers import OrderSerializer
+from .serializers import OrderSerializer, OrderSummarySerializer
 from .utils import (get_order_user_or_400, get_detail_order_data, get_detail_payment_data,
-                    save_number_products_in_basket, setup_order, setup_count_products_in_basket,
-                    remove_goods_from_warehouse, check_delivery_type_and_price_setting, validation_all_data)
+                    create_order, setup_order, get_orders_with_products,
+                    pay_order, check_delivery_type_and_price_setting, validation_all_data)
 
 
 class OrderApiView(APIView):
     """
     Класс API - view. Предоставляет возможность получить историю заказов и создать новый.
+    История заказов отдается постранично: по номеру страницы (currentPage) или по курсору (cursor),
+    от новых заказов к старым. С параметром summary=true заказы отдаются без товаров.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request: Request):
-        return Response(OrderSerializer(Order.objects.filter(user_profile=request.user.pk), many=True).data)
+        if KeysetPagination.cursor_query_param in request.query_params:
+            paginator = KeysetPagination()
+        else:
+            paginator = CatalogPagination()
 
-    def post(self, request: Request):
-        bk = Basket(request)
+        orders = Order.objects.filter(user_profile=request.user.pk).order_by('-createdAt', '-pk')
+        if request.query_params.get('summary') in ('true', '1'):
+            page = paginator.paginate_queryset(orders.select_related('user_profile'), request, view=self)
+            return paginator.get_paginated_response(OrderSummarySerializer(page, many=True).data)
 
-        products = Product.objects.prefetch_related(
-            'review', 'product_img', 'tags').select_related('category').filter(
-            id__in=[product.get('id', 0) for product in request.data]
-        )
+        page = paginator.paginate_queryset(get_orders_with_products(orders), request, view=self)
+        return paginator.get_paginated_response(OrderSerializer(page, many=True).data)
 
-        order = Order.objects.create(
-            user_profile=ProfileUser.objects.get(id=request.user.pk),
-            totalCost=bk.get_total_price(),
-            status='unconfirmed'
-        )
-
-        order.products.set(products)
-        order.save()
-        save_number_products_in_basket(order_pk=order.pk, products=products, bk=bk)
+    def post(self, request: Request):
+        order = create_order(user_pk=request.user.pk,
+                             product_ids=[product.get('id', 0) for product in request.data],
+                             bk=Basket(request))
         return Response(dict(orderId=order.pk))
 
 
@@ -51,9 +50,7 @@ class OrderDetailApiView(APIView):
 
     def get(self, request: Request, pk: Order.pk):
         order = get_order_user_or_400(request=request, pk=pk)
-        serialized_data = OrderSerializer(order, many=False).data
-        setup_count_products_in_basket(order_pk=order.pk, data=serialized_data)
-        return Response(serialized_data)
+        return Response(OrderSerializer(order, many=False).data)
 
     def post(self, request: Request, pk: Order.pk):
         order = get_order_user_or_400(request=request, pk=pk)
@@ -74,9 +71,7 @@ class PaymentApiView(APIView):
         bk = Basket(request)
         number_card, name, month, year, code = get_detail_payment_data(request.data)
         validation_all_data(name=name, number='54789342', month=month, year=year, code=code)
-        order.status = 'accepted'
-        remove_goods_from_warehouse(order=order, bk=bk)
-        order.save()
+        pay_order(order=order)
         bk.clear()
         return Response(status=status.HTTP_200_OK)
 
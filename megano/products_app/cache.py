@@ -0,0 +1,116 @@
+import hashlib
+import time
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+CACHE_VERSION_KEY = 'cache-version:{model}'
+RESPONSE_CACHE_KEY = 'response:{digest}'
+
+
+def get_model_name(model: type[Model] | Model) -> str:
+    """
+    Возвращает имя модели, под которым хранится ее версия в кэше.
+    :param model: класс модели или ее экземпляр
+    :return: имя модели, например product.
+    """
+    return model._meta.model_name
+
+
+def get_versions(keys: Iterable[str]) -> dict[str, int]:
+    """
+    Возвращает версии по ключам одним обращением к кэшу.
+    Если версии нет (кэш очищен или запись вытеснена), она создается из текущего времени,
+    чтобы не совпасть ни с одной из версий, использованных ранее.
+    :param keys: ключи версий
+    :return: словарь, где ключ - ключ версии, значение - версия.
+    """
+    keys = set(keys)
+    versions = cache.get_many(keys)
+    for key in keys - versions.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+        versions[key] = cache.get(key)
+    return versions
+
+
+def get_cache_versions(models: Iterable[str]) -> dict[str, int]:
+    """
+    Возвращает текущие версии моделей одним обращением к кэшу.
+    :param models: имена моделей
+    :return: словарь, где ключ - имя модели, значение - ее версия.
+    """
+    keys = {CACHE_VERSION_KEY.format(model=model): model for model in models}
+    return {keys[key]: version for key, version in get_versions(keys).items()}
+
+
+def increment_cache_version(key: str):
+    """
+    Увеличивает версию в кэше. Если версии нет, создает ее из текущего времени.
+    :param key: ключ версии
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_version(key: str):
+    """
+    Увеличивает версию после фиксации транзакции: иначе параллельный запрос успел бы прочитать еще старые данные
+    и закэшировать их под новой версией. Вне транзакции версия меняется сразу.
+    :param key: ключ версии
+    """
+    transaction.on_commit(lambda: increment_cache_version(key))
+
+
+def bump_cache_version(model: type[Model] | Model | str):
+    """
+    Увеличивает версию модели после фиксации транзакции. Все закэшированные ответы, зависящие от нее,
+    перестают использоваться.
+    :param model: класс модели, ее экземпляр или имя
+    """
+    bump_version(CACHE_VERSION_KEY.format(model=model if isinstance(model, str) else get_model_name(model)))
+
+
+def get_response_cache_key(request: Request, models: Iterable[str]) -> str:
+    """
+    Формирует ключ кэша ответа из адреса, параметров запроса и версий моделей, от которых зависит ответ.
+    :param request: запрос
+    :param models: имена моделей
+    :return: ключ кэша.
+    """
+    versions = get_cache_versions(models)
+    raw_key = '{path}?{query}|{versions}'.format(
+        path=request.path,
+        query='&'.join(sorted(request.query_params.urlencode().split('&'))),
+        versions=','.join('{model}={version}'.format(model=model, version=versions[model])
+                          for model in sorted(versions)),
+    )
+    return RESPONSE_CACHE_KEY.format(digest=hashlib.md5(raw_key.encode()).hexdigest())
+
+
+class CachedResponseMixin:
+    """
+    Миксин для API-view, который кэширует данные ответа на get-запрос.
+    В cache_models перечисляются модели, от которых зависит ответ. Запись в любую из них меняет ее версию,
+    поэтому устаревшие ответы просто перестают находиться в кэше без ожидания TTL.
+    Срок жизни записей (RESPONSE_CACHE_TIMEOUT) ограничен на случай, если версия изменилась мимо кэша.
+    """
+    cache_models: tuple[str, ...] = ()
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        """Метод - get. Возвращает ответ из кэша или формирует его и кладет в кэш."""
+        key = get_response_cache_key(request, self.cache_models)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+LOCAL_MEMORY_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register()
+def check_cache_backend(app_configs, **kwargs) -> list:
+    """
+    Проверяет, что кэш общий для процессов. Версии моделей в LocMemCache видит только процесс, который их изменил,
+    поэтому другие воркеры и изменения из команд (refresh_effective_prices и т.д.) не сбрасывают закэшированные ответы.
+    :return: ошибка без DEBUG или предупреждение в режиме отладки.
+    """
+    if settings.CACHES['default']['BACKEND'] != LOCAL_MEMORY_CACHE:
+        return []
+    message_class = Warning if settings.DEBUG else Error
+    return [message_class(
+        'LocMemCache не подходит для кэша ответов: версии моделей не видны другим процессам и командам.',
+        hint='Используйте общий кэш: FileBasedCache или RedisCache.',
+        id='products_app.E001' if message_class is Error else 'products_app.W001',
+    )]
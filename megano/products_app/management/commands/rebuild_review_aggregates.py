@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from products_app.utils import rebuild_review_aggregates
+
+
+class Command(BaseCommand):
+    """
+    Команда пересчитывает агрегаты отзывов товаров по таблице отзывов.
+    Нужна после загрузки фикстур: при загрузке сигналы счетчиков не срабатывают.
+    """
+    help = 'Пересчитывает количество отзывов, сумму оценок и среднюю оценку товаров'
+
+    def handle(self, *args, **options):
+        updated = rebuild_review_aggregates()
+        self.stdout.write(self.style.SUCCESS('Обновлено товаров: {count}'.format(count=updated)))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from products_app.models import Product
+from products_app.pricing import refresh_effective_prices
+from products_app.signals import product_prices_changed
+
+
+class Command(BaseCommand):
+    """
+    Команда пересчитывает цены товаров с учетом акций (Product.effective_price).
+    Ее нужно запускать по расписанию сразу после полуночи, когда акции начинаются и заканчиваются.
+    """
+    help = 'Пересчитывает цены товаров с учетом действующих акций'
+
+    def handle(self, *args, **options):
+        changed = refresh_effective_prices()
+        if changed:
+            product_prices_changed.send(sender=Product, product_ids=changed)
+        self.stdout.write(self.style.SUCCESS('Обновлено товаров: {count}'.format(count=len(changed))))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from products_app.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    """
+    Команда пересчитывает рейтинг популярности товаров по оплаченным заказам и отзывам.
+    Ее нужно запускать по расписанию (например, раз в час): каждый запуск учитывает только новые заказы и отзывы
+    и уменьшает вклад старых. С флагом --full рейтинг пересчитывается с нуля по всей истории.
+    """
+    help = 'Пересчитывает рейтинг популярности товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать рейтинг с нуля')
+
+    def handle(self, *args, **options):
+        updated = refresh_popularity(full=options['full'])
+        self.stdout.write(self.style.SUCCESS('Обновлено товаров: {count}'.format(count=updated)))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_reviews_count(apps, schema_editor):
+    Product = apps.get_model('products_app', 'Product')
+    Review = apps.get_model('products_app', 'Review')
+    reviews_count = Review.objects.filter(product_id=OuterRef('pk')).order_by().values(
+        'product_id').annotate(quantity=Count('pk')).values('quantity')
+    Product.objects.update(reviews_count=Coalesce(Subquery(reviews_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reviews_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.RunPython(fill_reviews_count, migrations.RunPython.noop),
+    ]
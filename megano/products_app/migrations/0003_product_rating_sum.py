@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:13
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_rating_sum(apps, schema_editor):
+    Product = apps.get_model('products_app', 'Product')
+    Review = apps.get_model('products_app', 'Review')
+    rating_sum = Review.objects.filter(product_id=OuterRef('pk')).order_by().values(
+        'product_id').annotate(total=Sum('rate')).values('total')
+    Product.objects.update(rating_sum=Coalesce(Subquery(rating_sum), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0002_product_reviews_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_rating_sum, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:28
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def fill_effective_price(apps, schema_editor):
+    Product = apps.get_model('products_app', 'Product')
+    SaleProduct = apps.get_model('products_app', 'SaleProduct')
+    today = timezone.localdate()
+    sale_price = SaleProduct.objects.filter(product_id=OuterRef('pk'), dateFrom__lte=today, dateTo__gte=today)
+    Product.objects.update(effective_price=Coalesce(Subquery(sale_price.values('salePrice')[:1]), F('price')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0003_product_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Цена с учетом акции'),
+        ),
+        migrations.RunPython(fill_effective_price, migrations.RunPython.noop),
+    ]
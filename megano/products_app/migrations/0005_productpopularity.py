@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0004_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPopularity',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='products_app.product', verbose_name='Товар')),
+                ('score', models.FloatField(default=0, verbose_name='Популярность')),
+                ('sales', models.IntegerField(default=0, verbose_name='Продано штук')),
+                ('updatedAt', models.DateTimeField(verbose_name='Дата пересчета')),
+            ],
+            options={
+                'verbose_name': 'Популярность товара',
+                'verbose_name_plural': 'Популярность товаров',
+                'ordering': ('-score', 'product'),
+                'indexes': [models.Index(fields=['-score', 'product'], name='product_popularity_score_idx')],
+            },
+        ),
+    ]
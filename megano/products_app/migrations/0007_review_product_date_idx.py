@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0006_productimage_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'date'], name='review_product_date_idx'),
+        ),
+    ]
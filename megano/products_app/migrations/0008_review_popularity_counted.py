@@ -0,0 +1,28 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:57
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def mark_counted_reviews(apps, schema_editor):
+    Review = apps.get_model('products_app', 'Review')
+    ProductPopularity = apps.get_model('products_app', 'ProductPopularity')
+    refreshed_at = ProductPopularity.objects.aggregate(refreshed_at=Max('updatedAt'))['refreshed_at']
+    if refreshed_at is not None:
+        Review.objects.filter(date__lte=refreshed_at).update(popularity_counted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0007_review_product_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='popularity_counted',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Учтен в популярности товара'),
+        ),
+        migrations.RunPython(mark_counted_reviews, migrations.RunPython.noop),
+    ]
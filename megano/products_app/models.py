@@ -1,4 +1,5 @@
 from django.db import models
+from media_app.derivatives import get_srcset
 from catalog_app.models import Category
 
 
@@ -27,6 +28,10 @@ class Product(models.Model):
     fullDescription = models.TextField(blank=True, null=False, verbose_name='Полное описание')
     freeDelivery = models.BooleanField(default=False, verbose_name='Бесплатная доставка')
     rating = models.IntegerField(blank=False, null=False, verbose_name='Количество звёзд')
+    reviews_count = models.IntegerField(default=0, editable=False, verbose_name='Количество отзывов')
+    rating_sum = models.IntegerField(default=0, editable=False, verbose_name='Сумма оценок')
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False,
+                                          verbose_name='Цена с учетом акции')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True,
                                  related_name='products', verbose_name='Категория')
 
@@ -120,11 +125,17 @@ class Review(models.Model):
     date = models.DateTimeField(auto_now_add=True, verbose_name='Дата написания')
     product = models.ForeignKey(Product, on_delete=models.CASCADE,
                                 related_name='review', verbose_name='Товар')
+    popularity_counted = models.BooleanField(default=False, db_index=True, editable=False,
+                                             verbose_name='Учтен в популярности товара')
 
     class Meta:
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
         ordering = ('pk',)
+        indexes = [
+            # отзывы товара от новых к старым (страницы отзывов и последние отзывы на странице товара)
+            models.Index(fields=('product', 'date'), name='review_product_date_idx'),
+        ]
 
     def __str__(self):
         return self.author
@@ -135,6 +146,8 @@ class ProductImage(models.Model):
     Модель изображения товара.
     """
     image = models.ImageField(upload_to=product_path, default='', null=False, verbose_name='Изображение')
+    content_hash = models.CharField(max_length=32, blank=True, default='', editable=False,
+                                    verbose_name='Хеш содержимого изображения')
     product: Product = models.ForeignKey(Product, on_delete=models.CASCADE,
                                          related_name='product_img', verbose_name='Товар')
 
@@ -159,6 +172,20 @@ class ProductImage(models.Model):
         """
         return self.product.title
 
+    def srcset(self):
+        """
+        Метод для сериализатора.
+        :return: уменьшенные копии изображения в формате JPEG для атрибута srcset.
+        """
+        return get_srcset(self.content_hash, 'jpg')
+
+    def srcset_webp(self):
+        """
+        Метод для сериализатора.
+        :return: уменьшенные копии изображения в формате WebP для атрибута srcset.
+        """
+        return get_srcset(self.content_hash, 'webp')
+
     def __str__(self):
         return '#{pk} {product}'.format(
             pk=self.product.pk,
@@ -170,3 +197,26 @@ class ProductImage(models.Model):
 
 
 
+
+
+class ProductPopularity(models.Model):
+    """
+    Модель рейтинга популярности товара. Заполняется командой refresh_popularity по оплаченным заказам и отзывам.
+    score - сумма продаж и отзывов, каждая из которых затухает со временем (см. products_app.popularity).
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='popularity', verbose_name='Товар')
+    score = models.FloatField(default=0, verbose_name='Популярность')
+    sales = models.IntegerField(default=0, verbose_name='Продано штук')
+    updatedAt = models.DateTimeField(verbose_name='Дата пересчета')
+
+    class Meta:
+        verbose_name = 'Популярность товара'
+        verbose_name_plural = 'Популярность товаров'
+        ordering = ('-score', 'product')
+        indexes = [
+            models.Index(fields=('-score', 'product'), name='product_popularity_score_idx'),
+        ]
+
+    def __str__(self):
+        return '{product}: {score:.2f}'.format(product=self.product_id, score=self.score)
@@ -0,0 +1,128 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Max, When
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from orders_app.models import Order, QuantityProductsInBasket
+from .cache import bump_cache_version
+from .models import Product, ProductPopularity, Review
+
+POPULARITY_HALF_LIFE = timedelta(days=14)  # за это время вклад продажи или отзыва в популярность уменьшается вдвое
+REVIEW_WEIGHT = 0.5  # отзыв весит как половина проданной штуки товара
+MIN_SCORE = 0.01  # товары с меньшей популярностью удаляются из рейтинга
+POPULAR_PRODUCTS_LIMIT = 8
+
+
+def get_decay(age: timedelta) -> float:
+    """
+    Возвращает множитель затухания для события указанной давности: 1 для нового события, 0.5 через POPULARITY_HALF_LIFE.
+    :param age: давность события
+    :return: множитель от 0 до 1.
+    """
+    return math.pow(0.5, max(age / POPULARITY_HALF_LIFE, 0))
+
+
+def collect_popularity(now: datetime, full: bool = False) -> tuple[dict[int, float], dict[int, int], set[int], set[int]]:
+    """
+    Собирает вклад еще не учтенных продаж и отзывов в популярность товаров на момент now.
+    Продажи берутся из QuantityProductsInBasket оплаченных заказов, время продажи - Order.paidAt.
+    Учтенные события отмечаются флагом, а не отбираются по времени: paidAt и дата отзыва выставляются до фиксации
+    транзакции, поэтому заказ, зафиксированный после прошлого пересчета, мог получить время раньше него.
+    :param now: время текущего пересчета
+    :param full: собрать все события, в том числе уже учтенные
+    :return: кортеж: вклад в популярность по товарам, количество проданных штук по товарам,
+    идентификаторы учтенных заказов и отзывов.
+    """
+    sales = QuantityProductsInBasket.objects.filter(order__status='accepted', order__paidAt__lte=now)
+    reviews = Review.objects.filter(date__lte=now)
+    if not full:
+        sales = sales.filter(order__popularityCounted=False)
+        reviews = reviews.filter(popularity_counted=False)
+
+    scores, units = defaultdict(float), defaultdict(int)
+    order_ids, review_ids = set(), set()
+    for product_id, quantity, order_id, paid_at in sales.values_list(
+            'product_id', 'quantity', 'order_id', 'order__paidAt').iterator():
+        scores[product_id] += quantity * get_decay(now - paid_at)
+        units[product_id] += quantity
+        order_ids.add(order_id)
+    for review_id, product_id, date in reviews.values_list('pk', 'product_id', 'date').iterator():
+        scores[product_id] += REVIEW_WEIGHT * get_decay(now - date)
+        review_ids.add(review_id)
+    return scores, units, order_ids, review_ids
+
+
+def mark_counted(queryset: QuerySet, ids: set[int], batch_size: int, **flag):
+    """
+    Отмечает учтенные события пачками по batch_size идентификаторов.
+    :param queryset: QuerySet заказов или отзывов
+    :param ids: идентификаторы учтенных событий
+    :param batch_size: количество записей, обновляемых за один запрос
+    :param flag: поле флага и его значение
+    """
+    ids = sorted(ids)
+    for start in range(0, len(ids), batch_size):
+        queryset.filter(pk__in=ids[start:start + batch_size]).update(**flag)
+
+
+def refresh_popularity(full: bool = False, now: datetime | None = None, batch_size: int = 500) -> int:
+    """
+    Пересчитывает рейтинг популярности товаров (ProductPopularity) инкрементально.
+    Все накопленные оценки умножаются на множитель затухания за время с прошлого пересчета (один UPDATE),
+    затем к ним прибавляется вклад еще не учтенных продаж и отзывов, и они отмечаются как учтенные.
+    Поэтому каждый запуск читает только новые заказы и отзывы. Товары с почти нулевой популярностью удаляются.
+    :param full: пересчитать рейтинг с нуля по всей истории заказов и отзывов
+    :param now: время пересчета. По умолчанию - текущее
+    :param batch_size: количество товаров, обновляемых за один запрос
+    :return: количество товаров, у которых изменилась популярность из-за новых продаж или отзывов.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        if full:
+            ProductPopularity.objects.all().delete()
+            since = None
+        else:
+            since = ProductPopularity.objects.aggregate(since=Max('updatedAt'))['since']
+        if since is not None:
+            ProductPopularity.objects.update(score=F('score') * get_decay(now - since), updatedAt=now)
+
+        scores, units, order_ids, review_ids = collect_popularity(now=now, full=full)
+        existing = set(ProductPopularity.objects.filter(pk__in=scores).values_list('pk', flat=True))
+        changed = sorted(existing)
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            ProductPopularity.objects.filter(pk__in=batch).update(
+                score=F('score') + Case(*[When(pk=pk, then=scores[pk]) for pk in batch], default=0.0),
+                sales=F('sales') + Case(*[When(pk=pk, then=units.get(pk, 0)) for pk in batch], default=0),
+            )
+        new_ids = set(Product.objects.filter(pk__in=scores.keys() - existing).values_list('pk', flat=True))
+        ProductPopularity.objects.bulk_create([
+            ProductPopularity(product_id=pk, score=scores[pk], sales=units.get(pk, 0), updatedAt=now)
+            for pk in sorted(new_ids)
+        ], batch_size=batch_size)
+        ProductPopularity.objects.filter(score__lt=MIN_SCORE).delete()
+        mark_counted(Order.objects.filter(popularityCounted=False), order_ids, batch_size, popularityCounted=True)
+        mark_counted(Review.objects.filter(popularity_counted=False), review_ids, batch_size, popularity_counted=True)
+
+    bump_cache_version(ProductPopularity)
+    return len(existing) + len(new_ids)
+
+
+def get_popular_product_ids(limit: int = POPULAR_PRODUCTS_LIMIT) -> list[int]:
+    """
+    Возвращает самые популярные товары в наличии. Берутся первые записи рейтинга по индексу score.
+    Если в рейтинге мало товаров (например, еще не было продаж), список дополняется товарами
+    с наибольшим количеством отзывов.
+    :param limit: количество товаров
+    :return: идентификаторы товаров от более популярных к менее популярным.
+    """
+    product_ids = list(ProductPopularity.objects.filter(product__count__gt=0).order_by(
+        '-score', 'product_id').values_list('product_id', flat=True)[:limit])
+    if len(product_ids) < limit:
+        product_ids.extend(Product.objects.exclude(count=0).exclude(pk__in=product_ids).order_by(
+            '-reviews_count', 'pk').values_list('pk', flat=True)[:limit - len(product_ids)])
+    return product_ids
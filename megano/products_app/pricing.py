@@ -0,0 +1,122 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import bump_version, get_versions
+from .models import Product, SaleProduct
+
+PRICE_CACHE_KEY = 'price:{pk}:{day}:{version}'
+# версия цены товара: меняется только при изменении самого товара или его акций
+PRICE_VERSION_KEY = 'price-version:{pk}'
+
+
+def get_active_sale_filter(day: date | None = None, prefix: str = 'sale__') -> Q:
+    """
+    Возвращает условие "акция действует в указанный день": dateFrom <= day <= dateTo.
+    :param day: день. По умолчанию - сегодня
+    :param prefix: путь до акции от модели, по которой строится запрос
+    :return: объект Q.
+    """
+    day = day or timezone.localdate()
+    return Q(**{'{prefix}dateFrom__lte'.format(prefix=prefix): day, '{prefix}dateTo__gte'.format(prefix=prefix): day})
+
+
+def get_effective_price_expression(day: date | None = None) -> Coalesce:
+    """
+    Возвращает выражение "цена товара с учетом акции, действующей в указанный день" для запросов по Product.
+    :param day: день. По умолчанию - сегодня
+    :return: выражение для annotate или update.
+    """
+    sale_price = SaleProduct.objects.filter(get_active_sale_filter(day, prefix=''), product_id=OuterRef('pk'))
+    return Coalesce(Subquery(sale_price.values('salePrice')[:1]), F('price'))
+
+
+def get_current_effective_price(product: Product) -> Decimal:
+    """
+    Возвращает цену товара с учетом акции, действующей сегодня.
+    :param product: экземпляр модели Product
+    :return: цена по акции, если она действует, иначе обычная цена.
+    """
+    if product.pk is None:
+        return product.price
+    sale_price = SaleProduct.objects.filter(get_active_sale_filter(prefix=''), product_id=product.pk).values_list(
+        'salePrice', flat=True).first()
+    return product.price if sale_price is None else sale_price
+
+
+def refresh_effective_prices(product_ids: Iterable[int] | None = None) -> list[int]:
+    """
+    Пересчитывает сохраненную цену с учетом акции (Product.effective_price).
+    Запускается командой refresh_effective_prices после полуночи, когда акции начинаются и заканчиваются,
+    и сигналами после изменения акции. Обновляются только товары, у которых цена действительно изменилась.
+    :param product_ids: идентификаторы товаров. Если не переданы, пересчитываются все товары.
+    :return: идентификаторы товаров, у которых изменилась цена.
+    """
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+
+    day = timezone.localdate()
+    changed = list(products.annotate(new_price=get_effective_price_expression(day)).exclude(
+        effective_price=F('new_price')).values_list('pk', flat=True))
+    if changed:
+        Product.objects.filter(pk__in=changed).update(effective_price=get_effective_price_expression(day))
+    return changed
+
+
+def get_seconds_until_tomorrow() -> int:
+    """
+    Возвращает количество секунд до начала следующего дня: в полночь акции могут начаться или закончиться.
+    :return: количество секунд, но не меньше одной.
+    """
+    now = timezone.localtime()
+    tomorrow = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), time.min), now.tzinfo)
+    return max(int((tomorrow - now).total_seconds()), 1)
+
+
+def bump_price_versions(product_ids: Iterable[int]):
+    """
+    Меняет версии цен товаров после фиксации транзакции. Закэшированные цены остальных товаров остаются.
+    :param product_ids: идентификаторы товаров
+    """
+    for pk in set(product_ids):
+        bump_version(PRICE_VERSION_KEY.format(pk=pk))
+
+
+def get_effective_prices(product_ids: Iterable[int]) -> dict[int, Decimal]:
+    """
+    Возвращает текущие цены товаров с учетом акций, которые действуют сегодня.
+    Цены кэшируются по одной на товар под ключом с текущим днем и версией цены этого товара, поэтому
+    изменение цены или акции товара и смена дня сразу дают новый ключ только этому товару. Цены товаров, которых нет в кэше,
+    считаются одним запросом. В отличие от Product.effective_price, цена не зависит от того,
+    успела ли отработать команда refresh_effective_prices, поэтому по ней считается стоимость заказа.
+    :param product_ids: идентификаторы товаров
+    :return: словарь, где ключ - идентификатор товара, значение - цена. Несуществующих товаров в нем нет.
+    """
+    product_ids = {int(pk) for pk in product_ids}
+    if not product_ids:
+        return dict()
+
+    day = timezone.localdate()
+    version_keys = {pk: PRICE_VERSION_KEY.format(pk=pk) for pk in product_ids}
+    versions = get_versions(version_keys.values())
+    keys = {PRICE_CACHE_KEY.format(pk=pk, day=day.isoformat(), version=versions[version_keys[pk]]): pk
+            for pk in product_ids}
+    prices = {keys[key]: price for key, price in cache.get_many(keys).items()}
+
+    missing = product_ids - prices.keys()
+    if missing:
+        # удаленные товары тоже кэшируются (значением False), чтобы не искать их в базе при каждом запросе
+        fresh = dict.fromkeys(missing, False)
+        fresh.update(Product.objects.filter(pk__in=missing).annotate(
+            current_price=get_effective_price_expression(day)
+        ).values_list('pk', 'current_price'))
+        cache.set_many({key: fresh[pk] for key, pk in keys.items() if pk in fresh},
+                       timeout=get_seconds_until_tomorrow())
+        prices.update(fresh)
+    return {pk: price for pk, price in prices.items() if price is not False}
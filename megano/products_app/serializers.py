@@ -1,7 +1,7 @@
-from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
+from media_app.utils import get_image_data
 from .models import Tag, Review, Product, SaleProduct
-from datetime import datetime
+from .utils import get_review_stats
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -21,6 +21,17 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = '__all__'
 
+
+class ProductReviewSerializer(serializers.ModelSerializer):
+    """
+    Класс сериализатор. Основан на модели отзывов. Предоставляет отзыв для страницы товара.
+    """
+    date = serializers.DateTimeField(format='%d-%m-%Y %H:%M', read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ('author', 'email', 'text', 'rate', 'date')
+
 class ProductInfoMixin(serializers.Serializer):
     """
     Миксин с информацией о товаре
@@ -35,18 +46,15 @@ class ProductInfoMixin(serializers.Serializer):
         :param instance: экземпляр модели Product
         :return: список из словарей, в которых содержится информация об изображениях товара.
         """
-        return [{'src': image.src(), 'alt': image.alt()} for image in instance.product_img.all()]
+        return [get_image_data(image) for image in instance.product_img.all()]
 
     def get_price(self, instance: Product):
         """
         Метод сериализатора. Возвращает цену товара.
         :param instance: экземпляр модели Product
-        :return: цена товара. Если есть акция на товар, возвращается цена по скидке.
+        :return: цена товара. Если на товар действует акция, возвращается цена по скидке.
         """
-        try:
-            return instance.sale.salePrice
-        except ObjectDoesNotExist:
-            return instance.price
+        return instance.effective_price
 
 
 
@@ -54,25 +62,24 @@ class ProductDetailSerializer(ProductInfoMixin, serializers.ModelSerializer):
     """
     Класс сериализатор. Основан на модели товара. Предоставляет полную информацию о товаре.
     """
-    reviews = serializers.SerializerMethodField()
+    reviews = ProductReviewSerializer(source='latest_reviews', many=True, read_only=True)
+    reviewsNextCursor = serializers.CharField(source='reviews_next_cursor', read_only=True, allow_null=True)
+    reviewsStats = serializers.SerializerMethodField()
     specifications = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = ('id', 'category', 'price', 'count', 'date', 'title',
                   'description', 'fullDescription', 'freeDelivery', 'images', 'tags', 'reviews',
-                  'specifications', 'rating')
+                  'reviewsNextCursor', 'reviewsStats', 'specifications', 'rating')
 
-    def get_reviews(self, instance: Product) -> list[dict]:
+    def get_reviewsStats(self, instance: Product) -> dict:
         """
-        Метод сериализатора. Возвращает отзывы о товаре.
+        Метод сериализатора. Возвращает статистику отзывов о товаре.
         :param instance: экземпляр модели Product
-        :return: список из словарей, в которых содержится информация об отзыве
+        :return: словарь с количеством отзывов и средней оценкой.
         """
-        return [{'author': review.author, 'email': review.email,
-                 'text': review.text, 'rate': review.rate,
-                 'date': datetime.strftime(review.date, '%d-%m-%Y %H:%M')}
-                for review in instance.review.all()]
+        return get_review_stats(instance)
 
     def get_specifications(self, instance: Product) -> list[dict]:
         """
@@ -104,18 +111,7 @@ class FewerInfoProductSerializer(ProductInfoMixin, serializers.ModelSerializer):
         :param instance: экземпляр модели Product
         :return: Количество отзывов.
         """
-        return len(instance.review.all())
-
-    def get_price(self, instance: Product):
-        """
-         Метод сериализатора. Возвращает цену товара.
-         :param instance: экземпляр модели Product
-         :return: цена товара. Если есть акция на товар, возвращается цена по скидке.
-         """
-        try:
-            return instance.sale.salePrice
-        except ObjectDoesNotExist:
-            return instance.price
+        return instance.reviews_count
 
 
 class SaleProductSerializer(serializers.ModelSerializer):
@@ -149,7 +145,7 @@ class SaleProductSerializer(serializers.ModelSerializer):
         :param instance: экземпляр модели Product
         :return: список из словарей, в которых содержится информация об изображениях товара.
         """
-        return [{'src': image.src(), 'alt': image.alt()} for image in instance.product.product_img.all()]
+        return [get_image_data(image) for image in instance.product.product_img.all()]
 
 
 
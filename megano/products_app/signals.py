@@ -0,0 +1,105 @@
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver, Signal
+
+from .cache import bump_cache_version
+from .models import Product, ProductImage, Review, SaleProduct, Tag
+from .pricing import bump_price_versions, get_current_effective_price, refresh_effective_prices
+from .utils import change_review_aggregates
+
+# Отправляется после изменения агрегатов отзывов товара. Аргументы: product_id.
+review_aggregates_changed = Signal()
+
+# Отправляется после изменения остатков товаров запросом UPDATE, минуя save(). Аргументы: product_ids.
+products_stock_changed = Signal()
+
+# Отправляется после изменения Product.effective_price запросом UPDATE, минуя save(). Аргументы: product_ids.
+product_prices_changed = Signal()
+
+
+@receiver(post_save, sender=Review)
+def add_review_to_aggregates(sender, instance: Review, created: bool, raw: bool = False, **kwargs):
+    """Учитывает новый отзыв в агрегатах отзывов товара."""
+    if created and not raw:
+        change_review_aggregates(product_pk=instance.product_id, rate=int(instance.rate), delta=1)
+        review_aggregates_changed.send(sender=Review, product_id=instance.product_id)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_aggregates(sender, instance: Review, **kwargs):
+    """Убирает удаленный отзыв из агрегатов отзывов товара."""
+    change_review_aggregates(product_pk=instance.product_id, rate=int(instance.rate), delta=-1)
+    review_aggregates_changed.send(sender=Review, product_id=instance.product_id)
+
+
+@receiver(pre_save, sender=Product)
+def set_effective_price(sender, instance: Product, **kwargs):
+    """
+    Пересчитывает цену с учетом акции перед сохранением товара, в том числе при загрузке фикстур (raw):
+    в фикстурах этого поля нет. Если акции товара загружаются после него, цену пересчитает refresh_sale_product_price.
+    """
+    instance.effective_price = get_current_effective_price(instance)
+
+
+@receiver(pre_save, sender=SaleProduct)
+def remember_sale_product(sender, instance: SaleProduct, raw: bool = False, **kwargs):
+    """Запоминает товар, к которому акция относилась до изменения: его цена тоже могла измениться."""
+    instance._previous_product_id = None
+    if instance.pk is not None and not raw:
+        instance._previous_product_id = SaleProduct.objects.filter(pk=instance.pk).values_list(
+            'product_id', flat=True).first()
+
+
+@receiver(post_save, sender=SaleProduct)
+@receiver(post_delete, sender=SaleProduct)
+def refresh_sale_product_price(sender, instance: SaleProduct, **kwargs):
+    """
+    Пересчитывает цену с учетом акции у товара после изменения или удаления акции, в том числе при загрузке фикстур.
+    Если товар еще не загружен, цену посчитает set_effective_price при его сохранении.
+    """
+    product_ids = {instance.product_id, getattr(instance, '_previous_product_id', None)} - {None}
+    bump_price_versions(product_ids)
+    changed = refresh_effective_prices(product_ids=product_ids)
+    if changed:
+        product_prices_changed.send(sender=Product, product_ids=changed)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_cached_price(sender, instance: Product, **kwargs):
+    """Меняет версию цены товара после его изменения или удаления."""
+    bump_price_versions([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=SaleProduct)
+@receiver(post_delete, sender=SaleProduct)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_cached_responses(sender, **kwargs):
+    """Меняет версию модели в кэше, чтобы закэшированные ответы, зависящие от нее, устарели."""
+    bump_cache_version(sender)
+
+
+@receiver(m2m_changed, sender=Tag.product.through)
+def invalidate_cached_tags(sender, action: str, **kwargs):
+    """Меняет версию тегов в кэше после изменения связи тегов с товарами."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_cache_version(Tag)
+
+
+@receiver(products_stock_changed)
+@receiver(product_prices_changed)
+def invalidate_cached_products(sender, **kwargs):
+    """Меняет версию товаров в кэше после изменения остатков или цен запросом UPDATE."""
+    bump_cache_version(Product)
+
+
+@receiver(product_prices_changed)
+def invalidate_changed_prices(sender, product_ids: list, **kwargs):
+    """Меняет версии цен товаров, у которых изменилась цена с учетом акции."""
+    bump_price_versions(product_ids)
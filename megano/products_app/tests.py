@@ -1,3 +1,441 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog_app.models import Category
+from orders_app.models import Order, QuantityProductsInBasket
+from profileuser_app.models import ProfileUser
+from .models import Product, ProductImage, ProductPopularity, Review, SaleProduct, Tag
+from .checks import check_cache_backend
+from .popularity import POPULARITY_HALF_LIFE, refresh_popularity
+from .pricing import get_effective_prices, refresh_effective_prices
+from .signals import products_stock_changed
+from .utils import LATEST_REVIEWS_LIMIT
+
+
+class ListEndpointsQueriesTestCase(TestCase):
+    """
+    Проверяет, что списочные эндпоинты не загружают отзывы и выполняют
+    одинаковое количество запросов независимо от количества товаров.
+    """
+    # сессия и пользователь + товары, изображения и теги (+ COUNT и 4 запроса счетчиков фильтров у каталога,
+    # + COUNT, заказы и количество товаров у истории заказов, + рейтинг и добор товаров по отзывам у популярных,
+    # пока рейтинг пуст). Товары корзины берутся из кэша, который заполнили запросы на добавление в корзину.
+    expected_queries = {
+        'catalog_app:banners': 5,
+        'products_app:products_popular': 7,
+        'products_app:products_limited': 5,
+        'catalog_app:catalog': 10,
+        'basket_app:basket': 2,
+        'orders_app:orders': 8,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(title='Electronics', main=True)
+        cls.tags = [Tag.objects.create(name='tag {index}'.format(index=index)) for index in range(2)]
+        cls.user = User.objects.create_user(username='buyer', password='Password123')
+        cls.profile = ProfileUser.objects.create(pk=cls.user.pk, user=cls.user, fullName='Иванов Иван Иванович')
+
+    def setUp(self):
+        cache.clear()
+        # уменьшенные копии изображений создаются после фиксации транзакции, не в папке с медиафайлами проекта
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, IMAGE_DERIVATIVE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_products(self, quantity: int) -> list[Product]:
+        """
+        Создает товары с изображением, тегами и отзывами.
+        :param quantity: количество товаров
+        :return: список созданных товаров.
+        """
+        products = []
+        for index in range(quantity):
+            product = Product.objects.create(title='Product {index}'.format(index=index), price=100 + index,
+                                             count=index % 2, rating=4, category=self.category)
+            ProductImage.objects.create(product=product, image='products/images/id_1/plane.jpg')
+            product.tags.set(self.tags)
+            for review_index in range(3):
+                Review.objects.create(author='author', email='{index}@mail.ru'.format(index=review_index),
+                                      text='text' * 100, rate=5, product=product)
+            products.append(product)
+        return products
+
+    def get_endpoints(self, products: list[Product]) -> list[tuple[str, dict]]:
+        """
+        Возвращает адреса списочных эндпоинтов и параметры запроса к ним.
+        :param products: товары, которые кладутся в корзину и заказ
+        :return: список из пар (адрес, параметры).
+        """
+        order = Order.objects.create(user_profile=self.profile, totalCost=100, status='unconfirmed')
+        order.products.set(products)
+
+        self.client.force_login(self.user)
+        for product in products:
+            self.client.post(reverse('basket_app:basket'), {'id': product.pk, 'count': 1})
+        return [
+            (reverse('catalog_app:banners'), {}),
+            (reverse('products_app:products_popular'), {}),
+            (reverse('products_app:products_limited'), {}),
+            (reverse('catalog_app:catalog'), {'filter[minPrice]': 0, 'filter[maxPrice]': 50000,
+                                              'sort': 'price', 'sortType': 'inc'}),
+            (reverse('basket_app:basket'), {}),
+            (reverse('orders_app:orders'), {}),
+        ]
+
+    def capture_queries(self, quantity: int) -> dict[str, list[str]]:
+        """
+        Выполняет запросы ко всем списочным эндпоинтам.
+        :param quantity: количество товаров в базе
+        :return: словарь, где ключ - адрес эндпоинта, значение - выполненные SQL-запросы.
+        """
+        queries = {}
+        with self.captureOnCommitCallbacks(execute=True):
+            products = self.create_products(quantity)
+        for url, params in self.get_endpoints(products):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, params, HTTP_REFERER='http://testserver/catalog/')
+            self.assertEqual(response.status_code, 200, url)
+            queries[url] = [query['sql'] for query in context.captured_queries]
+        return queries
+
+    def test_reviews_are_not_fetched(self):
+        for url, queries in self.capture_queries(quantity=3).items():
+            for sql in queries:
+                self.assertNotIn('"products_app_review"', sql, url)
+
+    @staticmethod
+    def get_selected_columns(sql: str, table: str) -> set[str]:
+        """
+        Возвращает колонки таблицы, которые запрос выбирает (до первого FROM).
+        :param sql: SQL-запрос
+        :param table: имя таблицы
+        :return: множество имен колонок.
+        """
+        return set(re.findall(r'"{table}"\."(\w+)"'.format(table=table), sql.split(' FROM ', 1)[0]))
+
+    def test_selected_columns(self):
+        product_columns = {field.column for field in Product._meta.concrete_fields} - {'fullDescription'}
+        limited_endpoints = {reverse(name) for name in ('products_app:products_popular',
+                                                        'products_app:products_limited', 'catalog_app:catalog')}
+        for url, queries in self.capture_queries(quantity=3).items():
+            product_queries = [sql for sql in queries if self.get_selected_columns(sql, 'products_app_product')
+                               - {'id'}]
+            if url == reverse('basket_app:basket'):
+                self.assertEqual(product_queries, [], url)
+                continue
+            self.assertTrue(product_queries, url)
+            for sql in product_queries:
+                self.assertEqual(self.get_selected_columns(sql, 'products_app_product'), product_columns, url)
+                if url in limited_endpoints:
+                    self.assertRegex(sql, r'LIMIT \d+$|"products_app_product"\."id" IN \(', url)
+            for sql in queries:
+                self.assertLessEqual(self.get_selected_columns(sql, 'products_app_productimage'),
+                                     {'id', 'image', 'content_hash', 'product_id'}, url)
+                self.assertLessEqual(self.get_selected_columns(sql, 'products_app_tag'), {'id', 'name'}, url)
+
+    def test_queries_do_not_depend_on_products_quantity(self):
+        few_products = self.capture_queries(quantity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.all().delete()
+        many_products = self.capture_queries(quantity=6)
+        for url, queries in few_products.items():
+            self.assertEqual(len(queries), len(many_products[url]), url)
+
+    def test_queries_count(self):
+        queries = self.capture_queries(quantity=4)
+        for name, expected in self.expected_queries.items():
+            self.assertEqual(len(queries[reverse(name)]), expected, name)
+
+    def test_review_aggregates(self):
+        product, = self.create_products(quantity=1)
+        Review.objects.create(author='author', email='new@mail.ru', rate=1, product=product)
+        product.refresh_from_db()
+        self.assertEqual((product.reviews_count, product.rating_sum, product.rating), (4, 16, 4))
+
+        Review.objects.filter(product=product, rate=1).delete()
+        product.refresh_from_db()
+        self.assertEqual((product.reviews_count, product.rating_sum, product.rating), (3, 15, 5))
+
+    def test_rebuild_review_aggregates_command(self):
+        with_reviews, without_reviews = self.create_products(quantity=2)
+        Review.objects.filter(product=without_reviews).delete()
+        Review.objects.create(author='author', email='new@mail.ru', rate=2, product=with_reviews)
+        Product.objects.update(reviews_count=100, rating_sum=7, rating=1)
+
+        output = io.StringIO()
+        with self.assertNumQueries(1):
+            call_command('rebuild_review_aggregates', stdout=output)
+        self.assertIn('Обновлено товаров: 2', output.getvalue())
+        self.assertEqual(list(Product.objects.order_by('pk').values_list('reviews_count', 'rating_sum', 'rating')),
+                         [(4, 17, 4), (0, 0, 1)])
+
+
+class CachedResponsesTestCase(TestCase):
+    """Проверяет кэширование ответов витринных эндпоинтов и их инвалидацию по версиям моделей."""
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(title='Electronics', main=True)
+        self.product = Product.objects.create(title='Product', price=100, count=1, rating=4, category=self.category)
+
+    def assert_cached(self, url: str):
+        """
+        Проверяет, что первый запрос идет в базу данных, повторный - нет, а после нового отзыва - снова идет.
+        :param url: адрес эндпоинта
+        """
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.json(), second.json())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(author='author', email='new@mail.ru', rate=1, product=self.product)
+        with CaptureQueriesContext(connection) as context:
+            third = self.client.get(url)
+        self.assertTrue(context.captured_queries)
+        self.assertEqual(third.json()[0]['reviews'], 1)
+
+    def test_banners(self):
+        self.assert_cached(reverse('catalog_app:banners'))
+
+    def test_version_is_bumped_after_commit(self):
+        url = reverse('catalog_app:banners')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Review.objects.create(author='author', email='new@mail.ru', rate=1, product=self.product)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).json()[0]['reviews'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url).json()[0]['reviews'], 1)
+
+    def test_local_memory_cache_check(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with self.settings(CACHES=locmem, DEBUG=False):
+            self.assertEqual([error.id for error in check_cache_backend(None)], ['products_app.E001'])
+        with self.settings(CACHES=locmem, DEBUG=True):
+            self.assertEqual([error.id for error in check_cache_backend(None)], ['products_app.W001'])
+        self.assertEqual(check_cache_backend(None), [])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(),
+    }})
+    def test_popular_file_based_cache(self):
+        self.assert_cached(reverse('products_app:products_popular'))
+
+
+class PricingTestCase(TestCase):
+    """Проверяет расчет текущих цен с учетом срока действия акций и их кэширование."""
+    def setUp(self):
+        cache.clear()
+        today = timezone.localdate()
+        self.products = [Product.objects.create(title='Product {index}'.format(index=index), price=100,
+                                                count=1, rating=4) for index in range(3)]
+        SaleProduct.objects.create(product=self.products[0], salePrice=80, dateTo=today)
+        self.expired = SaleProduct.objects.create(product=self.products[1], salePrice=70,
+                                                  dateTo=today - timedelta(days=1))
+
+    def test_sale_window(self):
+        prices = get_effective_prices(product.pk for product in self.products)
+        self.assertEqual([prices[product.pk] for product in self.products], [80, 100, 100])
+
+    def test_cache_and_invalidation(self):
+        ids = [product.pk for product in self.products]
+        get_effective_prices(ids)
+        with self.assertNumQueries(0):
+            get_effective_prices(ids)
+
+        self.expired.dateTo = timezone.localdate() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.expired.save()
+        self.assertEqual(get_effective_prices(ids)[self.products[1].pk], Decimal(70))
+
+    def test_only_changed_product_is_evicted(self):
+        ids = [product.pk for product in self.products]
+        get_effective_prices(ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=ids[0]).update(count=0)
+            products_stock_changed.send(sender=Product, product_ids=[ids[0]])
+        with self.assertNumQueries(0):
+            get_effective_prices(ids)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[2].price = 90
+            self.products[2].save()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(get_effective_prices(ids), {ids[0]: 80, ids[1]: 100, ids[2]: 90})
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn('IN ({pk})'.format(pk=ids[2]), context.captured_queries[0]['sql'])
+
+    def test_sale_moved_to_other_product(self):
+        ids = [product.pk for product in self.products]
+        get_effective_prices(ids)
+        sale = SaleProduct.objects.get(product=self.products[0])
+        sale.product = self.products[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.save()
+        self.assertEqual(get_effective_prices(ids), {ids[0]: 100, ids[1]: 100, ids[2]: 80})
+        self.assertEqual(list(Product.objects.order_by('pk').values_list('effective_price', flat=True)),
+                         [100, 100, 80])
+
+    def test_deleted_products(self):
+        self.assertEqual(get_effective_prices([self.products[2].pk + 100]), {})
+        with self.assertNumQueries(0):
+            get_effective_prices([self.products[2].pk + 100])
+
+    def test_effective_price_column(self):
+        for product in self.products:
+            product.refresh_from_db()
+        self.assertEqual([product.effective_price for product in self.products], [80, 100, 100])
+
+        SaleProduct.objects.create(product=self.products[2], salePrice=50, dateTo=timezone.localdate())
+        self.products[2].refresh_from_db()
+        self.assertEqual(self.products[2].effective_price, 50)
+
+    def test_effective_price_after_loaddata(self):
+        today = timezone.localdate().isoformat()
+        product = {'model': 'products_app.product', 'pk': 100,
+                   'fields': {'title': 'Fixture', 'price': '100.00', 'count': 1, 'rating': 4, 'date': today}}
+        sale = {'model': 'products_app.saleproduct', 'pk': 100,
+                'fields': {'product': 100, 'salePrice': '60.00', 'dateFrom': today, 'dateTo': today}}
+        for objects in ([product, sale], [sale, product]):
+            Product.objects.filter(pk=100).delete()
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'fixture.json')
+                with open(path, 'w') as file:
+                    json.dump(objects, file)
+                call_command('loaddata', path, verbosity=0)
+            self.assertEqual(Product.objects.get(pk=100).effective_price, 60)
+
+    def test_refresh_at_window_boundary(self):
+        SaleProduct.objects.filter(pk=self.expired.pk).update(dateTo=timezone.localdate())
+        self.assertEqual(refresh_effective_prices(), [self.products[1].pk])
+        self.assertEqual(refresh_effective_prices(), [])
+        self.assertEqual(Product.objects.get(pk=self.products[1].pk).effective_price, 70)
+
+    def test_only_active_sales_are_listed(self):
+        data = self.client.get(reverse('products_app:sales')).json()
+        self.assertEqual([item['id'] for item in data['items']], [self.products[0].pk])
+
+
+class PopularityTestCase(TestCase):
+    """Проверяет рейтинг популярности товаров по оплаченным заказам с затуханием во времени."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', password='Password123')
+        cls.profile = ProfileUser.objects.create(pk=cls.user.pk, user=cls.user, fullName='Иванов Иван Иванович')
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.products = [Product.objects.create(title='Product {index}'.format(index=index), price=100,
+                                                count=1, rating=4) for index in range(3)]
+
+    def pay(self, product: Product, quantity: int, paid_at, status: str = 'accepted'):
+        order = Order.objects.create(user_profile=self.profile, totalCost=100, status=status, paidAt=paid_at)
+        QuantityProductsInBasket.objects.create(order=order, product=product, quantity=quantity)
+
+    def get_popular_ids(self) -> list[int]:
+        return [item['id'] for item in self.client.get(reverse('products_app:products_popular')).json()]
+
+    def test_decayed_ranking(self):
+        old, recent, unpaid = self.products
+        self.pay(old, quantity=3, paid_at=self.now - POPULARITY_HALF_LIFE * 2)
+        self.pay(recent, quantity=1, paid_at=self.now)
+        self.pay(unpaid, quantity=10, paid_at=None, status='unconfirmed')
+
+        self.assertEqual(refresh_popularity(now=self.now), 2)
+        self.assertAlmostEqual(ProductPopularity.objects.get(pk=old.pk).score, 0.75)
+        self.assertEqual(ProductPopularity.objects.get(pk=old.pk).sales, 3)
+        self.assertEqual(self.get_popular_ids(), [recent.pk, old.pk, unpaid.pk])
+
+    def test_incremental_refresh(self):
+        first, second, third = self.products
+        self.pay(first, quantity=2, paid_at=self.now)
+        refresh_popularity(now=self.now)
+
+        later = self.now + POPULARITY_HALF_LIFE
+        self.pay(second, quantity=1, paid_at=later)
+        self.pay(first, quantity=1, paid_at=later)
+        self.assertEqual(refresh_popularity(now=later), 2)
+        scores = dict(ProductPopularity.objects.values_list('pk', 'score'))
+        self.assertAlmostEqual(scores[first.pk], 2.0)
+        self.assertAlmostEqual(scores[second.pk], 1.0)
+
+        refresh_popularity(full=True, now=later)
+        self.assertEqual(dict(ProductPopularity.objects.values_list('pk', 'score')), scores)
+        self.assertEqual(ProductPopularity.objects.get(pk=first.pk).sales, 3)
+
+    def test_order_committed_after_refresh(self):
+        first, second, third = self.products
+        self.pay(first, quantity=1, paid_at=self.now)
+        refresh_popularity(now=self.now)
+
+        # заказ оплачен раньше пересчета, но его транзакция зафиксирована уже после него
+        self.pay(second, quantity=2, paid_at=self.now - timedelta(minutes=1))
+        Review.objects.create(author='author', email='late@mail.ru', rate=5, product=third)
+        Review.objects.filter(product=third).update(date=self.now - timedelta(minutes=1))
+        later = self.now + timedelta(hours=1)
+        self.assertEqual(refresh_popularity(now=later), 2)
+        self.assertEqual(refresh_popularity(now=later), 0)
+        self.assertEqual(dict(ProductPopularity.objects.values_list('pk', 'sales')),
+                         {first.pk: 1, second.pk: 2, third.pk: 0})
+
+
+class ProductReviewsTestCase(TestCase):
+    """Проверяет, что страница товара отдает только последние отзывы, а остальные - эндпоинт отзывов по курсору."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(title='Electronics', main=True)
+        cls.product = Product.objects.create(title='Product', price=100, count=1, rating=4, category=cls.category)
+        reviews = [Review.objects.create(author='author {index}'.format(index=index), rate=index % 5 + 1,
+                                         email='{index}@mail.ru'.format(index=index), product=cls.product)
+                   for index in range(12)]
+        # у половины отзывов одинаковая дата, чтобы порядок между ними определял pk
+        now = timezone.now()
+        for index, review in enumerate(reviews):
+            Review.objects.filter(pk=review.pk).update(date=now - timedelta(hours=min(index, 6)))
+        cls.expected = [review.author for review in reversed(reviews)]
+        cls.expected.sort(key=lambda author: min(int(author.split()[1]), 6))
+        cls.product.refresh_from_db()
+
+    def test_detail_contains_latest_reviews(self):
+        with self.assertNumQueries(5):
+            data = self.client.get(reverse('products_app:product_detail', kwargs={'pk': self.product.pk})).json()
+        self.assertEqual([review['author'] for review in data['reviews']], self.expected[:LATEST_REVIEWS_LIMIT])
+        self.assertEqual(data['reviewsStats'], {'count': 12, 'average': 2.8})
+
+        url = reverse('products_app:product_reviews', kwargs={'pk': self.product.pk})
+        authors, cursor = [review['author'] for review in data['reviews']], data['reviewsNextCursor']
+        while cursor:
+            page = self.client.get(url, {'cursor': cursor, 'limit': 4}).json()
+            authors.extend(review['author'] for review in page['items'])
+            cursor = page['nextCursor']
+        self.assertEqual(authors, self.expected)
+
+    def test_reviews_list(self):
+        url = reverse('products_app:product_reviews', kwargs={'pk': self.product.pk})
+        page = self.client.get(url, {'limit': 20}).json()
+        self.assertEqual([review['author'] for review in page['items']], self.expected)
+        self.assertIsNone(page['nextCursor'])
+        self.assertEqual(set(page['items'][0]), {'author', 'email', 'text', 'rate', 'date'})
+
+        self.assertEqual(self.client.get(reverse('products_app:product_reviews', kwargs={'pk': 0})).status_code, 404)
+        self.assertEqual(self.client.post(url, {'text': 'text', 'rate': 5}).status_code, 403)
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (TagsListApiView, ProductDetailApiView,
-                    SaleListApiView, ProductLimitedListApiView, ProductPopularListApiView, CreateProductReviewApiView)
+                    SaleListApiView, ProductLimitedListApiView, ProductPopularListApiView, ProductReviewsApiView)
 
 
 app_name = "products_app"
@@ -11,6 +11,6 @@ urlpatterns = [
     path('api/products/limited', ProductLimitedListApiView.as_view(), name='products_limited'),
     path('api/products/popular', ProductPopularListApiView.as_view(), name='products_popular'),
     path('api/product/<int:pk>', ProductDetailApiView.as_view(), name='product_detail'),
-    path('api/product/<int:pk>/reviews', CreateProductReviewApiView.as_view(), name='create_review')
+    path('api/product/<int:pk>/reviews', ProductReviewsApiView.as_view(), name='product_reviews')
 
 ]
\ No newline at end of file
@@ -1,20 +1,69 @@
 from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Prefetch, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.db.models.query import QuerySet
 from datetime import datetime
-import statistics
+from catalog_app.pagination import KeysetPagination
 from profileuser_app.models import ProfileUser
 from .models import Review
-from .models import Product
+from .models import Product, ProductImage, Tag
 
+LATEST_REVIEWS_LIMIT = 5  # количество отзывов на странице товара, остальные отдаются постранично
+REVIEWS_ORDERING = ('-date', '-pk')
 
-def setup_average_rating(product_pk: Product.pk) -> int:
+
+def get_products_for_list(products: QuerySet | None = None) -> QuerySet:
+    """
+    Подготавливает QuerySet товаров для списочных сериализаторов (FewerInfoProductSerializer, BasketSerializer).
+    Отзывы не загружаются: их количество хранится в поле reviews_count.
+    У изображений и тегов загружаются только те колонки, которые попадают в ответ.
+    :param products: QuerySet с товарами. По умолчанию - все товары.
+    Цена с учетом акции хранится в поле effective_price, поэтому акция не загружается.
+    :return: QuerySet с предзагруженными изображениями и тегами.
+    """
+    if products is None:
+        products = Product.objects.all()
+    return products.defer('fullDescription').prefetch_related(
+        Prefetch('product_img', queryset=ProductImage.objects.only('pk', 'image', 'content_hash', 'product_id')),
+        Prefetch('tags', queryset=Tag.objects.only('pk', 'name')),
+    )
+
+
+def change_review_aggregates(product_pk: Product.pk, rate: int, delta: int = 1):
     """
-    Аналитическая функция. Возвращает оценку товара.
+    Изменяет агрегаты отзывов товара: количество отзывов, сумму оценок и среднюю оценку.
+    Обновление выполняется одним UPDATE с F-выражениями, без загрузки отзывов товара.
     :param product_pk: идентификатор модели Product
-    :return: средняя оценка товара, основывается на отзывах пользователей.
+    :param rate: оценка добавленного или удаленного отзыва
+    :param delta: 1, если отзыв добавлен, и -1, если удален
     """
-    return statistics.mean(review.rate
-                           for review in Review.objects.only('rate').filter(product_id=product_pk)
-                           )
+    reviews_count = F('reviews_count') + delta
+    rating_sum = F('rating_sum') + rate * delta
+    Product.objects.filter(pk=product_pk).update(
+        reviews_count=reviews_count,
+        rating_sum=rating_sum,
+        rating=Case(When(reviews_count__gt=-delta, then=rating_sum / reviews_count), default=F('rating')),
+    )
+
+
+def rebuild_review_aggregates(products: QuerySet | None = None) -> int:
+    """
+    Пересчитывает агрегаты отзывов товаров одним UPDATE-запросом по таблице отзывов.
+    Средняя оценка пересчитывается только у товаров, на которые есть отзывы.
+    :param products: QuerySet с товарами. По умолчанию - все товары.
+    :return: количество обновленных товаров.
+    """
+    if products is None:
+        products = Product.objects.all()
+    reviews = Review.objects.filter(product_id=OuterRef('pk')).order_by().values('product_id')
+    reviews_count = Coalesce(Subquery(reviews.annotate(quantity=Count('pk')).values('quantity')), 0)
+    rating_sum = Coalesce(Subquery(reviews.annotate(total=Sum('rate')).values('total')), 0)
+    return products.update(
+        reviews_count=reviews_count,
+        rating_sum=rating_sum,
+        rating=Case(When(Exists(reviews), then=rating_sum / reviews_count), default=F('rating')),
+    )
 
 
 def get_valid_review_data(request_data: dict, user: ProfileUser, product: Product) -> dict:
@@ -38,16 +87,18 @@ def get_valid_review_data(request_data: dict, user: ProfileUser, product: Produc
 def create_review(valid_data: dict, product: Product):
     """
     Создает отзыв пользователя.
+    Агрегаты отзывов товара обновляются сигналом в той же транзакции, что и запись отзыва.
     :param valid_data: Словарь с данными для написания отзыва
     :param product: Экземпляр модели Product
     :return: Создает запись с отзывом в базу данных
     """
-    Review.objects.create(author=valid_data.get('author', 'Неизвестно'),
-                          email=valid_data.get('email', 'unknow@mai.ru'),
-                          text=valid_data.get('text', ''),
-                          rate=valid_data.get('rate', 1),
-                          date=valid_data.get('date'),
-                          product_id=product.pk)
+    with transaction.atomic():
+        Review.objects.create(author=valid_data.get('author', 'Неизвестно'),
+                              email=valid_data.get('email', 'unknow@mai.ru'),
+                              text=valid_data.get('text', ''),
+                              rate=int(valid_data.get('rate', 1)),
+                              date=valid_data.get('date'),
+                              product_id=product.pk)
 
 
 def user_review_exists(email: str, product_id: Product.pk):
@@ -60,3 +111,37 @@ def user_review_exists(email: str, product_id: Product.pk):
     if Review.objects.filter(email=email, product_id=product_id).exists():
         raise ValidationError('Комментарий на товар уже был оставлен этим пользователем.')
 
+
+
+def get_product_reviews(product_pk: Product.pk) -> QuerySet:
+    """
+    Возвращает отзывы о товаре от новых к старым. Выборка идет по индексу (product, date).
+    :param product_pk: идентификатор товара
+    :return: QuerySet с отзывами.
+    """
+    return Review.objects.filter(product_id=product_pk).only(
+        'pk', 'author', 'email', 'text', 'rate', 'date').order_by(*REVIEWS_ORDERING)
+
+
+def get_latest_reviews(product_pk: Product.pk, limit: int = LATEST_REVIEWS_LIMIT) -> tuple[list[Review], str | None]:
+    """
+    Возвращает последние отзывы о товаре и курсор, с которого эндпоинт отзывов продолжит список.
+    :param product_pk: идентификатор товара
+    :param limit: количество отзывов
+    :return: кортеж из списка отзывов и курсора (None, если других отзывов нет).
+    """
+    reviews = list(get_product_reviews(product_pk)[:limit + 1])
+    if len(reviews) <= limit:
+        return reviews, None
+    reviews = reviews[:limit]
+    return reviews, KeysetPagination.encode_cursor([reviews[-1].date, reviews[-1].pk])
+
+
+def get_review_stats(product: Product) -> dict:
+    """
+    Возвращает статистику отзывов о товаре из агрегатов товара, без запросов к таблице отзывов.
+    :param product: экземпляр модели Product
+    :return: словарь с количеством отзывов и средней оценкой.
+    """
+    average = round(product.rating_sum / product.reviews_count, 1) if product.reviews_count else 0
+    return {'count': product.reviews_count, 'average': average}
@@ -1,41 +1,69 @@
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.generics import ListAPIView, RetrieveAPIView, CreateAPIView
+from rest_framework.generics import ListAPIView, RetrieveAPIView, ListCreateAPIView, get_object_or_404
+from catalog_app.pagination import KeysetPagination
+from .cache import CachedResponseMixin
 from .models import Tag, Product, SaleProduct
-from django.db.models import Count
-from .serializers import (TagSerializer, ReviewSerializer, ProductDetailSerializer,
+from .popularity import get_popular_product_ids
+from .pricing import get_active_sale_filter
+from .serializers import (TagSerializer, ReviewSerializer, ProductDetailSerializer, ProductReviewSerializer,
                           SaleProductSerializer, FewerInfoProductSerializer)
 
 from profileuser_app.models import ProfileUser
-from .utils import setup_average_rating, get_valid_review_data, create_review, user_review_exists
-from rest_framework.permissions import IsAuthenticated
+from .utils import (get_valid_review_data, create_review, user_review_exists, get_products_for_list,
+                    get_product_reviews, get_latest_reviews)
+from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework import status
 
 
-class TagsListApiView(ListAPIView):
+class TagsListApiView(CachedResponseMixin, ListAPIView):
     """Класс API-view. Предоставляет информацию о тегах."""
+    cache_models = ('tag',)
     queryset = Tag.objects.only('pk', 'name').all()
     serializer_class = TagSerializer
 
-    def get(self, request: Request, *args, **kwargs):
-        """Метод - get. Формирует ответ для пользователя"""
+    def list(self, request: Request, *args, **kwargs):
+        """Метод - list. Формирует ответ для пользователя"""
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
 
 class ProductDetailApiView(RetrieveAPIView):
-    """Класс API-view. Предоставляет информацию о товаре."""
+    """
+    Класс API-view. Предоставляет информацию о товаре.
+    Отзывы не загружаются целиком: в ответ попадают последние из них, статистика из агрегатов товара
+    и курсор, с которого остальные отзывы отдает ProductReviewsApiView.
+    """
     queryset = Product.objects.prefetch_related(
-        'review', 'specification', 'product_img', 'tags').select_related('category').all()
+        'specification', 'product_img', 'tags').select_related('category').all()
     serializer_class = ProductDetailSerializer
 
-
-class SaleListApiView(ListAPIView):
-    """Класс API-view. Предоставляет информацию о товарах по акции."""
-    queryset: SaleProduct = SaleProduct.objects.prefetch_related('product').all()
+    def get_object(self) -> Product:
+        """
+        Загружает товар и его последние отзывы.
+        :return: экземпляр модели Product.
+        """
+        product: Product = super().get_object()
+        product.latest_reviews, product.reviews_next_cursor = get_latest_reviews(product.pk)
+        return product
+
+
+class SaleListApiView(CachedResponseMixin, ListAPIView):
+    """
+    Класс API-view. Предоставляет информацию о товарах по акции. Показываются только акции, которые действуют сегодня.
+    Начало и окончание акций меняет цены товаров (команда refresh_effective_prices), а с ними и версию товаров,
+    поэтому закэшированный список акций устаревает вместе с ними. Команда работает в отдельном процессе,
+    поэтому это верно только для общего кэша (см. CACHES), а не для LocMemCache.
+    """
+    cache_models = ('saleproduct', 'product', 'productimage')
     serializer_class = SaleProductSerializer
 
+    def get_queryset(self):
+        """Метод - get_queryset. Возвращает действующие сегодня акции."""
+        return SaleProduct.objects.filter(get_active_sale_filter(prefix='')).prefetch_related(
+            'product', 'product__product_img')
+
     def list(self, request: Request, *args, **kwargs):
         """Переопределение метода list для вывода в нужном формате."""
         response = super().list(request, *args, **kwargs)
@@ -43,43 +71,69 @@ class SaleListApiView(ListAPIView):
         return response
 
 
-class ProductLimitedListApiView(ListAPIView):
+class ProductLimitedListApiView(CachedResponseMixin, ListAPIView):
     """Класс API-view. Предоставляет информацию об ограниченных товарах."""
-    queryset: Product = Product.objects.prefetch_related(
-        'review', 'product_img', 'tags').select_related('category').filter(count=0)[:16]
+    cache_models = ('product', 'saleproduct', 'tag', 'productimage', 'review')
+    queryset: Product = get_products_for_list(Product.objects.filter(count=0))[:16]
     serializer_class = FewerInfoProductSerializer
 
-    def get(self, request: Request, *args, **kwargs):
-        """Метод - get. Формирует ответ для пользователя"""
+    def list(self, request: Request, *args, **kwargs):
+        """Метод - list. Формирует ответ для пользователя"""
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
 
-class ProductPopularListApiView(ListAPIView):
-    """Класс API-view. Предоставляет информацию о самых популярных товарах."""
-    queryset: Product = Product.objects.prefetch_related(
-        'review', 'product_img', 'tags').select_related('category').annotate(
-        quantity_purchases=Count('review')
-    ).order_by(
-        '-quantity_purchases'
-    ).exclude(count=0)[:8]
+class ProductPopularListApiView(CachedResponseMixin, ListAPIView):
+    """
+    Класс API-view. Предоставляет информацию о самых популярных товарах.
+    Порядок берется из заранее посчитанного рейтинга ProductPopularity (команда refresh_popularity),
+    товары загружаются по первичному ключу.
+    """
+    cache_models = ('product', 'saleproduct', 'tag', 'productimage', 'review', 'productpopularity')
     serializer_class = FewerInfoProductSerializer
 
-    def get(self, request, *args, **kwargs):
-        """Метод - get. Формирует ответ для пользователя"""
+    def get_queryset(self) -> list[Product]:
+        """
+        Загружает популярные товары в порядке рейтинга.
+        :return: список товаров.
+        """
+        product_ids = get_popular_product_ids()
+        products = get_products_for_list(Product.objects.filter(pk__in=product_ids)).in_bulk()
+        return [products[pk] for pk in product_ids if pk in products]
+
+    def list(self, request: Request, *args, **kwargs):
+        """Метод - list. Формирует ответ для пользователя"""
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
 
-class CreateProductReviewApiView(CreateAPIView):
-    """Класс API-view. Предоставляет возможность пользователю оставить отзыв о товаре."""
-    queryset = Product.objects.only('pk', 'rating').prefetch_related('review')
-
+class ProductReviewsApiView(ListCreateAPIView):
+    """
+    Класс API-view. Предоставляет отзывы о товаре постранично по курсору (cursor), от новых к старым,
+    и возможность пользователю оставить отзыв о товаре.
+    """
     serializer_class = ReviewSerializer
-    lookup_url_kwarg = "pk"
-    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_product(self) -> Product:
+        """
+        Возвращает товар из адреса запроса.
+        :return: экземпляр модели Product с одним полем pk. Возвращает ошибку 404, если товара нет.
+        """
+        return get_object_or_404(Product.objects.only('pk'), pk=self.kwargs['pk'])
+
+    def get_queryset(self):
+        """Метод - get_queryset. Возвращает отзывы о товаре от новых к старым."""
+        return get_product_reviews(self.get_product().pk)
+
+    def get_serializer_class(self):
+        """Метод - get_serializer_class. Отзывы отдаются в том же виде, что и на странице товара."""
+        if self.request.method == 'GET':
+            return ProductReviewSerializer
+        return ReviewSerializer
 
     def post(self, request, *args, **kwargs):
         """
@@ -91,7 +145,7 @@ class CreateProductReviewApiView(CreateAPIView):
         :return: статус 201, если отзыв был создан.
         """
         user: ProfileUser = ProfileUser.objects.get(id=request.user.pk)
-        product: Product = self.get_object()
+        product: Product = self.get_product()
 
         valid_review_data = get_valid_review_data(request_data=request.data, user=user, product=product)
         user_review_exists(email=valid_review_data.get('email'), product_id=valid_review_data.get('product'))
@@ -99,8 +153,5 @@ class CreateProductReviewApiView(CreateAPIView):
         review_serializer: ReviewSerializer = self.get_serializer(data=valid_review_data)
         review_serializer.is_valid(raise_exception=True)
         create_review(valid_data=valid_review_data, product=product)
-
-        product.rating = setup_average_rating(product_pk=product.pk)
-        product.save()
         return Response(status=status.HTTP_201_CREATED)
 
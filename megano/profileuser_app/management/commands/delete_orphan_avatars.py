@@ -0,0 +1,43 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from media_app.avatars import AVATARS_DIR
+from profileuser_app.models import AvatarUser
+
+
+class Command(BaseCommand):
+    """
+    Команда удаляет файлы аватаров, на которые не ссылается ни один пользователь: прежние аватары
+    после обновления и файлы, оставшиеся от удаленных пользователей. Недавно созданные файлы не удаляются,
+    чтобы не удалить аватар, который сохраняется прямо сейчас. Команду стоит запускать по расписанию.
+    """
+    help = 'Удаляет файлы аватаров, которые больше не используются'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=60,
+                            help='Не удалять файлы, измененные меньше указанного количества минут назад')
+
+    def handle(self, *args, **options):
+        root = os.path.join(settings.MEDIA_ROOT, AVATARS_DIR)
+        used = set(AvatarUser.objects.exclude(avatar='').values_list('avatar', flat=True))
+        deadline = time.time() - options['grace'] * 60
+        deleted = freed = 0
+
+        for directory, subdirectories, files in os.walk(root, topdown=False):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                stat = os.stat(path)
+                if name in used or stat.st_mtime > deadline:
+                    continue
+                os.unlink(path)
+                deleted += 1
+                freed += stat.st_size
+            if directory != root and not os.listdir(directory):
+                os.rmdir(directory)
+
+        self.stdout.write(self.style.SUCCESS('Удалено файлов: {count}, освобождено байт: {size}'.format(
+            count=deleted, size=freed)))
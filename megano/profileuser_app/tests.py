@@ -1,3 +1,82 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import time
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .models import AvatarUser, ProfileUser
+
+
+def get_avatar_file(name: str = 'avatar.jpg', size: tuple[int, int] = (1024, 768)) -> SimpleUploadedFile:
+    """
+    Создает файл JPEG с метаданными EXIF для загрузки.
+    :param name: имя файла
+    :param size: размер изображения
+    :return: загружаемый файл.
+    """
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    Image.new('RGB', size, 'blue').save(buffer, format='JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class AvatarUploadTestCase(TestCase):
+    """Проверяет нормализацию, дедупликацию и удаление неиспользуемых аватаров."""
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root.name, IMAGE_DERIVATIVE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.users = []
+        for username in ('first', 'second'):
+            user = User.objects.create_user(username=username, password='Password123')
+            ProfileUser.objects.create(pk=user.pk, user=user, fullName='Иванов Иван Иванович')
+            self.users.append(user)
+
+    def upload(self, user: User, file: SimpleUploadedFile) -> int:
+        self.client.force_login(user)
+        return self.client.post(reverse('profileuser_app:avatar'), {'avatar': file}).status_code
+
+    def test_normalized_and_deduplicated(self):
+        for user in self.users:
+            self.assertEqual(self.upload(user, get_avatar_file()), 200)
+        first, second = (AvatarUser.objects.get(profile_id=user.pk).avatar.name for user in self.users)
+        self.assertEqual(first, second)
+        with Image.open(os.path.join(self.media_root.name, first)) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (512, 384)))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_invalid_file(self):
+        fake = SimpleUploadedFile('avatar.png', b'not an image', content_type='image/png')
+        self.assertEqual(self.upload(self.users[0], fake), 400)
+        self.assertFalse(AvatarUser.objects.exists())
+
+    def test_upload_spooled_by_django(self):
+        with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0):
+            self.assertEqual(self.upload(self.users[0], get_avatar_file()), 200)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root.name, AvatarUser.objects.get().avatar.name)))
+
+    def test_reused_file_is_touched(self):
+        self.upload(self.users[0], get_avatar_file())
+        path = os.path.join(self.media_root.name, AvatarUser.objects.get().avatar.name)
+        os.utime(path, (time.time() - 3600, time.time() - 3600))
+        self.upload(self.users[1], get_avatar_file())
+        self.assertGreater(os.path.getmtime(path), time.time() - 60)
+
+    def test_orphans_are_deleted(self):
+        self.upload(self.users[0], get_avatar_file())
+        old_name = AvatarUser.objects.get().avatar.name
+        self.upload(self.users[0], get_avatar_file(size=(300, 300)))
+        new_name = AvatarUser.objects.get().avatar.name
+
+        call_command('delete_orphan_avatars', grace=0, stdout=io.StringIO())
+        self.assertFalse(os.path.exists(os.path.join(self.media_root.name, old_name)))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root.name, new_name)))
@@ -1,5 +1,9 @@
 from rest_framework.exceptions import ValidationError
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.files.uploadedfile import UploadedFile
+from media_app.avatars import UploadTooLarge, normalize_avatar, spool_upload
+from media_app.derivatives import submit_to_pool
 from .models import ProfileUser
 from json import loads, JSONDecodeError
 import re
@@ -107,6 +111,24 @@ def validate_file(namefile: str, size: int):
         raise ValidationError('Размер файла не должен превышать 2МБ')
 
 
+def process_avatar(upload: UploadedFile) -> str:
+    """
+    Сохраняет загруженный аватар: загрузка берется из временного файла на диске (см. spool_upload),
+    затем проверяется и нормализуется в пуле процессов и сохраняется под именем из хеша содержимого.
+    :param upload: загруженный файл
+    :return: путь до аватара относительно MEDIA_ROOT.
+    Возвращает ошибку, если файл слишком большой или не является изображением.
+    """
+    try:
+        with spool_upload(upload) as path:
+            name = submit_to_pool(normalize_avatar, path, str(settings.MEDIA_ROOT)).result()
+    except UploadTooLarge:
+        raise ValidationError('Размер файла не должен превышать 2МБ')
+    if name is None:
+        raise ValidationError('Файл должен быть изображением')
+    return name
+
+
 def get_classic_dict(dict_string: QueryDict[str] | dict) -> dict:
     '''
     Преобразовывает строковой первый ключ QueryDict в обычный словарь.
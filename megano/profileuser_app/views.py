@@ -6,7 +6,7 @@ from django.contrib.auth import authenticate, login
 from .serializers import ProfileUserSerializer, UserSerializer, AuthUserSerializer, ChangePasswordUserSerializer
 from .utils import (get_classic_dict, get_data_new_user, get_update_user_data, validate_fullname_user,
                     validate_phone_user, validate_all_new_user_data, check_email_user_exists,
-                    validate_file, create_new_user,  create_profile_new_user)
+                    validate_file, create_new_user,  create_profile_new_user, process_avatar)
 
 from .models import ProfileUser, AvatarUser
 from django.contrib.auth.views import LogoutView
@@ -83,6 +83,8 @@ class ProfileDetailUpdateApiView(APIView):
 class AvatarUserCreateOrUpdateApiView(APIView):
     '''
     Класс - API-view. Предоставлет возможность установить или обновить аватар пользователя.
+    Аватар нормализуется и хранится под именем из хеша содержимого, старые файлы
+    удаляются командой delete_orphan_avatars.
     '''
     permission_classes = [IsAuthenticated]
 
@@ -96,10 +98,8 @@ class AvatarUserCreateOrUpdateApiView(APIView):
 
         validate_file(namefile=new_avatar_user.name, size=new_avatar_user.size)
 
-        current_avatar_user, _ = AvatarUser.objects.get_or_create(profile_id=request.user.pk)
-
-        current_avatar_user.avatar = new_avatar_user
-        current_avatar_user.save()
+        AvatarUser.objects.update_or_create(profile_id=request.user.pk,
+                                            defaults={'avatar': process_avatar(upload=new_avatar_user)})
         return Response(status=status.HTTP_200_OK)
 
 